@@ -11,6 +11,7 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     session_id: str
+    # ignored: conversation context is rebuilt server-side from the session store
     context: Optional[List[Dict[str, Any]]] = None
     preferences: Optional[Dict[str, Any]] = None
 
@@ -44,6 +45,19 @@ class DetailedChatLog(BaseModel):
     user_ip: Optional[str] = None
     user_agent: Optional[str] = None
 
+class ChatLogSummary(BaseModel):
+    id: str
+    session_id: str
+    user_query: str
+    tool_names: List[str] = []
+    response_time: Optional[float] = None
+    timestamp: datetime
+
+class ChatLogSearchResult(ChatLogSummary):
+    score: float
+    query_snippet: str
+    response_snippet: str
+
 class ChatLogRequest(BaseModel):
     log_id: str
     session_id: str
@@ -61,6 +75,7 @@ class ChatAnalytics(BaseModel):
     first_query: Optional[str] = None
     last_query: Optional[str] = None
     popular_queries: List[Dict[str, Any]]
+    response_time_histogram: Optional[List[Dict[str, Any]]] = None
 
 class ToolInfo(BaseModel):
     name: str
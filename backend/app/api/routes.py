@@ -1,13 +1,22 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
 import logging
 import time
 from datetime import datetime
 import uuid
 
-from .models import ChatRequest, ChatResponse, ToolsResponse, ChatMessage, ToolResult, ModalAction, DetailedChatLog, ChatLogRequest, ChatAnalytics
+from .models import ChatRequest, ChatResponse, ToolsResponse, ChatMessage, ToolResult, ModalAction, DetailedChatLog, ChatLogRequest, ChatAnalytics, ChatLogSummary, ChatLogSearchResult
 from ..core.agent import AgentController
-from ..core.database import ConversationManager, ChatLogManager
+from ..core.database import (
+    WriteQueueFullError, decode_log_cursor, datetime_to_ms, search_terms,
+    CHAT_LOG_FIELDS, CHAT_LOG_SUMMARY_FIELDS, CHAT_LOG_DETAIL_FIELDS, SEARCH_ORDERS
+)
+from ..core.export import EXPORT_FORMATS, export_chunks
+from ..core.storage import get_storage
+from ..core.session_context import session_context
+from cache_service import cache
 
 logger = logging.getLogger(__name__)
 
@@ -16,13 +25,16 @@ tools_router = APIRouter()
 
 agent_controller = AgentController()
 
+MAX_LOGS_PAGE_SIZE = 500
+MAX_SEARCH_RESULTS = 100
+
 def generate_log_id() -> str:
     timestamp = str(int(time.time() * 1000))[-6:]
     random = str(uuid.uuid4())[:8]
     return f"{timestamp}{random}"
 
 @chat_router.post("", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks, req: Request):
+async def chat_endpoint(request: ChatRequest, req: Request):
     start_time = time.time()
     user_message_id = f"user_{uuid.uuid4()}"
     session_id = request.session_id
@@ -32,27 +44,27 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks,
     
     logger.info(f"[CHAT REQUEST] session: {session_id}")
     logger.info(f"[USER QUERY] message: '{request.message}'")
-    logger.info(f"[CONTEXT] length: {len(request.context) if request.context else 0} messages")
+    if request.context:
+        logger.debug(f"[CONTEXT] ignoring {len(request.context)} client-sent messages, context is kept server-side")
     
     try:
-        background_tasks.add_task(
-            ConversationManager.save_message,
+        # load prior turns before this message is written, so a cold load cannot include it;
+        # the agent uses this list instead of loading its own
+        context = await session_context.get_context(session_id)
+        
+        await get_storage().save_message(
             session_id,
             user_message_id,
             "user",
             request.message
         )
         
-        conversation_context = []
-        if request.context:
-            conversation_context = request.context
-        
         logger.info(f"[PROCESSING] starting agent processing for session: {session_id}")
         
         result = await agent_controller.process_message(
             user_message=request.message,
             session_id=session_id,
-            context=conversation_context
+            context=context
         )
         
         processing_time = time.time() - start_time
@@ -85,8 +97,7 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks,
         assistant_message_id = f"assistant_{uuid.uuid4()}"
         assistant_message = result["message"]
         
-        background_tasks.add_task(
-            ConversationManager.save_message,
+        await get_storage().save_message(
             session_id,
             assistant_message_id,
             "assistant",
@@ -97,6 +108,8 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks,
                 "intent_analysis": result.get("intent_analysis", {})
             }
         )
+        session_context.append(session_id, "user", request.message)
+        session_context.append(session_id, "assistant", assistant_message)
         
         tool_results = []
         for tr in result.get("tool_results", []):
@@ -116,8 +129,7 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks,
         response_time = time.time() - start_time
         
         log_id = generate_log_id()
-        background_tasks.add_task(
-            ChatLogManager.save_chat_log,
+        await get_storage().save_chat_log(
             log_id,
             session_id,
             request.message,
@@ -144,52 +156,186 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks,
         
         return response
         
+    except WriteQueueFullError as e:
+        session_context.invalidate(session_id)
+        logger.error(f"[CHAT OVERLOADED] session: {session_id}, error: {e}")
+        raise HTTPException(status_code=503, detail="chat storage is overloaded, try again shortly")
     except Exception as e:
+        session_context.invalidate(session_id)
         error_time = time.time() - start_time
         logger.error(f"[CHAT ERROR] session: {session_id}, error: {e}, time: {error_time:.2f}s")
         logger.error(f"[ERROR DETAILS] message: '{request.message}', exception: {type(e).__name__}")
         raise HTTPException(status_code=500, detail="failed to process chat request")
 
+def parse_log_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """`summary` or a comma-separated subset of chat log columns; None means the full detailed log"""
+    if not fields:
+        return None
+    if fields == "summary":
+        return CHAT_LOG_SUMMARY_FIELDS
+    requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in CHAT_LOG_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return requested
+
+def build_detailed_log(log: Dict[str, Any]) -> DetailedChatLog:
+    return DetailedChatLog(
+        id=log['id'],
+        session_id=log['session_id'],
+        user_query=log['user_query'],
+        final_response=log['final_response'],
+        tools_used=[ToolResult(**tool) for tool in log['tools_used']],
+        modal_actions=[ModalAction(**action) for action in log['modal_actions']] if log['modal_actions'] else None,
+        suggestions=log['suggestions'],
+        response_time=log['response_time'],
+        timestamp=log['timestamp'],
+        user_ip=log['user_ip'],
+        user_agent=log['user_agent']
+    )
+
 @chat_router.get("/logs")
-async def get_chat_logs(session_id: str = None, limit: int = 100):
-    logger.info(f"[LOGS REQUEST] session: {session_id}, limit: {limit}")
+async def get_chat_logs(session_id: str = None, limit: int = 100, before: str = None, after: str = None,
+                        fields: str = None):
+    logger.info(f"[LOGS REQUEST] session: {session_id}, limit: {limit}, before: {before}, after: {after}, fields: {fields}")
     
     try:
-        logs = ChatLogManager.get_chat_logs(session_id, limit)
-        
-        detailed_logs = []
-        for log in logs:
-            detailed_logs.append(DetailedChatLog(
-                id=log['id'],
-                session_id=log['session_id'],
-                user_query=log['user_query'],
-                final_response=log['final_response'],
-                tools_used=[ToolResult(**tool) for tool in log['tools_used']],
-                modal_actions=[ModalAction(**action) for action in log['modal_actions']] if log['modal_actions'] else None,
-                suggestions=log['suggestions'],
-                response_time=log['response_time'],
-                timestamp=log['timestamp'],
-                user_ip=log['user_ip'],
-                user_agent=log['user_agent']
-            ))
+        before_key = decode_log_cursor(before) if before else None
+        after_key = decode_log_cursor(after) if after else None
+        projection = parse_log_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    limit = max(1, min(limit, MAX_LOGS_PAGE_SIZE))
+    
+    try:
+        logs = await get_storage().get_chat_logs(
+            session_id, limit, before_key, after_key,
+            projection or CHAT_LOG_DETAIL_FIELDS
+        )
         
-        logger.info(f"[LOGS RESPONSE] found: {len(detailed_logs)} logs")
+        if projection is None:
+            items = [build_detailed_log(log) for log in logs]
+        elif projection == CHAT_LOG_SUMMARY_FIELDS:
+            items = [ChatLogSummary(**{field: log[field] for field in projection}) for log in logs]
+        else:
+            items = [{field: log[field] for field in ('id', 'timestamp', *projection)} for log in logs]
+        
+        logger.info(f"[LOGS RESPONSE] found: {len(items)} logs")
         return {
-            "logs": detailed_logs,
-            "total_count": len(detailed_logs),
-            "session_id": session_id
+            "logs": items,
+            "total_count": len(items),
+            "session_id": session_id,
+            "next_cursor": logs[-1]['cursor'] if len(logs) == limit else None,
+            "prev_cursor": logs[0]['cursor'] if logs else None
         }
         
     except Exception as e:
         logger.error(f"[LOGS ERROR] error: {e}")
         raise HTTPException(status_code=500, detail="failed to retrieve chat logs")
 
+@chat_router.get("/logs/export")
+async def export_chat_logs_endpoint(req: Request, format: str = "ndjson", session_id: str = None,
+                                    since: datetime = None, until: datetime = None, fields: str = None):
+    logger.info(f"[EXPORT REQUEST] format: {format}, session: {session_id}, since: {since}, until: {until}")
+    
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"unknown export format: {format}")
+    try:
+        projection = parse_log_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    compress = "gzip" in req.headers.get("accept-encoding", "")
+    headers = {"Content-Disposition": f'attachment; filename="chat_logs.{format}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    
+    batches = get_storage().iter_chat_logs(
+        session_id,
+        datetime_to_ms(since) if since else None,
+        datetime_to_ms(until) if until else None,
+        projection or CHAT_LOG_DETAIL_FIELDS
+    )
+    
+    async def stream():
+        sent = 0
+        try:
+            async for chunk in export_chunks(batches, format, projection or CHAT_LOG_DETAIL_FIELDS, compress):
+                sent += len(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error(f"[EXPORT ERROR] aborted after {sent} bytes: {e}")
+            raise
+        logger.info(f"[EXPORT RESPONSE] format: {format}, bytes: {sent}")
+    
+    return StreamingResponse(stream(), media_type=EXPORT_FORMATS[format], headers=headers)
+
+@chat_router.get("/logs/search")
+async def search_chat_logs_endpoint(q: str, limit: int = 20, since: datetime = None, until: datetime = None,
+                                    session_id: str = None, order: str = "rank"):
+    logger.info(f"[SEARCH REQUEST] q: '{q}', limit: {limit}, since: {since}, until: {until}, order: {order}")
+    
+    if order not in SEARCH_ORDERS:
+        raise HTTPException(status_code=400, detail=f"unknown search order: {order}")
+    try:
+        search_terms(q)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+    start_time = time.time()
+    try:
+        results = await get_storage().search_chat_logs(
+            q, limit,
+            datetime_to_ms(since) if since else None,
+            datetime_to_ms(until) if until else None,
+            session_id, order
+        )
+        items = [ChatLogSearchResult(**{field: log[field] for field in ChatLogSearchResult.model_fields}) for log in results]
+    except Exception as e:
+        logger.error(f"[SEARCH ERROR] q: '{q}', error: {e}")
+        raise HTTPException(status_code=500, detail="failed to search chat logs")
+    
+    logger.info(f"[SEARCH RESPONSE] found: {len(items)} logs, time: {(time.time() - start_time) * 1000:.1f}ms")
+    return {
+        "query": q,
+        "order": order,
+        "results": items,
+        "total_count": len(items)
+    }
+
+@chat_router.get("/logs/{log_id}", response_model=DetailedChatLog)
+async def get_chat_log(log_id: str, req: Request):
+    logger.info(f"[LOG REQUEST] id: {log_id}")
+    
+    try:
+        log = await get_storage().get_chat_log(log_id)
+    except Exception as e:
+        logger.error(f"[LOG ERROR] id: {log_id}, error: {e}")
+        raise HTTPException(status_code=500, detail="failed to retrieve chat log")
+    
+    if log is None:
+        raise HTTPException(status_code=404, detail=f"chat log {log_id} not found")
+    
+    body = build_detailed_log(log).model_dump_json().encode()
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if etag in {tag.strip() for tag in req.headers.get("if-none-match", "").split(",")}:
+        logger.info(f"[LOG RESPONSE] id: {log_id}, not modified")
+        return Response(status_code=304, headers=headers)
+    
+    logger.info(f"[LOG RESPONSE] id: {log_id}, bytes: {len(body)}")
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @chat_router.get("/analytics")
 async def get_chat_analytics(days: int = 30):
     logger.info(f"[ANALYTICS REQUEST] days: {days}")
     
     try:
-        analytics = ChatLogManager.get_chat_analytics(days)
+        analytics = await get_storage().get_chat_analytics(days)
         
         logger.info(f"[ANALYTICS RESPONSE] queries: {analytics.get('total_queries', 0)}")
         return ChatAnalytics(**analytics)
@@ -203,7 +349,7 @@ async def clear_chat_logs(session_id: str = None):
     logger.info(f"[CLEAR LOGS REQUEST] session: {session_id}")
     
     try:
-        ChatLogManager.clear_chat_logs(session_id)
+        await get_storage().clear_chat_logs(session_id)
         
         message = f"cleared chat logs for session {session_id}" if session_id else "cleared all chat logs"
         logger.info(f"[CLEAR LOGS COMPLETE] {message}")
@@ -213,13 +359,26 @@ async def clear_chat_logs(session_id: str = None):
         logger.error(f"[CLEAR LOGS ERROR] error: {e}")
         raise HTTPException(status_code=500, detail="failed to clear chat logs")
 
+@chat_router.delete("/cache")
+async def invalidate_cache(namespace: str = None, tag: str = None):
+    """drop a whole namespace (e.g. ai_response) or every entry with a tag (e.g. knowledge), in every
+    worker: the others replay it from the shared tier's invalidation log"""
+    if bool(namespace) == bool(tag):
+        raise HTTPException(status_code=400, detail="pass exactly one of namespace or tag")
+    removed = cache.invalidate_namespace(namespace) if namespace else cache.invalidate_tag(tag)
+    return {"success": True, "namespace": namespace, "tag": tag, "removed": removed}
+
+@chat_router.get("/context/stats")
+async def get_session_context_stats():
+    return session_context.stats()
+
 @chat_router.get("/history/{session_id}")
 async def get_chat_history(session_id: str):
     logger.info(f"[HISTORY REQUEST] session: {session_id}")
     
     try:
         start_time = time.time()
-        messages = ConversationManager.get_conversation_history(session_id)
+        messages = await get_storage().get_conversation_history(session_id)
         
         chat_messages = []
         for msg in messages:
@@ -249,7 +408,8 @@ async def clear_chat(session_id: str):
     
     try:
         start_time = time.time()
-        ConversationManager.clear_conversation(session_id)
+        await get_storage().clear_conversation(session_id)
+        session_context.invalidate(session_id)
         clear_time = time.time() - start_time
         
         logger.info(f"[CLEAR COMPLETE] session: {session_id}, time: {clear_time:.3f}s")
@@ -1,6 +1,8 @@
 from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import replace
 import logging
 import asyncio
+import json
 import time
 import re
 from ..tools.base import BaseTool, ToolResult
@@ -8,11 +10,22 @@ from ..tools.navigation_tools import ShowModalTool, SuggestSectionsTool, Navigat
 from ..tools.information_tools import KnowledgeSearchTool, ProjectDetailsTool, SkillAssessmentTool, ExperienceLookupTool  
 from ..tools.interaction_tools import ContactFacilitatorTool, ConversationSummarizerTool, FollowUpGeneratorTool
 from ..tools.utility_tools import ClarificationTool, ErrorHandlerTool, AnalyticsTool
-from .database import ToolExecutionManager
+from .storage import get_storage
+from .session_context import session_context
 from .ai_service import AIService
+from .rollups import normalize_query
+from cache_service import cache, KNOWLEDGE_SEARCH, KNOWLEDGE_TAG, TOOL_OUTPUT, Uncacheable
 
 logger = logging.getLogger(__name__)
 
+# tools whose result depends only on their input, and the cache namespace each is kept under
+CACHED_TOOLS = {
+    "knowledge_search": KNOWLEDGE_SEARCH,
+    "project_details": TOOL_OUTPUT,
+    "skill_assessment": TOOL_OUTPUT,
+    "experience_lookup": TOOL_OUTPUT
+}
+
 class AgentController:
     def __init__(self):
         self.tools: Dict[str, BaseTool] = {}
@@ -225,7 +238,11 @@ class AgentController:
             )
         
         tool = self.tools[tool_name]
-        result = await tool._safe_execute(input_data, context)
+        namespace = CACHED_TOOLS.get(tool_name)
+        if namespace is None:
+            result = await tool._safe_execute(input_data, context)
+        else:
+            result = await self._execute_cached(tool, namespace, input_data, context)
         
         execution_time = time.time() - start_time
         
@@ -237,7 +254,7 @@ class AgentController:
             logger.warning(f"[TOOL_EXEC] tool failed: {result.error}")
         
         if session_id:
-            ToolExecutionManager.log_execution(
+            await get_storage().log_execution(
                 session_id=session_id,
                 tool_name=tool_name,
                 input_data=input_data,
@@ -249,6 +266,25 @@ class AgentController:
         
         return result
     
+    async def _execute_cached(self, tool: BaseTool, namespace: str, input_data: Any, context: Optional[Dict]) -> ToolResult:
+        """failed runs are returned but never cached"""
+        async def run() -> ToolResult:
+            result = await tool._safe_execute(input_data, context)
+            if not result.success:
+                raise Uncacheable(result)
+            return result
+        
+        started = time.time()
+        query = input_data.get("query") if isinstance(input_data, dict) and len(input_data) == 1 else None
+        if isinstance(query, str):
+            # "What projects?" and "what projects" share an entry, and warm-up replays normalized queries
+            identity = (tool.name, normalize_query(query, None))
+        else:
+            identity = (tool.name, json.dumps(input_data, sort_keys=True, default=str))
+        result = await cache.fetch(namespace, identity, run, tags=(tool.name, KNOWLEDGE_TAG))
+        # cached results are shared between requests; give this call its own copy and timing
+        return replace(result, execution_time=time.time() - started)
+    
     async def _get_intelligent_modal_suggestion(self, user_message: str, context: Optional[List[Dict]] = None) -> Optional[str]:
         """use intelligent modal selector to determine the best modal suggestion"""
         try:
@@ -296,6 +332,10 @@ class AgentController:
         logger.info(f"[AGENT_PROCESS] message: '{user_message}'")
         
         try:
+            if context is None:
+                context = await session_context.get_context(session_id)
+            logger.info(f"[AGENT_PROCESS] conversation context: {len(context)} messages")
+            
             intent_analysis = await self.analyze_intent(user_message, context)
             selected_tools = await self.select_tools(intent_analysis, user_message)
             
@@ -5,9 +5,13 @@ import time
 import json
 import re
 from .config import settings
+from cache_service import cache, AI_RESPONSE, KNOWLEDGE_TAG, Uncacheable
 
 logger = logging.getLogger(__name__)
 
+LLM_EXHAUSTED_RESPONSE = "i'm experiencing technical difficulties. please try the [contact] section to reach blake directly."
+LLM_UNAVAILABLE_RESPONSE = "service temporarily unavailable. please contact blake directly through the [contact] section."
+
 class AIService:
     def __init__(self):
         self.client = openai.OpenAI(
@@ -168,18 +172,24 @@ make every response feel like natural conversation while being completely accura
         
         logger.info(f"[LLM MESSAGES] total_messages: {len(messages)}")
         
-        try:
+        async def generate() -> str:
             response = await self._make_request(messages)
-            
-            if self._validate_response_against_knowledge(response, knowledge_context):
-                total_time = time.time() - start_time
-                logger.info(f"[LLM COMPLETE] validated response in {total_time:.2f}s")
-                logger.info(f"[VALIDATION] response passed all validation checks")
-                return response
-            else:
+            if response in (LLM_EXHAUSTED_RESPONSE, LLM_UNAVAILABLE_RESPONSE):
+                raise Uncacheable(response)
+            if not self._validate_response_against_knowledge(response, knowledge_context):
                 logger.warning("[LLM GUARD] response failed validation, using fallback")
                 logger.info(f"[VALIDATION] fallback reason: response failed post-generation validation")
-                return self._generate_fallback_response(user_message)
+                raise Uncacheable(self._generate_fallback_response(user_message))
+            logger.info(f"[VALIDATION] response passed all validation checks")
+            return response
+        
+        try:
+            # same question, knowledge and recent turns: serve the cached answer (stale ones refresh in the background)
+            context_hash = cache.create_context_hash(user_message, knowledge_context, conversation_context)
+            response = await cache.fetch(AI_RESPONSE, context_hash, generate, tags=(KNOWLEDGE_TAG,))
+            total_time = time.time() - start_time
+            logger.info(f"[LLM COMPLETE] validated response in {total_time:.2f}s")
+            return response
                 
         except Exception as e:
             logger.error(f"[LLM ERROR] generation failed: {e}")
@@ -271,7 +281,7 @@ make every response feel like natural conversation while being completely accura
                 
                 if attempt == len(self.models) - 1:
                     logger.error(f"[LLM EXHAUSTED] all models failed after {len(self.models)} attempts")
-                    return "i'm experiencing technical difficulties. please try the [contact] section to reach blake directly."
+                    return LLM_EXHAUSTED_RESPONSE
         
         logger.error("[LLM FAILURE] service completely unavailable")
-        return "service temporarily unavailable. please contact blake directly through the [contact] section." 
\ No newline at end of file
+        return LLM_UNAVAILABLE_RESPONSE 
\ No newline at end of file
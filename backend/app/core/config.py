@@ -14,7 +14,69 @@ class Settings(BaseSettings):
     log_responses: bool = True
     log_tool_execution: bool = True
     log_llm_calls: bool = True
+    storage_backend: str = "sqlite"
+    postgres_dsn: str = "postgresql://localhost:5432/chatbot"
+    postgres_pool_min_size: int = 1
+    postgres_pool_max_size: int = 10
     database_path: str = "./data/conversations.db"
+    database_cache_size_kb: int = 16384
+    database_mmap_size_bytes: int = 268435456
+    database_busy_timeout_ms: int = 5000
+    database_cached_statements: int = 256
+    database_executor_workers: int = 4
+    write_behind_enabled: bool = True
+    write_queue_max_size: int = 10000
+    write_queue_batch_size: int = 256
+    write_queue_flush_interval_ms: int = 50
+    retention_enabled: bool = True
+    retention_interval_seconds: int = 3600
+    retention_conversations_days: int = 90
+    retention_tool_executions_days: int = 30
+    retention_chat_logs_days: int = 365
+    retention_hourly_rollups_days: int = 90
+    retention_batch_size: int = 500
+    retention_vacuum_pages: int = 2000
+    archive_enabled: bool = True
+    archive_path: str = "./data/archive"
+    analytics_replica_enabled: bool = True
+    analytics_replica_path: str = ""
+    analytics_replica_refresh_seconds: float = 60
+    analytics_replica_max_staleness_seconds: float = 300
+    analytics_executor_workers: int = 1
+    payload_dedupe_enabled: bool = True
+    payload_blob_min_chars: int = 200
+    payload_compress_min_bytes: int = 256
+    session_context_max_sessions: int = 10000
+    session_context_max_messages: int = 6
+    session_context_max_bytes: int = 16777216
+    session_context_ttl_seconds: float = 600
+    cache_default_ttl_seconds: int = 300
+    cache_max_entries: int = 10000
+    cache_max_bytes: int = 67108864
+    cache_sweep_interval_seconds: float = 60
+    cache_shared_enabled: bool = False
+    cache_shared_path: str = "./data/cache.db"
+    cache_shared_max_bytes: int = 268435456
+    cache_invalidation_check_seconds: float = 1.0
+    cache_knowledge_ttl_seconds: float = 600
+    cache_knowledge_soft_ttl_seconds: float = 300
+    cache_knowledge_refresh_ahead: float = 0
+    cache_ai_response_ttl_seconds: float = 1800
+    cache_ai_response_soft_ttl_seconds: float = 900
+    cache_ai_response_refresh_ahead: float = 0.8
+    cache_tool_output_ttl_seconds: float = 600
+    cache_tool_output_soft_ttl_seconds: float = 300
+    cache_tool_output_refresh_ahead: float = 0
+    cache_refresh_ahead_min_hits: int = 3
+    cache_snapshot_enabled: bool = True
+    cache_snapshot_path: str = "./data/cache.snapshot"
+    cache_warmup_enabled: bool = True
+    cache_warmup_queries: int = 20
+    cache_warmup_days: int = 7
+    knowledge_index_path: str = "./data/knowledge.idx"
+    knowledge_fuzzy_enabled: bool = True
+    knowledge_fuzzy_max_distance: int = 2
+    knowledge_fuzzy_penalty: float = 0.5
     
     class Config:
         env_file = ".env"
@@ -1,115 +1,450 @@
 import sqlite3
 import os
-import json
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import asyncio
+import functools
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Callable, Iterator, Sequence, Tuple, TypeVar
 from .config import settings
+from .write_queue import WriteBehindQueue, WriteFailedError, WriteQueueFullError, Statement
+from .process_lock import ProcessLock
+from . import rollups, payloads, partitions
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    os.makedirs(os.path.dirname(settings.database_path), exist_ok=True)
-    conn = sqlite3.connect(settings.database_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+T = TypeVar('T')
+
+# held for life by one worker per host, which runs the background database jobs (retention, vacuum);
+# the others keep retrying so the jobs move on if that worker exits
+jobs_lock = ProcessLock(f"{settings.database_path}.jobs.lock")
+
+class ConnectionPool:
+    """one long-lived, pre-configured connection per thread (and per process after fork)"""
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._directory_ready = False
+        self._pid = os.getpid()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if not self._directory_ready:
+            directory = os.path.dirname(self.database_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._directory_ready = True
+        
+        conn = sqlite3.connect(
+            self.database_path,
+            timeout=settings.database_busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=settings.database_cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        rollups.register_functions(conn)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(settings.database_cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(settings.database_mmap_size_bytes)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={int(settings.database_busy_timeout_ms)}')
+        
+        with self._lock:
+            self._connections.append(conn)
+        logger.debug(f"opened pooled connection for thread {threading.current_thread().name}")
+        return conn
+    
+    def connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            with self._lock:
+                self._connections = []
+                self._local = threading.local()
+                self._pid = os.getpid()
+        
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+    
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"failed to close pooled connection: {e}")
+        self._local = threading.local()
+        logger.info(f"closed {len(connections)} pooled database connections")
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None or _pool.database_path != settings.database_path:
+        with _pool_lock:
+            if _pool is None or _pool.database_path != settings.database_path:
+                _pool = ConnectionPool(settings.database_path)
+    return _pool
+
+def get_db_connection() -> sqlite3.Connection:
+    return get_connection_pool().connection()
+
+def close_db_connections():
+    if _pool is not None:
+        _pool.close_all()
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_db_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.database_executor_workers,
+                    thread_name_prefix="db-worker"
+                )
+    return _executor
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """run blocking sqlite work on the bounded database executor instead of the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+
+def shutdown_db_executor():
+    global _executor
+    with _pool_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+INSERT_MESSAGE_SQL = '''
+                INSERT INTO conversations (session_id, message_id, role, content, metadata, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            '''
+
+# called with the session id of every conversation turn once it is committed, on either backend
+_message_listeners: List[Callable[[str], None]] = []
+
+def on_message_committed(listener: Callable[[str], None]):
+    _message_listeners.append(listener)
+
+def message_committed(session_id: str):
+    for listener in _message_listeners:
+        try:
+            listener(session_id)
+        except Exception as e:
+            logger.error(f"[DATABASE] message commit listener failed for {session_id}: {e}")
+
+def _record_committed(statements: List[Statement]):
+    payloads.record_committed(statements)
+    for sql, params in statements:
+        if sql is INSERT_MESSAGE_SQL:
+            message_committed(params[0])
+
+_write_queue: Optional[WriteBehindQueue] = None
+
+def get_write_queue() -> WriteBehindQueue:
+    global _write_queue
+    if _write_queue is None:
+        with _pool_lock:
+            if _write_queue is None:
+                _write_queue = WriteBehindQueue(
+                    get_db_connection,
+                    max_size=settings.write_queue_max_size,
+                    batch_size=settings.write_queue_batch_size,
+                    flush_interval_ms=settings.write_queue_flush_interval_ms,
+                    on_commit=_record_committed
+                )
+    return _write_queue
+
+def flush_writes(timeout: Optional[float] = 10.0) -> bool:
+    if _write_queue is None:
+        return True
+    return _write_queue.flush(timeout)
+
+def stop_write_queue():
+    if _write_queue is not None:
+        _write_queue.stop()
+
+def submit_writes(statements: List[Statement], wait: bool = False):
+    """commit statements as one unit, through the write-behind queue when it is enabled"""
+    if settings.write_behind_enabled:
+        write_queue = get_write_queue()
+        sequence = write_queue.enqueue(statements)
+        if wait and not write_queue.wait(sequence):
+            raise TimeoutError("timed out waiting for queued writes to commit")
+        return
+    
+    conn = get_db_connection()
+    try:
+        with conn:
+            for sql, params in statements:
+                conn.execute(sql, params)
+    except Exception:
+        conn.rollback()
+        raise
+    _record_committed(statements)
+
+NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+def ms_to_datetime(ms: int) -> datetime:
+    """epoch milliseconds to the naive utc datetime the old CURRENT_TIMESTAMP columns produced"""
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+def datetime_to_ms(value: datetime) -> int:
+    """naive datetimes are taken as utc, matching ms_to_datetime"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+def ms_to_string(ms: Optional[int]) -> Optional[str]:
+    return ms_to_datetime(ms).strftime('%Y-%m-%d %H:%M:%S') if ms is not None else None
+
+TABLE_SCHEMAS = {
+    'conversations': f'''
+        CREATE TABLE IF NOT EXISTS {{name}} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp INTEGER NOT NULL DEFAULT ({NOW_MS_SQL}),
+            metadata TEXT
+        )
+    ''',
+    'tool_executions': f'''
+        CREATE TABLE IF NOT EXISTS {{name}} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            tool_name TEXT NOT NULL,
+            input_data TEXT,
+            output_data TEXT,
+            execution_time REAL,
+            timestamp INTEGER NOT NULL DEFAULT ({NOW_MS_SQL}),
+            success BOOLEAN DEFAULT TRUE
+        )
+    ''',
+    'chat_logs': f'''
+        CREATE TABLE IF NOT EXISTS {{name}} (
+            log_rowid INTEGER PRIMARY KEY,
+            id TEXT UNIQUE,
+            session_id TEXT NOT NULL,
+            user_query TEXT NOT NULL,
+            final_response TEXT NOT NULL,
+            tools_used TEXT,
+            modal_actions TEXT,
+            suggestions TEXT,
+            response_time REAL,
+            timestamp INTEGER NOT NULL DEFAULT ({NOW_MS_SQL}),
+            user_ip TEXT,
+            user_agent TEXT,
+            tool_names TEXT
+        )
+    '''
+}
+
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_conversations_session_timestamp ON conversations(session_id, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_tool_executions_timestamp ON tool_executions(timestamp, tool_name, execution_time, success)',
+    'CREATE INDEX IF NOT EXISTS idx_tool_executions_session_timestamp ON tool_executions(session_id, timestamp)'
+]
+# chat_logs indexes live on each monthly partition, see partitions.PARTITION_INDEXES
+
+def _column_type(conn: sqlite3.Connection, table: str, column: str) -> Optional[str]:
+    for row in conn.execute(f'PRAGMA table_info({table})'):
+        if row['name'] == column:
+            return (row['type'] or '').upper()
+    return None
+
+def _migrate_epoch_ms_timestamps(conn: sqlite3.Connection):
+    """rebuild tables whose timestamp is CURRENT_TIMESTAMP text into integer epoch milliseconds"""
+    for table, schema in TABLE_SCHEMAS.items():
+        if _column_type(conn, table, 'timestamp') == 'INTEGER':
+            continue
+        
+        columns = [row['name'] for row in conn.execute(f'PRAGMA table_info({table})')]
+        copied = ', '.join(columns)
+        selected = ', '.join(
+            f"COALESCE(CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER), {NOW_MS_SQL})"
+            if column == 'timestamp' else column
+            for column in columns
+        )
+        conn.execute(schema.format(name=f'{table}_migrated'))
+        conn.execute(f'INSERT INTO {table}_migrated ({copied}) SELECT {selected} FROM {table}')
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_migrated RENAME TO {table}')
+        logger.info(f"[MIGRATION] converted {table}.timestamp to epoch milliseconds")
+    
+    for index in ('idx_conversations_session', 'idx_tool_executions_session', 'idx_chat_logs_session', 'idx_chat_logs_timestamp'):
+        conn.execute(f'DROP INDEX IF EXISTS {index}')
+
+def _migrate_chat_log_tool_names(conn: sqlite3.Connection):
+    """denormalize tool names into chat_logs so list views never decode tools_used"""
+    if _column_type(conn, 'chat_logs', 'tool_names') is None:
+        conn.execute('ALTER TABLE chat_logs ADD COLUMN tool_names TEXT')
+    conn.execute('''
+        UPDATE chat_logs SET tool_names = (
+            SELECT group_concat(json_extract(value, '$.tool_name'), ',') FROM json_each(chat_logs.tools_used)
+        )
+        WHERE tools_used IS NOT NULL AND tool_names IS NULL AND json_valid(tools_used)
+    ''')
+    conn.execute('DROP INDEX IF EXISTS idx_chat_logs_session_timestamp')
+
+def _migrate_analytics_rollups(conn: sqlite3.Connection):
+    for schema in rollups.ROLLUP_SCHEMAS:
+        conn.execute(schema)
+    for sql, params in rollups.rebuild_statements():
+        conn.execute(sql, params)
+    logger.info("[MIGRATION] built analytics rollups from existing chat logs")
+
+def _migrate_payload_blobs(conn: sqlite3.Connection):
+    conn.execute(payloads.PAYLOAD_BLOBS_SCHEMA)
+    conn.execute(payloads.PAYLOAD_BLOBS_INDEX)
+
+def _migrate_partition_chat_logs(conn: sqlite3.Connection):
+    """split the chat_logs table into monthly partitions behind a chat_logs view"""
+    kind = conn.execute("SELECT type FROM sqlite_master WHERE name = 'chat_logs'").fetchone()
+    if kind is not None and kind[0] == 'table':
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_logs_timestamp_id ON chat_logs(timestamp, id)')
+        first, last = conn.execute('SELECT MIN(timestamp), MAX(timestamp) FROM chat_logs').fetchone()
+        columns = ', '.join(CHAT_LOG_FIELDS)
+        name = partitions.partition_name(first) if first is not None else None
+        while name is not None:
+            start, end = partitions.partition_bounds(name)
+            partitions.create_partition(conn, name, TABLE_SCHEMAS['chat_logs'])
+            conn.execute(f'''
+                INSERT INTO {name} ({columns})
+                SELECT {columns} FROM chat_logs WHERE timestamp >= ? AND timestamp < ?
+            ''', (start, end))
+            name = partitions.next_partition_name(name) if end <= last else None
+        conn.execute('DROP TABLE chat_logs')
+        logger.info("[MIGRATION] moved chat_logs into monthly partitions")
+    
+    current = partitions.partition_name(now_ms())
+    for name in (current, partitions.next_partition_name(current)):
+        partitions.create_partition(conn, name, TABLE_SCHEMAS['chat_logs'])
+    partitions.rebuild_view(conn, CHAT_LOG_FIELDS)
+
+def _migrate_chat_log_search(conn: sqlite3.Connection):
+    """full-text index on every existing partition"""
+    for name in partitions.list_partitions(conn):
+        if partitions.create_search_index(conn, name):
+            logger.info(f"[MIGRATION] indexed {name} for search")
+
+def _migrate_chat_log_rowid_alias(conn: sqlite3.Connection):
+    """rebuild partitions keyed only by id with an INTEGER PRIMARY KEY, so a VACUUM can no longer renumber
+    the rowids their search index points at; the index is rebuilt because the vacuum migration may already have"""
+    rekeyed = [name for name in partitions.list_partitions(conn) if _column_type(conn, name, 'log_rowid') is None]
+    if not rekeyed:
+        return
+    columns = ', '.join(CHAT_LOG_FIELDS)
+    conn.execute(f'DROP VIEW IF EXISTS {partitions.VIEW_NAME}')
+    for name in rekeyed:
+        conn.execute(TABLE_SCHEMAS['chat_logs'].format(name=f'{name}_rekeyed'))
+        conn.execute(f'INSERT INTO {name}_rekeyed (log_rowid, {columns}) SELECT rowid, {columns} FROM {name}')
+        conn.execute(f'DROP TABLE {name}')
+        conn.execute(f'ALTER TABLE {name}_rekeyed RENAME TO {name}')
+        for index in partitions.PARTITION_INDEXES:
+            conn.execute(index.format(name=name))
+        if not partitions.create_search_index(conn, name):
+            partitions.rebuild_search_index(conn, name)
+        logger.info(f"[MIGRATION] gave {name} a stable rowid")
+    partitions.rebuild_view(conn, CHAT_LOG_FIELDS)
+
+MIGRATIONS = [
+    (1, _migrate_epoch_ms_timestamps),
+    (2, _migrate_chat_log_tool_names),
+    (3, _migrate_analytics_rollups),
+    (4, _migrate_payload_blobs),
+    (5, _migrate_partition_chat_logs),
+    (6, _migrate_chat_log_search),
+    (7, _migrate_chat_log_rowid_alias)
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _run_migrations(conn: sqlite3.Connection):
+    """apply pending migrations, each in its own write-locked transaction with the user_version bump"""
+    for target, migration in MIGRATIONS:
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= target:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('PRAGMA user_version').fetchone()[0] < target:
+                migration(conn)
+                conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"[MIGRATION] database schema at version {target}")
+
+def _enable_incremental_vacuum(conn: sqlite3.Connection):
+    """auto_vacuum can only change on an empty file or through a full VACUUM, so this runs once per database;
+    workers starting together wait on a lock file and re-check, so only the first one vacuums"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return
+    with ProcessLock(f"{settings.database_path}.init.lock"):
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+    logger.info("[MIGRATION] enabled incremental auto-vacuum")
 
 def init_database():
     conn = get_db_connection()
     try:
-        cursor = conn.cursor()
+        _enable_incremental_vacuum(conn)
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                message_id TEXT NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                metadata TEXT
-            )
-        ''')
+        with conn:
+            for table, schema in TABLE_SCHEMAS.items():
+                conn.execute(schema.format(name=table))
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tool_executions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                tool_name TEXT NOT NULL,
-                input_data TEXT,
-                output_data TEXT,
-                execution_time REAL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                success BOOLEAN DEFAULT TRUE
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_logs (
-                id TEXT PRIMARY KEY,
-                session_id TEXT NOT NULL,
-                user_query TEXT NOT NULL,
-                final_response TEXT NOT NULL,
-                tools_used TEXT,
-                modal_actions TEXT,
-                suggestions TEXT,
-                response_time REAL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                user_ip TEXT,
-                user_agent TEXT
-            )
-        ''')
+        _run_migrations(conn)
         
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_conversations_session 
-            ON conversations(session_id)
-        ''')
+        with conn:
+            for index in INDEXES:
+                conn.execute(index)
         
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_tool_executions_session 
-            ON tool_executions(session_id)
-        ''')
-
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_chat_logs_session 
-            ON chat_logs(session_id)
-        ''')
-
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_chat_logs_timestamp 
-            ON chat_logs(timestamp)
-        ''')
+        # keep the current and next month ready so inserts never wait on ddl at a month boundary
+        current = now_ms()
+        ensure_chat_log_partition(current)
+        ensure_chat_log_partition(partitions.partition_bounds(partitions.partition_name(current))[1])
         
-        conn.commit()
         logger.info("database tables created successfully")
         
     except Exception as e:
+        conn.rollback()
         logger.error(f"failed to initialize database: {e}")
         raise
-    finally:
-        conn.close()
 
 class ConversationManager:
     @staticmethod
     def save_message(session_id: str, message_id: str, role: str, content: str, metadata: Optional[Dict] = None):
-        conn = get_db_connection()
         try:
-            cursor = conn.cursor()
-            metadata_json = json.dumps(metadata) if metadata else None
+            timestamp = now_ms()
+            metadata_json, blobs = payloads.encode_payload(metadata, timestamp)
             
-            cursor.execute('''
-                INSERT INTO conversations (session_id, message_id, role, content, metadata)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (session_id, message_id, role, content, metadata_json))
+            submit_writes(blobs + [(INSERT_MESSAGE_SQL, (session_id, message_id, role, content, metadata_json, timestamp))])
             
-            conn.commit()
             logger.debug(f"saved message {message_id} for session {session_id}")
             
         except Exception as e:
             logger.error(f"failed to save message: {e}")
             raise
-        finally:
-            conn.close()
     
     @staticmethod
     def get_conversation_history(session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
@@ -120,21 +455,21 @@ class ConversationManager:
                 SELECT message_id, role, content, timestamp, metadata
                 FROM conversations
                 WHERE session_id = ?
-                ORDER BY timestamp ASC
+                ORDER BY timestamp ASC, id ASC
                 LIMIT ?
             ''', (session_id, limit))
             
             rows = cursor.fetchall()
+            metadata_values = payloads.decode_payloads(conn, [row['metadata'] for row in rows])
             messages = []
             
-            for row in rows:
-                metadata = json.loads(row['metadata']) if row['metadata'] else {}
+            for row, metadata in zip(rows, metadata_values):
                 messages.append({
                     'id': row['message_id'],
                     'role': row['role'],
                     'content': row['content'],
-                    'timestamp': datetime.fromisoformat(row['timestamp']),
-                    'metadata': metadata
+                    'timestamp': ms_to_datetime(row['timestamp']),
+                    'metadata': metadata or {}
                 })
             
             return messages
@@ -142,52 +477,67 @@ class ConversationManager:
         except Exception as e:
             logger.error(f"failed to get conversation history: {e}")
             return []
-        finally:
-            conn.close()
     
     @staticmethod
-    def clear_conversation(session_id: str):
+    def get_recent_messages(session_id: str, limit: int = 6) -> List[Dict[str, str]]:
+        """role and content of the last `limit` messages, oldest first, for prompt context"""
         conn = get_db_connection()
         try:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM conversations WHERE session_id = ?', (session_id,))
-            cursor.execute('DELETE FROM tool_executions WHERE session_id = ?', (session_id,))
-            conn.commit()
+            rows = conn.execute('''
+                SELECT role, content FROM conversations
+                WHERE session_id = ?
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            ''', (session_id, limit)).fetchall()
+            
+            return [{'role': row['role'], 'content': row['content']} for row in reversed(rows)]
+            
+        except Exception as e:
+            logger.error(f"failed to get recent messages: {e}")
+            return []
+    
+    @staticmethod
+    def clear_conversation(session_id: str):
+        try:
+            submit_writes([
+                ('DELETE FROM conversations WHERE session_id = ?', (session_id,)),
+                ('DELETE FROM tool_executions WHERE session_id = ?', (session_id,))
+            ], wait=True)
             logger.info(f"cleared conversation for session {session_id}")
             
         except Exception as e:
             logger.error(f"failed to clear conversation: {e}")
             raise
-        finally:
-            conn.close()
 
 class ToolExecutionManager:
     @staticmethod
     def log_execution(session_id: str, tool_name: str, input_data: Any, output_data: Any, 
                      execution_time: float, success: bool = True):
-        conn = get_db_connection()
         try:
-            cursor = conn.cursor()
-            cursor.execute('''
+            timestamp = now_ms()
+            input_json, input_blobs = payloads.encode_payload(input_data, timestamp)
+            output_json, output_blobs = payloads.encode_payload(output_data, timestamp)
+            
+            submit_writes(input_blobs + output_blobs + [('''
                 INSERT INTO tool_executions 
-                (session_id, tool_name, input_data, output_data, execution_time, success)
-                VALUES (?, ?, ?, ?, ?, ?)
+                (session_id, tool_name, input_data, output_data, execution_time, success, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (
                 session_id, 
                 tool_name, 
-                json.dumps(input_data) if input_data else None,
-                json.dumps(output_data) if output_data else None,
+                input_json,
+                output_json,
                 execution_time,
-                success
-            ))
+                success,
+                timestamp
+            ))])
             
-            conn.commit()
             logger.debug(f"logged tool execution: {tool_name} for session {session_id}")
             
+        except WriteQueueFullError:
+            raise
         except Exception as e:
             logger.error(f"failed to log tool execution: {e}")
-        finally:
-            conn.close()
     
     @staticmethod
     def get_tool_analytics(session_id: Optional[str] = None, tool_name: Optional[str] = None) -> List[Dict]:
@@ -209,15 +559,120 @@ class ToolExecutionManager:
             query += ' ORDER BY timestamp DESC'
             
             cursor.execute(query, params)
-            rows = cursor.fetchall()
+            executions = [dict(row) for row in cursor.fetchall()]
+            values = payloads.decode_payloads(
+                conn, [execution[column] for execution in executions for column in ('input_data', 'output_data')]
+            )
+            for i, execution in enumerate(executions):
+                execution['input_data'], execution['output_data'] = values[2 * i], values[2 * i + 1]
             
-            return [dict(row) for row in rows]
+            return executions
             
         except Exception as e:
             logger.error(f"failed to get tool analytics: {e}")
             return []
-        finally:
-            conn.close()
+
+CHAT_LOG_FIELDS = (
+    'id', 'session_id', 'user_query', 'final_response', 'tools_used', 'tool_names', 'modal_actions',
+    'suggestions', 'response_time', 'timestamp', 'user_ip', 'user_agent'
+)
+CHAT_LOG_SUMMARY_FIELDS = ('id', 'session_id', 'user_query', 'tool_names', 'response_time', 'timestamp')
+CHAT_LOG_DETAIL_FIELDS = tuple(field for field in CHAT_LOG_FIELDS if field != 'tool_names')
+CHAT_LOG_JSON_FIELDS = ('tools_used', 'modal_actions', 'suggestions')
+
+def encode_log_cursor(timestamp_ms: int, log_id: str) -> str:
+    return f"{timestamp_ms}_{log_id}"
+
+def decode_log_cursor(cursor: str) -> Tuple[int, str]:
+    timestamp, _, log_id = cursor.partition('_')
+    if not timestamp.isdigit() or not log_id:
+        raise ValueError(f"invalid cursor: {cursor}")
+    return int(timestamp), log_id
+
+SEARCH_ORDERS = ('rank', 'newest')
+SNIPPET_MARKERS = ('<mark>', '</mark>')
+SNIPPET_TOKENS = 12
+# query matches count for more than response matches when ranking
+SEARCH_WEIGHTS = (2.0, 1.0)
+
+def search_terms(text: str) -> List[Tuple[str, bool]]:
+    """words from a free-text search box as (term, is_prefix); a trailing * asks for a prefix match"""
+    terms = [(match.group(1).lower(), bool(match.group(2))) for match in re.finditer(r'(\w+)(\*?)', text)]
+    if not terms:
+        raise ValueError("search query has no searchable words")
+    return terms
+
+def _fts_query(terms: List[Tuple[str, bool]]) -> str:
+    # every term quoted so user input can never be read as fts5 operators
+    return ' '.join(f'"{term}"' + ('*' if prefix else '') for term, prefix in terms)
+
+def _decode_chat_logs(conn: sqlite3.Connection, rows: List[sqlite3.Row], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    json_fields = [field for field in fields if field in CHAT_LOG_JSON_FIELDS]
+    decoded = iter(payloads.decode_payloads(conn, [row[field] for row in rows for field in json_fields]))
+    
+    logs = []
+    for row in rows:
+        log = {'cursor': encode_log_cursor(row['timestamp'], row['id'])}
+        for field in fields:
+            value = row[field]
+            if field in CHAT_LOG_JSON_FIELDS:
+                value = next(decoded) or []
+            elif field == 'tool_names':
+                value = value.split(',') if value else []
+            elif field == 'timestamp':
+                value = ms_to_datetime(value)
+            log[field] = value
+        logs.append(log)
+    return logs
+
+_partition_lock = threading.Lock()
+_known_partitions: set = set()
+
+def ensure_chat_log_partition(timestamp_ms: int) -> str:
+    """the partition table for a timestamp, created (and the view rebuilt) on first use"""
+    name = partitions.partition_name(timestamp_ms)
+    key = (settings.database_path, name)
+    if key in _known_partitions:
+        return name
+    
+    with _partition_lock:
+        if key in _known_partitions:
+            return name
+        conn = get_db_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if partitions.create_partition(conn, name, TABLE_SCHEMAS['chat_logs']):
+                partitions.rebuild_view(conn, CHAT_LOG_FIELDS)
+                logger.info(f"[PARTITIONS] created {name}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        _known_partitions.add(key)
+    return name
+
+def drop_chat_log_partition(name: str):
+    """drop a whole month of chat logs; the view is rebuilt in the same transaction"""
+    with _partition_lock:
+        conn = get_db_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            partitions.drop_partition(conn, name)
+            partitions.rebuild_view(conn, CHAT_LOG_FIELDS)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        _known_partitions.discard((settings.database_path, name))
+    logger.info(f"[PARTITIONS] dropped {name}")
+
+def chat_log_partitions(since_ms: Optional[int] = None, until_ms: Optional[int] = None,
+                        newest_first: bool = False) -> List[str]:
+    return partitions.partitions_for_range(get_db_connection(), since_ms, until_ms, newest_first)
+
+def rollup_rebuild_statements(start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> List[Statement]:
+    """rollups.rebuild_statements reading only the partitions that overlap the range"""
+    return rollups.rebuild_statements(start_ms, end_ms, chat_log_partitions(start_ms, end_ms))
 
 class ChatLogManager:
     @staticmethod
@@ -225,146 +680,295 @@ class ChatLogManager:
                      tools_used: List[Dict] = None, modal_actions: List[Dict] = None,
                      suggestions: List[str] = None, response_time: float = 0.0,
                      user_ip: str = None, user_agent: str = None):
-        conn = get_db_connection()
         try:
-            cursor = conn.cursor()
+            timestamp = now_ms()
+            tools_json, tool_blobs = payloads.encode_payload(tools_used, timestamp)
+            modal_json, modal_blobs = payloads.encode_payload(modal_actions, timestamp)
+            suggestions_json, suggestion_blobs = payloads.encode_payload(suggestions, timestamp)
             
-            cursor.execute('''
-                INSERT INTO chat_logs 
+            table = ensure_chat_log_partition(timestamp)
+            
+            submit_writes(tool_blobs + modal_blobs + suggestion_blobs + [(f'''
+                INSERT INTO {table} 
                 (id, session_id, user_query, final_response, tools_used, modal_actions, 
-                 suggestions, response_time, user_ip, user_agent)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 suggestions, response_time, user_ip, user_agent, timestamp, tool_names)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 log_id,
                 session_id,
                 user_query,
                 final_response,
-                json.dumps(tools_used) if tools_used else None,
-                json.dumps(modal_actions) if modal_actions else None,
-                json.dumps(suggestions) if suggestions else None,
+                tools_json,
+                modal_json,
+                suggestions_json,
                 response_time,
                 user_ip,
-                user_agent
-            ))
+                user_agent,
+                timestamp,
+                ','.join(tool['tool_name'] for tool in tools_used) if tools_used else None
+            ))] + rollups.rollup_statements(timestamp, session_id, user_query, response_time))
             
-            conn.commit()
             logger.info(f"saved chat log {log_id} for session {session_id}")
             
         except Exception as e:
             logger.error(f"failed to save chat log: {e}")
             raise
-        finally:
-            conn.close()
     
     @staticmethod
-    def get_chat_logs(session_id: str = None, limit: int = 100) -> List[Dict[str, Any]]:
+    def get_chat_logs(session_id: str = None, limit: int = 100, before: Optional[Tuple[int, str]] = None,
+                      after: Optional[Tuple[int, str]] = None,
+                      fields: Sequence[str] = CHAT_LOG_DETAIL_FIELDS) -> List[Dict[str, Any]]:
+        """newest-first page of logs, keyset-paginated on (timestamp, id) and projected to fields"""
         conn = get_db_connection()
         try:
-            cursor = conn.cursor()
+            selected = list(dict.fromkeys(['id', 'timestamp', *fields]))
+            unknown = set(selected) - set(CHAT_LOG_FIELDS)
+            if unknown:
+                raise ValueError(f"unknown chat log fields: {sorted(unknown)}")
             
+            conditions = []
+            params: List[Any] = []
             if session_id:
-                cursor.execute('''
-                    SELECT * FROM chat_logs
-                    WHERE session_id = ?
-                    ORDER BY timestamp DESC
-                    LIMIT ?
-                ''', (session_id, limit))
-            else:
-                cursor.execute('''
-                    SELECT * FROM chat_logs
-                    ORDER BY timestamp DESC
+                conditions.append('session_id = ?')
+                params.append(session_id)
+            if before:
+                conditions.append('(timestamp, id) < (?, ?)')
+                params.extend(before)
+            if after:
+                conditions.append('(timestamp, id) > (?, ?)')
+                params.extend(after)
+            
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            order = 'ASC' if after and not before else 'DESC'
+            
+            # route the page to the partitions the cursor can reach, in page order, and stop once it is full
+            tables = chat_log_partitions(
+                after[0] if after else None,
+                before[0] + 1 if before else None,
+                newest_first=order == 'DESC'
+            )
+            rows: List[sqlite3.Row] = []
+            for table in tables:
+                rows.extend(conn.execute(f'''
+                    SELECT {', '.join(selected)} FROM {table}
+                    {where}
+                    ORDER BY timestamp {order}, id {order}
                     LIMIT ?
-                ''', (limit,))
+                ''', [*params, limit - len(rows)]).fetchall())
+                if len(rows) >= limit:
+                    break
             
-            rows = cursor.fetchall()
-            logs = []
-            
-            for row in rows:
-                logs.append({
-                    'id': row['id'],
-                    'session_id': row['session_id'],
-                    'user_query': row['user_query'],
-                    'final_response': row['final_response'],
-                    'tools_used': json.loads(row['tools_used']) if row['tools_used'] else [],
-                    'modal_actions': json.loads(row['modal_actions']) if row['modal_actions'] else [],
-                    'suggestions': json.loads(row['suggestions']) if row['suggestions'] else [],
-                    'response_time': row['response_time'],
-                    'timestamp': datetime.fromisoformat(row['timestamp']),
-                    'user_ip': row['user_ip'],
-                    'user_agent': row['user_agent']
-                })
+            if order == 'ASC':
+                rows.reverse()
             
-            return logs
+            return _decode_chat_logs(conn, rows, selected)
             
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"failed to get chat logs: {e}")
             return []
-        finally:
-            conn.close()
     
     @staticmethod
-    def get_chat_analytics(days: int = 30) -> Dict[str, Any]:
+    def iter_chat_logs(session_id: Optional[str] = None, since_ms: Optional[int] = None,
+                       until_ms: Optional[int] = None, fields: Sequence[str] = CHAT_LOG_DETAIL_FIELDS,
+                       batch_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """oldest-first batches of logs in [since_ms, until_ms); every batch is its own keyset query on
+        the calling thread's connection, so no read transaction or row buffer outlives a batch"""
+        selected = list(dict.fromkeys(['id', 'timestamp', *fields]))
+        unknown = set(selected) - set(CHAT_LOG_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown chat log fields: {sorted(unknown)}")
+        
+        conditions = []
+        params: List[Any] = []
+        if session_id:
+            conditions.append('session_id = ?')
+            params.append(session_id)
+        if since_ms is not None:
+            conditions.append('timestamp >= ?')
+            params.append(since_ms)
+        if until_ms is not None:
+            conditions.append('timestamp < ?')
+            params.append(until_ms)
+        
+        # one partition at a time, oldest first; the list is re-read between partitions so a month
+        # created mid-export is still picked up
+        table = None
+        while True:
+            remaining = [name for name in chat_log_partitions(since_ms, until_ms) if table is None or name > table]
+            if not remaining:
+                return
+            table = remaining[0]
+            
+            last_key: Optional[Tuple[int, str]] = None
+            while True:
+                batch_conditions = conditions + (['(timestamp, id) > (?, ?)'] if last_key else [])
+                where = f"WHERE {' AND '.join(batch_conditions)}" if batch_conditions else ''
+                conn = get_db_connection()
+                rows = conn.execute(f'''
+                    SELECT {', '.join(selected)} FROM {table}
+                    {where}
+                    ORDER BY timestamp ASC, id ASC
+                    LIMIT ?
+                ''', [*params, *(last_key or ()), batch_size]).fetchall()
+                if rows:
+                    yield _decode_chat_logs(conn, rows, selected)
+                if len(rows) < batch_size:
+                    break
+                last_key = (rows[-1]['timestamp'], rows[-1]['id'])
+    
+    @staticmethod
+    def get_chat_log(log_id: str) -> Optional[Dict[str, Any]]:
         conn = get_db_connection()
         try:
-            cursor = conn.cursor()
+            row = conn.execute(f'''
+                SELECT {', '.join(CHAT_LOG_DETAIL_FIELDS)} FROM chat_logs
+                WHERE id = ?
+            ''', (log_id,)).fetchone()
             
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_queries,
-                    AVG(response_time) as avg_response_time,
-                    COUNT(DISTINCT session_id) as unique_sessions,
-                    MIN(timestamp) as first_query,
-                    MAX(timestamp) as last_query
-                FROM chat_logs
-                WHERE timestamp >= datetime('now', '-{} days')
-            '''.format(days))
-            
-            stats = cursor.fetchone()
+            return _decode_chat_logs(conn, [row], CHAT_LOG_DETAIL_FIELDS)[0] if row else None
             
-            cursor.execute('''
-                SELECT user_query, COUNT(*) as count
-                FROM chat_logs
-                WHERE timestamp >= datetime('now', '-{} days')
-                GROUP BY user_query
-                ORDER BY count DESC
-                LIMIT 10
-            '''.format(days))
+        except Exception as e:
+            logger.error(f"failed to get chat log {log_id}: {e}")
+            raise
+    
+    @staticmethod
+    def search_chat_logs(query: str, limit: int = 20, since_ms: Optional[int] = None, until_ms: Optional[int] = None,
+                         session_id: Optional[str] = None, order: str = 'rank') -> List[Dict[str, Any]]:
+        """full-text search over user_query and final_response; bm25 ranked (per partition, then merged)
+        or newest first, with highlighted snippets of both columns"""
+        if order not in SEARCH_ORDERS:
+            raise ValueError(f"unknown search order: {order}")
+        match = _fts_query(search_terms(query))
+        
+        conditions = []
+        params: List[Any] = []
+        if session_id:
+            conditions.append('l.session_id = ?')
+            params.append(session_id)
+        if since_ms is not None:
+            conditions.append('l.timestamp >= ?')
+            params.append(since_ms)
+        if until_ms is not None:
+            conditions.append('l.timestamp < ?')
+            params.append(until_ms)
+        
+        try:
+            conn = get_db_connection()
+            # first pick the winning rowids, then build snippets for those rows only
+            hits: List[Tuple[str, int, float]] = []
+            for table in chat_log_partitions(since_ms, until_ms, newest_first=True):
+                fts = f'{table}_fts'
+                score = f'-bm25({fts}, {SEARCH_WEIGHTS[0]}, {SEARCH_WEIGHTS[1]})'
+                if order == 'rank' and not conditions:
+                    # ranking alone never needs the partition row
+                    sql = f'SELECT rowid, {score} AS score FROM {fts} WHERE {fts} MATCH ? ORDER BY score DESC LIMIT ?'
+                else:
+                    order_by = 'score DESC' if order == 'rank' else 'l.timestamp DESC, l.id DESC'
+                    sql = f'''
+                        SELECT l.rowid, {score} AS score FROM {fts} JOIN {table} AS l ON l.rowid = {fts}.rowid
+                        WHERE {' AND '.join([f'{fts} MATCH ?', *conditions])}
+                        ORDER BY {order_by}
+                        LIMIT ?
+                    '''
+                remaining = limit if order == 'rank' else limit - len(hits)
+                hits.extend((table, rowid, value) for rowid, value in conn.execute(sql, [match, *params, remaining]))
+                if order == 'newest' and len(hits) >= limit:
+                    break
+            
+            if order == 'rank':
+                hits.sort(key=lambda hit: hit[2], reverse=True)
+            hits = hits[:limit]
             
-            popular_queries = [{'query': row['user_query'], 'count': row['count']} 
-                             for row in cursor.fetchall()]
+            start, end = SNIPPET_MARKERS
+            found: Dict[Tuple[str, int], sqlite3.Row] = {}
+            for table in dict.fromkeys(table for table, _, _ in hits):
+                fts = f'{table}_fts'
+                rowids = [rowid for hit_table, rowid, _ in hits if hit_table == table]
+                for row in conn.execute(f'''
+                    SELECT l.rowid AS _rowid, {', '.join(f'l.{field}' for field in CHAT_LOG_SUMMARY_FIELDS)},
+                           snippet({fts}, 0, ?, ?, '…', {SNIPPET_TOKENS}) AS query_snippet,
+                           snippet({fts}, 1, ?, ?, '…', {SNIPPET_TOKENS}) AS response_snippet
+                    FROM {fts} JOIN {table} AS l ON l.rowid = {fts}.rowid
+                    WHERE {fts} MATCH ? AND {fts}.rowid IN ({', '.join('?' for _ in rowids)})
+                ''', [start, end, start, end, match, *rowids]):
+                    found[(table, row['_rowid'])] = row
+            
+            rows = [found[(table, rowid)] for table, rowid, _ in hits]
+            results = _decode_chat_logs(conn, rows, CHAT_LOG_SUMMARY_FIELDS)
+            for log, row, (_, _, value) in zip(results, rows, hits):
+                log['score'] = value
+                log['query_snippet'] = row['query_snippet']
+                log['response_snippet'] = row['response_snippet']
+            return results
+            
+        except Exception as e:
+            logger.error(f"failed to search chat logs: {e}")
+            return []
+    @staticmethod
+    def get_chat_analytics(days: int = 30, conn: Optional[sqlite3.Connection] = None, top_queries: int = 10) -> Dict[str, Any]:
+        """served from the hourly/daily rollups; the window start is rounded down to the hour, or to
+        the day when it is older than the hourly rollups retention keeps"""
+        conn = conn or get_db_connection()
+        try:
+            now = now_ms()
+            hourly_days = settings.retention_hourly_rollups_days
+            # the same cutoff retention.purge_hourly_rollups deletes hourly buckets below
+            hourly_since = rollups.bucket_start(now - hourly_days * 86400000, 'day') if hourly_days > 0 else None
+            stats = rollups.read_analytics(conn, now - days * 86400000, now + 1, top_queries, hourly_since)
             
             return {
                 'total_queries': stats['total_queries'],
-                'avg_response_time': round(stats['avg_response_time'] or 0, 3),
+                'avg_response_time': round(stats['avg_response_time'], 3),
                 'unique_sessions': stats['unique_sessions'],
-                'first_query': stats['first_query'],
-                'last_query': stats['last_query'],
-                'popular_queries': popular_queries
+                'first_query': ms_to_string(stats['first_ts']),
+                'last_query': ms_to_string(stats['last_ts']),
+                'popular_queries': stats['popular_queries'],
+                'response_time_histogram': stats['response_time_histogram']
             }
             
         except Exception as e:
             logger.error(f"failed to get chat analytics: {e}")
             return {}
-        finally:
-            conn.close()
     
     @staticmethod
     def clear_chat_logs(session_id: str = None):
-        conn = get_db_connection()
         try:
-            cursor = conn.cursor()
-            
             if session_id:
-                cursor.execute('DELETE FROM chat_logs WHERE session_id = ?', (session_id,))
+                flush_writes()
+                day = rollups.BUCKET_SIZES['day']
+                conn = get_db_connection()
+                days = [row[0] for row in conn.execute(
+                    f'SELECT DISTINCT timestamp / {day} * {day} FROM chat_logs WHERE session_id = ?', (session_id,)
+                )]
+                tables = {partitions.partition_name(start) for start in days}
+                statements = [(f'DELETE FROM {table} WHERE session_id = ?', (session_id,)) for table in sorted(tables)]
+                for start in days:
+                    statements.extend(rollup_rebuild_statements(start, start + day))
+                submit_writes(statements, wait=True)
                 logger.info(f"cleared chat logs for session {session_id}")
             else:
-                cursor.execute('DELETE FROM chat_logs')
+                # whole months before the cutoff are dropped; the month holding the cutoff is deleted in
+                # small batches to keep the write lock short, and rows logged meanwhile are kept
+                cutoff = now_ms()
+                flush_writes()
+                conn = get_db_connection()
+                for table in chat_log_partitions(until_ms=cutoff + 1):
+                    if partitions.partition_bounds(table)[1] <= cutoff:
+                        drop_chat_log_partition(table)
+                        continue
+                    while True:
+                        submit_writes([(f'''
+                            DELETE FROM {table} WHERE rowid IN (
+                                SELECT rowid FROM {table} WHERE timestamp <= ? LIMIT ?
+                            )
+                        ''', (cutoff, settings.retention_batch_size))], wait=True)
+                        if conn.execute(f'SELECT 1 FROM {table} WHERE timestamp <= ? LIMIT 1', (cutoff,)).fetchone() is None:
+                            break
+                submit_writes(rollups.clear_statements() + rollup_rebuild_statements(cutoff), wait=True)
                 logger.info("cleared all chat logs")
-                
-            conn.commit()
             
         except Exception as e:
             logger.error(f"failed to clear chat logs: {e}")
             raise
-        finally:
-            conn.close() 
\ No newline at end of file
@@ -0,0 +1,107 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from datetime import datetime
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import sys
+import zlib
+from .database import CHAT_LOG_DETAIL_FIELDS, CHAT_LOG_JSON_FIELDS, datetime_to_ms
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _csv_value(field: str, value: Any) -> Any:
+    if field in CHAT_LOG_JSON_FIELDS or field == 'tool_names':
+        return json.dumps(value) if value else ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+def _encode_batch(batch: List[Dict[str, Any]], fmt: str, columns: List[str]) -> bytes:
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for log in batch:
+            writer.writerow([_csv_value(field, log[field]) for field in columns])
+        return buffer.getvalue().encode()
+    return ''.join(
+        json.dumps({field: _export_value(log[field]) for field in columns}, ensure_ascii=False) + '\n'
+        for log in batch
+    ).encode()
+
+def _csv_header(columns: List[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().encode()
+
+async def export_chunks(batches: AsyncIterator[List[Dict[str, Any]]], fmt: str,
+                        fields: Sequence[str] = CHAT_LOG_DETAIL_FIELDS, compress: bool = False) -> AsyncIterator[bytes]:
+    """encode log batches as ndjson lines or csv rows, one chunk per batch, optionally as a
+    single streaming gzip member so nothing is buffered beyond the current batch"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+    columns = list(dict.fromkeys(['id', 'timestamp', *fields]))
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    if fmt == 'csv':
+        yield emit(_csv_header(columns))
+    async for batch in batches:
+        chunk = emit(_encode_batch(batch, fmt, columns))
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+async def _write_export(args: argparse.Namespace) -> int:
+    storage = get_storage()
+    await storage.startup(background_jobs=False)
+    written = 0
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        batches = storage.iter_chat_logs(
+            args.session_id,
+            datetime_to_ms(args.since) if args.since else None,
+            datetime_to_ms(args.until) if args.until else None
+        )
+        async for chunk in export_chunks(batches, args.format, compress=args.gzip):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        await storage.shutdown()
+    return written
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="stream chat logs to ndjson or csv for offline analysis")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--session-id", default=None)
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="inclusive start, iso 8601 (naive = utc)")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None, help="exclusive end, iso 8601 (naive = utc)")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("--output", default="-", help="file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    written = asyncio.run(_write_export(args))
+    logger.info(f"[EXPORT] wrote {written} bytes of {args.format}{' (gzip)' if args.gzip else ''}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+from typing import List, Optional, Sequence, Tuple
+from datetime import datetime, timezone
+import re
+import sqlite3
+
+# chat_logs is a view over one table per utc month (chat_logs_YYYYMM); reads that know their time
+# range go straight to the overlapping partitions and retention drops whole months
+
+VIEW_NAME = 'chat_logs'
+PARTITION_PREFIX = 'chat_logs_'
+PARTITION_PATTERN = re.compile(r'^chat_logs_(\d{4})(\d{2})$')
+
+PARTITION_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_{name}_timestamp_ms ON {name}(timestamp, session_id, response_time)',
+    'CREATE INDEX IF NOT EXISTS idx_{name}_timestamp_id ON {name}(timestamp, id)',
+    'CREATE INDEX IF NOT EXISTS idx_{name}_session_timestamp_id ON {name}(session_id, timestamp, id)'
+]
+
+# full-text index per partition, an external-content fts5 table kept in sync by triggers; it is
+# keyed on rowid, which each partition declares as log_rowid INTEGER PRIMARY KEY so VACUUM keeps it
+PARTITION_SEARCH = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS {name}_fts USING fts5(
+        user_query, final_response, content='{name}', content_rowid='rowid', tokenize='porter unicode61'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS {name}_fts_insert AFTER INSERT ON {name} BEGIN
+        INSERT INTO {name}_fts (rowid, user_query, final_response) VALUES (new.rowid, new.user_query, new.final_response);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {name}_fts_delete AFTER DELETE ON {name} BEGIN
+        INSERT INTO {name}_fts ({name}_fts, rowid, user_query, final_response)
+        VALUES ('delete', old.rowid, old.user_query, old.final_response);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {name}_fts_update AFTER UPDATE OF user_query, final_response ON {name} BEGIN
+        INSERT INTO {name}_fts ({name}_fts, rowid, user_query, final_response)
+        VALUES ('delete', old.rowid, old.user_query, old.final_response);
+        INSERT INTO {name}_fts (rowid, user_query, final_response) VALUES (new.rowid, new.user_query, new.final_response);
+    END'''
+]
+
+def _month_start_ms(year: int, month: int) -> int:
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+def _next_month(year: int, month: int) -> Tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+def partition_name(timestamp_ms: int) -> str:
+    moment = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+    return f'{PARTITION_PREFIX}{moment.year:04d}{moment.month:02d}'
+
+def next_partition_name(name: str) -> str:
+    _, end = partition_bounds(name)
+    return partition_name(end)
+
+def partition_bounds(name: str) -> Tuple[int, int]:
+    """[start, end) of a partition in epoch milliseconds"""
+    match = PARTITION_PATTERN.match(name)
+    if not match:
+        raise ValueError(f"not a chat log partition: {name}")
+    year, month = int(match.group(1)), int(match.group(2))
+    return _month_start_ms(year, month), _month_start_ms(*_next_month(year, month))
+
+def list_partitions(conn: sqlite3.Connection) -> List[str]:
+    """every partition table, oldest first"""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'chat\\_logs\\_%' ESCAPE '\\'"
+    ).fetchall()
+    return sorted(row[0] for row in rows if PARTITION_PATTERN.match(row[0]))
+
+def partitions_for_range(conn: sqlite3.Connection, since_ms: Optional[int] = None, until_ms: Optional[int] = None,
+                         newest_first: bool = False) -> List[str]:
+    """partitions that can hold rows with since_ms <= timestamp < until_ms"""
+    selected = []
+    for name in list_partitions(conn):
+        start, end = partition_bounds(name)
+        if (since_ms is None or end > since_ms) and (until_ms is None or start < until_ms):
+            selected.append(name)
+    return selected[::-1] if newest_first else selected
+
+def create_partition(conn: sqlite3.Connection, name: str, schema: str) -> bool:
+    """create a partition from the chat_logs table template; runs in the caller's transaction"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+    if exists:
+        return False
+    conn.execute(schema.format(name=name))
+    for index in PARTITION_INDEXES:
+        conn.execute(index.format(name=name))
+    create_search_index(conn, name)
+    return True
+
+def create_search_index(conn: sqlite3.Connection, name: str) -> bool:
+    """add the fts table and sync triggers to a partition, indexing any rows it already holds"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f'{name}_fts',)).fetchone()
+    for statement in PARTITION_SEARCH:
+        conn.execute(statement.format(name=name))
+    if exists:
+        return False
+    rebuild_search_index(conn, name)
+    return True
+
+def rebuild_search_index(conn: sqlite3.Connection, name: str):
+    """re-read every row of a partition into its fts table"""
+    conn.execute(f"INSERT INTO {name}_fts ({name}_fts) VALUES ('rebuild')")
+
+def drop_partition(conn: sqlite3.Connection, name: str):
+    """drop a partition and its search index; the caller rebuilds the view"""
+    partition_bounds(name)
+    conn.execute(f'DROP TABLE IF EXISTS {name}_fts')
+    conn.execute(f'DROP TABLE IF EXISTS {name}')
+
+def rebuild_view(conn: sqlite3.Connection, columns: Sequence[str]):
+    """point the chat_logs view at the current partitions; runs in the caller's transaction"""
+    partitions = list_partitions(conn)
+    selected = ', '.join(columns)
+    if partitions:
+        body = ' UNION ALL '.join(f'SELECT {selected} FROM {name}' for name in partitions)
+    else:
+        body = f"SELECT {', '.join(f'NULL AS {column}' for column in columns)} WHERE 0"
+    conn.execute(f'DROP VIEW IF EXISTS {VIEW_NAME}')
+    conn.execute(f'CREATE VIEW {VIEW_NAME} AS {body}')
@@ -0,0 +1,183 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+Statement = Tuple[str, Sequence[Any]]
+
+REF_KEY = '$payload_ref'
+COMPRESSED_MAGIC = b'\x00zl'
+BLOB_REFRESH_MS = 3600000
+KNOWN_BLOBS_MAX = 4096
+BLOB_CACHE_MAX = 512
+
+PAYLOAD_BLOBS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS payload_blobs (
+        digest TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        compressed INTEGER NOT NULL DEFAULT 0,
+        size INTEGER NOT NULL,
+        last_seen INTEGER NOT NULL
+    )
+'''
+
+PAYLOAD_BLOBS_INDEX = 'CREATE INDEX IF NOT EXISTS idx_payload_blobs_last_seen ON payload_blobs(last_seen)'
+
+# json columns written through encode_payload, per table
+PAYLOAD_COLUMNS = {
+    'conversations': ('metadata',),
+    'tool_executions': ('input_data', 'output_data'),
+    'chat_logs': ('tools_used', 'modal_actions', 'suggestions')
+}
+
+_UPSERT_BLOB = '''
+    INSERT INTO payload_blobs (digest, data, compressed, size, last_seen)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (digest) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)
+'''
+
+_lock = threading.Lock()
+_known_blobs: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+_blob_cache: "OrderedDict[str, str]" = OrderedDict()
+
+def _needs_refresh(digest: str, now: int) -> bool:
+    """skip re-upserting blobs this process saw committed within the last hour"""
+    key = (settings.database_path, digest)
+    with _lock:
+        seen = _known_blobs.get(key)
+        if seen is not None and now - seen < BLOB_REFRESH_MS:
+            _known_blobs.move_to_end(key)
+            return False
+        return True
+
+def record_committed(statements: Sequence[Statement]):
+    """called once statements are committed; only then may later rows skip their blob upserts, since
+    a queued upsert can still be rejected or dropped and the rows would point at a missing blob"""
+    with _lock:
+        for sql, params in statements:
+            if sql is _UPSERT_BLOB:
+                key = (settings.database_path, params[0])
+                _known_blobs[key] = max(params[4], _known_blobs.get(key, 0))
+                _known_blobs.move_to_end(key)
+        while len(_known_blobs) > KNOWN_BLOBS_MAX:
+            _known_blobs.popitem(last=False)
+
+def _compress(data: bytes) -> Tuple[bytes, bool]:
+    if len(data) >= settings.payload_compress_min_bytes:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return compressed, True
+    return data, False
+
+def encode_payload(value: Any, now: int) -> Tuple[Union[str, bytes, None], List[Statement]]:
+    """json-encode a tool payload, moving long strings (knowledge chunk text, tool output) into
+    content-addressed blobs; returns the column value and the blob upserts to queue with the row"""
+    if not value:
+        return None, []
+    if not settings.payload_dedupe_enabled:
+        return json.dumps(value), []
+
+    statements: List[Statement] = []
+
+    def strip(node: Any) -> Any:
+        if isinstance(node, dict):
+            return {key: strip(item) for key, item in node.items()}
+        if isinstance(node, list):
+            return [strip(item) for item in node]
+        if isinstance(node, str) and len(node) >= settings.payload_blob_min_chars:
+            data = node.encode()
+            digest = hashlib.sha256(data).hexdigest()
+            if _needs_refresh(digest, now):
+                stored, compressed = _compress(data)
+                statements.append((_UPSERT_BLOB, (digest, stored, int(compressed), len(data), now)))
+            return {REF_KEY: digest}
+        return node
+
+    text = json.dumps(strip(value), separators=(',', ':')).encode()
+    stored, compressed = _compress(text)
+    return (COMPRESSED_MAGIC + stored if compressed else text.decode()), statements
+
+def _collect_refs(node: Any, digests: set):
+    if isinstance(node, dict):
+        if len(node) == 1 and REF_KEY in node:
+            digests.add(node[REF_KEY])
+            return
+        for item in node.values():
+            _collect_refs(item, digests)
+    elif isinstance(node, list):
+        for item in node:
+            _collect_refs(item, digests)
+
+def _load_blobs(conn: sqlite3.Connection, digests: Iterable[str]) -> Dict[str, str]:
+    found: Dict[str, str] = {}
+    missing = []
+    with _lock:
+        for digest in digests:
+            if digest in _blob_cache:
+                _blob_cache.move_to_end(digest)
+                found[digest] = _blob_cache[digest]
+            else:
+                missing.append(digest)
+
+    for start in range(0, len(missing), 500):
+        batch = missing[start:start + 500]
+        rows = conn.execute(
+            f"SELECT digest, data, compressed FROM payload_blobs WHERE digest IN ({', '.join('?' for _ in batch)})",
+            batch
+        ).fetchall()
+        for row in rows:
+            data = zlib.decompress(row['data']) if row['compressed'] else row['data']
+            found[row['digest']] = bytes(data).decode()
+
+    with _lock:
+        for digest in missing:
+            if digest in found:
+                _blob_cache[digest] = found[digest]
+        while len(_blob_cache) > BLOB_CACHE_MAX:
+            _blob_cache.popitem(last=False)
+    return found
+
+def _rehydrate(node: Any, blobs: Dict[str, str]) -> Any:
+    if isinstance(node, dict):
+        if len(node) == 1 and REF_KEY in node:
+            digest = node[REF_KEY]
+            if digest not in blobs:
+                logger.warning(f"[PAYLOADS] missing blob {digest}")
+            return blobs.get(digest)
+        return {key: _rehydrate(item, blobs) for key, item in node.items()}
+    if isinstance(node, list):
+        return [_rehydrate(item, blobs) for item in node]
+    return node
+
+def decode_raw(value: Union[str, bytes, None]) -> Any:
+    """parse a stored column without resolving blob references"""
+    if not value:
+        return None
+    if isinstance(value, bytes):
+        value = zlib.decompress(value[len(COMPRESSED_MAGIC):]) if value.startswith(COMPRESSED_MAGIC) else value
+    return json.loads(value)
+
+def decode_payloads(conn: sqlite3.Connection, values: Sequence[Union[str, bytes, None]]) -> List[Any]:
+    """decode several stored columns, resolving all their blob references in one query"""
+    parsed = [decode_raw(value) for value in values]
+    digests: set = set()
+    for node in parsed:
+        _collect_refs(node, digests)
+    if not digests:
+        return parsed
+    blobs = _load_blobs(conn, digests)
+    return [_rehydrate(node, blobs) for node in parsed]
+
+def decode_payload(conn: sqlite3.Connection, value: Union[str, bytes, None]) -> Any:
+    return decode_payloads(conn, [value])[0]
+
+def garbage_collect_statements(older_than_ms: int) -> List[Statement]:
+    """blobs not written or refreshed since every referencing row expired"""
+    return [('DELETE FROM payload_blobs WHERE last_seen < ?', (older_than_ms,))]
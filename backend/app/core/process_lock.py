@@ -0,0 +1,61 @@
+from typing import Optional
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not posix: a single process is assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class ProcessLock:
+    """exclusive flock on a file, shared by every worker process on the host.
+
+    the kernel drops the lock when the holding process exits, so a worker that dies hands the
+    lock to whichever worker asks next. acquiring again from the process that holds it is a no-op"""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._pid = os.getpid()
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None and self._pid == os.getpid()
+
+    def acquire(self, blocking: bool = False) -> bool:
+        with self._lock:
+            if self._pid != os.getpid():
+                # a forked child does not own its parent's lock
+                self._fd = None
+                self._pid = os.getpid()
+            if self._fd is not None:
+                return True
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    return False
+            self._fd = fd
+        logger.debug(f"[LOCK] pid {os.getpid()} holds {self.path}")
+        return True
+
+    def release(self):
+        with self._lock:
+            fd, self._fd = self._fd, None
+            if fd is not None and self._pid == os.getpid():
+                os.close(fd)
+
+    def __enter__(self) -> 'ProcessLock':
+        self.acquire(blocking=True)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
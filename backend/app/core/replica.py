@@ -0,0 +1,226 @@
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from .config import settings
+from .database import get_db_connection, jobs_lock
+from . import rollups
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# how often a worker that does not produce the replica looks for a newer file
+SYNC_CHECK_SECONDS = 1.0
+
+class AnalyticsReplica:
+    """read-only copy of the database for dashboards and metrics, refreshed with the sqlite backup api.
+
+    a refresh copies the live file inside one wal read transaction, so /chat writes are never
+    blocked, into a temp file that is atomically renamed over the replica; readers keep their
+    snapshot until they notice a newer generation. only the process holding the jobs lock
+    copies; the other workers reopen the file when a rename replaces it. reads older than
+    max_staleness_seconds refresh inline first if this process can take the lock, and fall
+    back to the primary database otherwise."""
+    def __init__(self, path: str = '', refresh_seconds: float = 60, max_staleness_seconds: float = 300):
+        self._path = path
+        self.refresh_seconds = refresh_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self._refresh_lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+        self._file: Optional[Tuple[str, int, int]] = None
+        self._written_at: Optional[float] = None
+        self._checked_at = float('-inf')
+        self._source: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "inline_refreshes": 0,
+            "primary_fallbacks": 0,
+            "last_refresh_seconds": 0.0
+        }
+
+    @property
+    def path(self) -> str:
+        """defaults to a sibling of the live database, e.g. conversations-analytics.db"""
+        if self._path:
+            return self._path
+        base, ext = os.path.splitext(settings.database_path)
+        return f"{base}-analytics{ext or '.db'}"
+
+    def refresh(self) -> bool:
+        with self._refresh_lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> bool:
+        started = time.monotonic()
+        source_path = settings.database_path
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            source = sqlite3.connect(source_path, timeout=settings.database_busy_timeout_ms / 1000)
+            target = sqlite3.connect(temp_path)
+            try:
+                # pages=-1 copies everything in one read transaction; a stepped copy would
+                # restart every time the writer commits
+                source.backup(target, pages=-1)
+                target.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                target.close()
+                source.close()
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            self._stats["refresh_failures"] += 1
+            logger.error(f"[REPLICA] refresh failed: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        self._source = source_path
+        self._sync(force=True)
+        elapsed = time.monotonic() - started
+        self._stats["refreshes"] += 1
+        self._stats["last_refresh_seconds"] = round(elapsed, 3)
+        logger.debug(f"[REPLICA] generation {self._generation} refreshed in {elapsed:.3f}s")
+        return True
+
+    def _sync(self, force: bool = False):
+        """notice a replica file renamed into place by this or another process"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < SYNC_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        path = self.path
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._file = None
+            self._written_at = None
+            return
+        current = (path, st.st_ino, st.st_mtime_ns)
+        if current != self._file:
+            self._file = current
+            self._written_at = st.st_mtime
+            self._generation += 1
+
+    def age_seconds(self) -> Optional[float]:
+        # mtime rather than a local clock, so workers that only read the file agree on its age
+        return max(0.0, time.time() - self._written_at) if self._written_at is not None else None
+
+    def _is_stale(self, force: bool = False) -> bool:
+        self._sync(force)
+        age = self.age_seconds()
+        if self._source is not None and self._source != settings.database_path:
+            return True
+        return age is None or age > self.max_staleness_seconds
+
+    def connection(self) -> sqlite3.Connection:
+        """this thread's replica connection, or the primary one when no fresh enough replica exists"""
+        if self._is_stale():
+            with self._refresh_lock:
+                # another reader or the refresh job, here or in the owning process, may have caught up
+                if self._is_stale(force=True):
+                    if not jobs_lock.acquire():
+                        self._stats["primary_fallbacks"] += 1
+                        return get_db_connection()
+                    self._stats["inline_refreshes"] += 1
+                    if not self._refresh_locked():
+                        self._stats["primary_fallbacks"] += 1
+                        return get_db_connection()
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.generation != self._generation:
+            if conn is not None:
+                conn.close()
+            # the file is never written after the rename, so skip locking entirely
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro&immutable=1", uri=True,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            rollups.register_functions(conn)
+            conn.execute(f'PRAGMA cache_size=-{int(settings.database_cache_size_kb)}')
+            conn.execute(f'PRAGMA mmap_size={int(settings.database_mmap_size_bytes)}')
+            self._local.conn = conn
+            self._local.generation = self._generation
+        return conn
+
+    def stats(self) -> Dict[str, Any]:
+        age = self.age_seconds()
+        return {
+            **self._stats,
+            "generation": self._generation,
+            "producer": jobs_lock.held,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "refresh_seconds": self.refresh_seconds,
+            "max_staleness_seconds": self.max_staleness_seconds
+        }
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="analytics-replica", daemon=True)
+        self._thread.start()
+        logger.info(f"[REPLICA] refresh job started (every {self.refresh_seconds}s, max staleness {self.max_staleness_seconds}s)")
+
+    def stop(self, timeout: float = 30.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        # every worker runs this loop, but only the jobs lock holder copies; the others retry the
+        # lock each interval so the job moves on when its owner exits
+        while not self._stop.is_set():
+            if jobs_lock.acquire():
+                self.refresh()
+            self._stop.wait(self.refresh_seconds)
+
+analytics_replica = AnalyticsReplica(
+    settings.analytics_replica_path,
+    settings.analytics_replica_refresh_seconds,
+    settings.analytics_replica_max_staleness_seconds
+)
+
+_analytics_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def analytics_connection() -> sqlite3.Connection:
+    if not settings.analytics_replica_enabled:
+        return get_db_connection()
+    return analytics_replica.connection()
+
+def _get_analytics_executor() -> ThreadPoolExecutor:
+    global _analytics_executor
+    if _analytics_executor is None:
+        with _executor_lock:
+            if _analytics_executor is None:
+                _analytics_executor = ThreadPoolExecutor(
+                    max_workers=settings.analytics_executor_workers,
+                    thread_name_prefix="analytics-worker"
+                )
+    return _analytics_executor
+
+async def run_analytics(func: Callable[..., T], *args, **kwargs) -> T:
+    """like run_db, but on separate threads so slow aggregates never hold a slot /chat needs"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_analytics_executor(), functools.partial(func, *args, **kwargs))
+
+def shutdown_analytics():
+    global _analytics_executor
+    analytics_replica.stop()
+    with _executor_lock:
+        executor, _analytics_executor = _analytics_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
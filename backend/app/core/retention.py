@@ -0,0 +1,244 @@
+from typing import Any, Dict, List, Optional
+from collections import defaultdict
+import argparse
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from .config import settings
+from .database import (
+    get_db_connection, submit_writes, ms_to_datetime, now_ms, jobs_lock,
+    chat_log_partitions, drop_chat_log_partition, ensure_chat_log_partition, CHAT_LOG_FIELDS
+)
+from . import rollups, payloads, partitions
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 86400000
+# chat logs expire a whole month at a time, so a row can outlive its policy by up to a month
+PARTITION_SLACK_DAYS = 31
+
+def retention_policies() -> Dict[str, int]:
+    """days of raw history kept per table; 0 keeps rows forever"""
+    return {
+        'conversations': settings.retention_conversations_days,
+        'tool_executions': settings.retention_tool_executions_days,
+        'chat_logs': settings.retention_chat_logs_days
+    }
+
+def archive_file(table: str, timestamp_ms: int) -> str:
+    day = ms_to_datetime(timestamp_ms).strftime('%Y-%m-%d')
+    return os.path.join(settings.archive_path, table, f"{day}.ndjson.gz")
+
+def archive_rows(table: str, rows: List[Dict[str, Any]]) -> int:
+    """append rows to per-day gzip ndjson files; each append is a new gzip member, so files stay valid"""
+    by_file: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        by_file[archive_file(table, row['timestamp'])].append(row)
+
+    for path, file_rows in by_file.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                for row in file_rows:
+                    f.write(json.dumps(row, default=str).encode() + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+    return len(by_file)
+
+def _archive_records(conn, table: str, records: List[Dict[str, Any]]):
+    # rehydrate blob references so archives stay readable after blob gc
+    columns = payloads.PAYLOAD_COLUMNS.get(table, ())
+    values = iter(payloads.decode_payloads(conn, [record[column] for record in records for column in columns]))
+    for record in records:
+        for column in columns:
+            record[column] = next(values)
+    archive_rows(table, records)
+
+def purge_table(table: str, days: int, batch_size: int, archive: bool = True,
+                stop: Optional[threading.Event] = None) -> int:
+    """archive then delete expired rows in small batches so the writer never holds the lock for long"""
+    cutoff = now_ms() - days * DAY_MS
+    conn = get_db_connection()
+    purged = 0
+
+    while stop is None or not stop.is_set():
+        rows = conn.execute(f'''
+            SELECT rowid AS _rowid, * FROM {table}
+            WHERE timestamp < ?
+            ORDER BY timestamp, rowid
+            LIMIT ?
+        ''', (cutoff, batch_size)).fetchall()
+        if not rows:
+            break
+
+        records = [dict(row) for row in rows]
+        rowids = [record.pop('_rowid') for record in records]
+        if archive:
+            _archive_records(conn, table, records)
+
+        placeholders = ', '.join('?' for _ in rowids)
+        submit_writes([(f'DELETE FROM {table} WHERE rowid IN ({placeholders})', rowids)], wait=True)
+        purged += len(rowids)
+
+    if purged:
+        logger.info(f"[RETENTION] {table}: purged {purged} rows older than {days} days")
+    return purged
+
+def purge_chat_log_partitions(days: int, batch_size: int, archive: bool = True,
+                              stop: Optional[threading.Event] = None) -> int:
+    """archive then drop every monthly partition that ends before the cutoff; a partition is
+    always finished once started, so stop is only checked between months"""
+    cutoff = now_ms() - days * DAY_MS
+    conn = get_db_connection()
+    purged = 0
+
+    for table in chat_log_partitions(until_ms=cutoff):
+        if stop is not None and stop.is_set():
+            break
+        if partitions.partition_bounds(table)[1] > cutoff:
+            continue
+
+        count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        if archive:
+            last_rowid = 0
+            while True:
+                rows = conn.execute(f'''
+                    SELECT rowid AS _rowid, {', '.join(CHAT_LOG_FIELDS)} FROM {table}
+                    WHERE rowid > ?
+                    ORDER BY rowid
+                    LIMIT ?
+                ''', (last_rowid, batch_size)).fetchall()
+                if not rows:
+                    break
+                records = [dict(row) for row in rows]
+                last_rowid = records[-1].pop('_rowid')
+                for record in records:
+                    record.pop('_rowid', None)
+                _archive_records(conn, 'chat_logs', records)
+
+        drop_chat_log_partition(table)
+        purged += count
+
+    # next month has to exist before its first insert
+    ensure_chat_log_partition(partitions.partition_bounds(partitions.partition_name(now_ms()))[1])
+
+    if purged:
+        logger.info(f"[RETENTION] chat_logs: dropped partitions holding {purged} rows older than {days} days")
+    return purged
+
+def purge_hourly_rollups(days: int) -> int:
+    """hourly buckets are only needed for recent windows; daily rollups are kept"""
+    cutoff = rollups.bucket_start(now_ms() - days * DAY_MS, 'day')
+    submit_writes([
+        (f"DELETE FROM {table} WHERE bucket = 'hour' AND bucket_start < ?", (cutoff,))
+        for table in rollups.ROLLUP_TABLES
+    ], wait=True)
+    return cutoff
+
+def purge_payload_blobs() -> int:
+    """drop blobs nothing has referenced since the longest policy expired; rows keep
+    re-upserting last_seen, so any blob older than that has no live references"""
+    policies = retention_policies()
+    if min(policies.values()) <= 0:
+        return 0
+    policies['chat_logs'] += PARTITION_SLACK_DAYS
+    cutoff = now_ms() - (max(policies.values()) + 1) * DAY_MS
+    conn = get_db_connection()
+    expired = conn.execute('SELECT COUNT(*) FROM payload_blobs WHERE last_seen < ?', (cutoff,)).fetchone()[0]
+    if expired:
+        submit_writes(payloads.garbage_collect_statements(cutoff), wait=True)
+        logger.info(f"[RETENTION] payload_blobs: purged {expired} unreferenced blobs")
+    return expired
+
+def incremental_vacuum(pages: int) -> int:
+    conn = get_db_connection()
+    free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if free_before:
+        # the sqlite3 module steps a pragma only once, which frees a single page per
+        # execute, so release them one at a time inside a single short transaction
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for _ in range(min(free_before, pages)):
+                conn.execute('PRAGMA incremental_vacuum(1)')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    freed = free_before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if freed:
+        logger.info(f"[RETENTION] incremental vacuum released {freed} pages")
+    return freed
+
+def run_retention(stop: Optional[threading.Event] = None) -> Dict[str, int]:
+    """one retention pass over every table with a policy"""
+    stats: Dict[str, int] = {}
+    for table, days in retention_policies().items():
+        if days > 0 and table == 'chat_logs':
+            stats[table] = purge_chat_log_partitions(days, settings.retention_batch_size, settings.archive_enabled, stop)
+        elif days > 0:
+            stats[table] = purge_table(table, days, settings.retention_batch_size, settings.archive_enabled, stop)
+    if settings.retention_hourly_rollups_days > 0:
+        purge_hourly_rollups(settings.retention_hourly_rollups_days)
+    stats['payload_blobs'] = purge_payload_blobs()
+    stats['vacuumed_pages'] = incremental_vacuum(settings.retention_vacuum_pages)
+    return stats
+
+class RetentionJob:
+    """background thread that runs a retention pass every interval, in the worker holding jobs_lock only;
+    two workers purging the same file would archive the same rows twice"""
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-retention", daemon=True)
+        self._thread.start()
+        logger.info(f"[RETENTION] job started (interval: {self.interval_seconds}s, policies: {retention_policies()})")
+
+    def stop(self, timeout: float = 30.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not jobs_lock.acquire():
+                self._stop.wait(self.interval_seconds)
+                continue
+            started = time.time()
+            try:
+                stats = run_retention(self._stop)
+                logger.info(f"[RETENTION] pass finished in {time.time() - started:.2f}s: {stats}")
+            except Exception as e:
+                logger.error(f"[RETENTION] pass failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+retention_job = RetentionJob(settings.retention_interval_seconds)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="archive and purge expired conversation data")
+    parser.add_argument("command", choices=["run"], help="run a single retention pass")
+    parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from .database import init_database, stop_write_queue, close_db_connections
+
+    init_database()
+    if not jobs_lock.acquire():
+        parser.exit(1, f"another process holds {jobs_lock.path} and runs retention; not starting a second pass\n")
+    stats = run_retention()
+    stop_write_queue()
+    close_db_connections()
+    logger.info(f"[RETENTION] {stats}")
+
+if __name__ == "__main__":
+    main()
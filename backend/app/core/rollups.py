@@ -0,0 +1,258 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import argparse
+import logging
+import re
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+Statement = Tuple[str, Sequence[Any]]
+
+BUCKET_SIZES = {
+    'hour': 3600000,
+    'day': 86400000
+}
+
+# upper bounds in seconds; the last histogram column counts everything slower
+RESPONSE_TIME_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+HISTOGRAM_COLUMNS = [f'hist_{i}' for i in range(len(RESPONSE_TIME_BUCKETS) + 1)]
+
+MAX_QUERY_LENGTH = 200
+
+ROLLUP_SCHEMAS = [
+    f'''
+        CREATE TABLE IF NOT EXISTS chat_log_rollups (
+            bucket TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            query_count INTEGER NOT NULL DEFAULT 0,
+            response_time_count INTEGER NOT NULL DEFAULT 0,
+            response_time_sum REAL NOT NULL DEFAULT 0,
+            {', '.join(f'{column} INTEGER NOT NULL DEFAULT 0' for column in HISTOGRAM_COLUMNS)},
+            first_ts INTEGER,
+            last_ts INTEGER,
+            PRIMARY KEY (bucket, bucket_start)
+        ) WITHOUT ROWID
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS chat_log_rollup_sessions (
+            bucket TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            session_id TEXT NOT NULL,
+            PRIMARY KEY (bucket, bucket_start, session_id)
+        ) WITHOUT ROWID
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS chat_log_rollup_queries (
+            bucket TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            query TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, bucket_start, query)
+        ) WITHOUT ROWID
+    '''
+]
+
+ROLLUP_TABLES = ('chat_log_rollups', 'chat_log_rollup_sessions', 'chat_log_rollup_queries')
+
+def normalize_query(query: Optional[str], max_length: Optional[int] = MAX_QUERY_LENGTH) -> str:
+    """case- and whitespace-insensitive form used to group popular queries (and to key cached answers)"""
+    if not query:
+        return ''
+    normalized = re.sub(r'\s+', ' ', query.lower()).strip().rstrip('?!.').strip()
+    return normalized[:max_length]
+
+def histogram_index(response_time: Optional[float]) -> Optional[int]:
+    if response_time is None:
+        return None
+    for i, bound in enumerate(RESPONSE_TIME_BUCKETS):
+        if response_time < bound:
+            return i
+    return len(RESPONSE_TIME_BUCKETS)
+
+def bucket_start(timestamp_ms: int, bucket: str) -> int:
+    size = BUCKET_SIZES[bucket]
+    return timestamp_ms // size * size
+
+def register_functions(conn: sqlite3.Connection):
+    conn.create_function('normalize_query', 1, normalize_query, deterministic=True)
+
+_UPSERT_ROLLUP = f'''
+    INSERT INTO chat_log_rollups
+    (bucket, bucket_start, query_count, response_time_count, response_time_sum, {', '.join(HISTOGRAM_COLUMNS)}, first_ts, last_ts)
+    VALUES (?, ?, 1, ?, ?, {', '.join('?' for _ in HISTOGRAM_COLUMNS)}, ?, ?)
+    ON CONFLICT (bucket, bucket_start) DO UPDATE SET
+        query_count = query_count + 1,
+        response_time_count = response_time_count + excluded.response_time_count,
+        response_time_sum = response_time_sum + excluded.response_time_sum,
+        {', '.join(f'{column} = {column} + excluded.{column}' for column in HISTOGRAM_COLUMNS)},
+        first_ts = MIN(first_ts, excluded.first_ts),
+        last_ts = MAX(last_ts, excluded.last_ts)
+'''
+
+_INSERT_SESSION = '''
+    INSERT OR IGNORE INTO chat_log_rollup_sessions (bucket, bucket_start, session_id)
+    VALUES (?, ?, ?)
+'''
+
+_UPSERT_QUERY = '''
+    INSERT INTO chat_log_rollup_queries (bucket, bucket_start, query, count)
+    VALUES (?, ?, ?, 1)
+    ON CONFLICT (bucket, bucket_start, query) DO UPDATE SET count = count + 1
+'''
+
+def rollup_statements(timestamp_ms: int, session_id: str, user_query: str,
+                      response_time: Optional[float]) -> List[Statement]:
+    """upserts that fold one chat log into every rollup bucket; queued with the log insert"""
+    slot = histogram_index(response_time)
+    histogram = [1 if i == slot else 0 for i in range(len(HISTOGRAM_COLUMNS))]
+    query = normalize_query(user_query)
+
+    statements: List[Statement] = []
+    for bucket in BUCKET_SIZES:
+        start = bucket_start(timestamp_ms, bucket)
+        statements.append((_UPSERT_ROLLUP, (
+            bucket, start, 0 if response_time is None else 1, response_time or 0.0,
+            *histogram, timestamp_ms, timestamp_ms
+        )))
+        statements.append((_INSERT_SESSION, (bucket, start, session_id)))
+        statements.append((_UPSERT_QUERY, (bucket, start, query)))
+    return statements
+
+def _histogram_sql() -> str:
+    columns = []
+    lower = None
+    for bound in RESPONSE_TIME_BUCKETS:
+        condition = f'response_time < {bound}' if lower is None else f'response_time >= {lower} AND response_time < {bound}'
+        columns.append(f'COALESCE(SUM({condition}), 0)')
+        lower = bound
+    columns.append(f'COALESCE(SUM(response_time >= {lower}), 0)')
+    return ', '.join(columns)
+
+def rebuild_statements(start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                       tables: Sequence[str] = ('chat_logs',)) -> List[Statement]:
+    """drop and re-aggregate every rollup bucket that starts in [start_ms, end_ms) from raw chat logs;
+    tables are monthly partitions, which never split an hour or day bucket"""
+    statements: List[Statement] = []
+    for bucket, size in BUCKET_SIZES.items():
+        low = bucket_start(start_ms, bucket) if start_ms is not None else -1
+        high = -(-end_ms // size) * size if end_ms is not None else 2 ** 62
+        bounds = (bucket, low, high)
+        log_range = (low, high)
+
+        for table in ROLLUP_TABLES:
+            statements.append((f'DELETE FROM {table} WHERE bucket = ? AND bucket_start >= ? AND bucket_start < ?', bounds))
+
+        for source in tables:
+            statements.append((f'''
+                INSERT INTO chat_log_rollups
+                (bucket, bucket_start, query_count, response_time_count, response_time_sum, {', '.join(HISTOGRAM_COLUMNS)}, first_ts, last_ts)
+                SELECT '{bucket}', timestamp / {size} * {size} AS start, COUNT(*), COUNT(response_time), TOTAL(response_time),
+                       {_histogram_sql()}, MIN(timestamp), MAX(timestamp)
+                FROM {source}
+                WHERE timestamp >= ? AND timestamp < ?
+                GROUP BY start
+            ''', log_range))
+            statements.append((f'''
+                INSERT INTO chat_log_rollup_sessions (bucket, bucket_start, session_id)
+                SELECT DISTINCT '{bucket}', timestamp / {size} * {size}, session_id
+                FROM {source}
+                WHERE timestamp >= ? AND timestamp < ?
+            ''', log_range))
+            statements.append((f'''
+                INSERT INTO chat_log_rollup_queries (bucket, bucket_start, query, count)
+                SELECT '{bucket}', timestamp / {size} * {size} AS start, normalize_query(user_query) AS query, COUNT(*)
+                FROM {source}
+                WHERE timestamp >= ? AND timestamp < ?
+                GROUP BY start, query
+            ''', log_range))
+    return statements
+
+def clear_statements() -> List[Statement]:
+    return [(f'DELETE FROM {table}', ()) for table in ROLLUP_TABLES]
+
+def rollup_ranges(since_ms: int, until_ms: int, hourly_since_ms: Optional[int] = None) -> List[Tuple[str, int, int]]:
+    """cover [since, until) with hourly buckets up to the first day boundary and daily buckets after it.
+    hourly buckets before hourly_since_ms may have been purged, so a window starting earlier is
+    rounded down to the day and read from daily buckets only"""
+    hour, day = BUCKET_SIZES['hour'], BUCKET_SIZES['day']
+    if hourly_since_ms is not None and since_ms < hourly_since_ms:
+        since_ms = since_ms // day * day
+    start = since_ms // hour * hour
+    first_day = -(-start // day) * day
+    ranges = []
+    if start < first_day:
+        ranges.append(('hour', start, min(first_day, until_ms)))
+    if first_day < until_ms:
+        ranges.append(('day', first_day, until_ms))
+    return ranges
+
+def _range_filter(ranges: List[Tuple[str, int, int]]) -> Tuple[str, List[Any]]:
+    clauses = ' OR '.join('(bucket = ? AND bucket_start >= ? AND bucket_start < ?)' for _ in ranges)
+    return f'({clauses})' if ranges else '0', [value for bounds in ranges for value in bounds]
+
+def read_analytics(conn: sqlite3.Connection, since_ms: int, until_ms: int, top_queries: int = 10,
+                   hourly_since_ms: Optional[int] = None) -> Dict[str, Any]:
+    where, params = _range_filter(rollup_ranges(since_ms, until_ms, hourly_since_ms))
+
+    totals = conn.execute(f'''
+        SELECT COALESCE(SUM(query_count), 0) AS total_queries,
+               COALESCE(SUM(response_time_count), 0) AS response_time_count,
+               COALESCE(SUM(response_time_sum), 0) AS response_time_sum,
+               {', '.join(f'COALESCE(SUM({column}), 0) AS {column}' for column in HISTOGRAM_COLUMNS)},
+               MIN(first_ts) AS first_ts,
+               MAX(last_ts) AS last_ts
+        FROM chat_log_rollups
+        WHERE {where}
+    ''', params).fetchone()
+
+    unique_sessions = conn.execute(f'''
+        SELECT COUNT(DISTINCT session_id) FROM chat_log_rollup_sessions WHERE {where}
+    ''', params).fetchone()[0]
+
+    popular = conn.execute(f'''
+        SELECT query, SUM(count) AS count
+        FROM chat_log_rollup_queries
+        WHERE {where}
+        GROUP BY query
+        ORDER BY count DESC, query ASC
+        LIMIT ?
+    ''', [*params, top_queries]).fetchall()
+
+    bounds = [0.0, *RESPONSE_TIME_BUCKETS]
+    histogram = [
+        {'min_seconds': bounds[i], 'max_seconds': RESPONSE_TIME_BUCKETS[i] if i < len(RESPONSE_TIME_BUCKETS) else None,
+         'count': totals[column]}
+        for i, column in enumerate(HISTOGRAM_COLUMNS)
+    ]
+
+    return {
+        'total_queries': totals['total_queries'],
+        'avg_response_time': totals['response_time_sum'] / totals['response_time_count'] if totals['response_time_count'] else 0,
+        'unique_sessions': unique_sessions,
+        'first_ts': totals['first_ts'],
+        'last_ts': totals['last_ts'],
+        'popular_queries': [{'query': row['query'], 'count': row['count']} for row in popular],
+        'response_time_histogram': histogram
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="rebuild chat log analytics rollups from raw chat_logs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill = subparsers.add_parser("backfill", help="re-aggregate rollups for existing chat logs")
+    backfill.add_argument("--days", type=int, default=None, help="only rebuild the most recent N days (default: everything)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from .database import init_database, submit_writes, stop_write_queue, close_db_connections, now_ms, rollup_rebuild_statements
+
+    init_database()
+    start = None
+    if args.days is not None:
+        start = bucket_start(now_ms() - args.days * BUCKET_SIZES['day'], 'day')
+    submit_writes(rollup_rebuild_statements(start, None), wait=True)
+    stop_write_queue()
+    close_db_connections()
+    logger.info(f"[ROLLUPS] backfill complete ({'all history' if start is None else f'since {start}'})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+from typing import Any, Dict, List, Optional, Set
+from collections import OrderedDict, deque
+import logging
+import threading
+import time
+from cache_service import CacheService, cache
+from .config import settings
+from .database import on_message_committed
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# rough per-message bookkeeping (dict, deque slot, role string) on top of the content bytes
+MESSAGE_OVERHEAD_BYTES = 160
+
+class _SessionEntry:
+    __slots__ = ('messages', 'bytes', 'loaded_at')
+
+    def __init__(self, max_messages: int):
+        self.messages: deque = deque(maxlen=max_messages)
+        self.bytes = 0
+        self.loaded_at = time.monotonic()
+
+def _message_bytes(message: Dict[str, str]) -> int:
+    return len(message['content'].encode()) + MESSAGE_OVERHEAD_BYTES
+
+class SessionContextStore:
+    """bounded lru of the most recent turns per session, loaded from the conversations table on a miss;
+    capped by session count and total bytes across all sessions. every committed turn is logged as a
+    'session' invalidation in the cache's shared tier, and the other workers drop that session before
+    their next read of it; without a shared tier entries are reloaded after ttl_seconds instead"""
+    def __init__(self, max_sessions: int = 10000, max_messages: int = 6, max_bytes: int = 16777216,
+                 ttl_seconds: float = 600, invalidations: Optional[CacheService] = None):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self._bytes = 0
+        self.invalidations = invalidations
+        # sessions other workers wrote to, filled from a cache thread and applied on the next read
+        self._stale: Set[str] = set()
+        self._stale_lock = threading.Lock()
+        if invalidations is not None:
+            invalidations.add_invalidation_listener("session", self._mark_stale)
+            on_message_committed(self._publish)
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "evicted_bytes": 0,
+            "invalidations": 0,
+            "remote_invalidations": 0
+        }
+
+    async def get_context(self, session_id: str) -> List[Dict[str, str]]:
+        """the last max_messages turns, oldest first"""
+        if self.invalidations is not None:
+            await self.invalidations.sync_invalidations()
+            self._drop_stale()
+        entry = self._sessions.get(session_id)
+        if entry is not None and self.ttl_seconds and time.monotonic() - entry.loaded_at > self.ttl_seconds:
+            # another worker may have answered this session since we loaded it
+            self._stats["expired"] += 1
+            self._drop(session_id)
+            entry = None
+
+        if entry is not None:
+            self._stats["hits"] += 1
+            self._sessions.move_to_end(session_id)
+            return list(entry.messages)
+
+        self._stats["misses"] += 1
+        history = await get_storage().get_recent_messages(session_id, self.max_messages)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = self._insert(session_id)
+            for message in history:
+                self._push(entry, message['role'], message['content'])
+            self._evict()
+        return list(entry.messages)
+
+    def append(self, session_id: str, role: str, content: str):
+        """record a turn for a session that is already cached; uncached sessions load from storage on next use"""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return
+        self._push(entry, role, content)
+        self._sessions.move_to_end(session_id)
+        self._evict()
+
+    def invalidate(self, session_id: str):
+        """drop the session here and in the other workers; call it once storage has the change"""
+        if self._drop(session_id):
+            self._stats["invalidations"] += 1
+        self._publish(session_id)
+
+    def clear(self):
+        self._sessions.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0
+        }
+
+    def _publish(self, session_id: str):
+        if self.invalidations is not None:
+            self.invalidations.log_invalidation("session", session_id)
+
+    def _mark_stale(self, session_id: str):
+        with self._stale_lock:
+            self._stale.add(session_id)
+
+    def _drop_stale(self):
+        if not self._stale:
+            return
+        with self._stale_lock:
+            stale, self._stale = self._stale, set()
+        for session_id in stale:
+            if self._drop(session_id):
+                self._stats["remote_invalidations"] += 1
+
+    def _insert(self, session_id: str) -> _SessionEntry:
+        entry = _SessionEntry(self.max_messages)
+        self._sessions[session_id] = entry
+        return entry
+
+    def _push(self, entry: _SessionEntry, role: str, content: str):
+        message = {'role': role, 'content': content}
+        if len(entry.messages) == entry.messages.maxlen:
+            dropped = _message_bytes(entry.messages[0])
+            entry.bytes -= dropped
+            self._bytes -= dropped
+        entry.messages.append(message)
+        size = _message_bytes(message)
+        entry.bytes += size
+        self._bytes += size
+
+    def _drop(self, session_id: str) -> bool:
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.bytes
+        return True
+
+    def _evict(self):
+        # the most recently used session always stays, even if it alone exceeds max_bytes
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            session_id, entry = self._sessions.popitem(last=False)
+            self._bytes -= entry.bytes
+            self._stats["evictions"] += 1
+            self._stats["evicted_bytes"] += entry.bytes
+            logger.debug(f"[SESSION_CONTEXT] evicted {session_id} ({entry.bytes} bytes)")
+
+session_context = SessionContextStore(
+    settings.session_context_max_sessions,
+    settings.session_context_max_messages,
+    settings.session_context_max_bytes,
+    settings.session_context_ttl_seconds,
+    cache
+)
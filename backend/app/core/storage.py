@@ -0,0 +1,719 @@
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+from .config import settings
+from .database import (
+    ConversationManager, ToolExecutionManager, ChatLogManager, run_db, init_database, close_db_connections,
+    stop_write_queue, shutdown_db_executor, get_write_queue, jobs_lock, message_committed, now_ms, ms_to_datetime, ms_to_string, encode_log_cursor, search_terms,
+    CHAT_LOG_FIELDS, CHAT_LOG_DETAIL_FIELDS, CHAT_LOG_JSON_FIELDS, CHAT_LOG_SUMMARY_FIELDS,
+    SEARCH_ORDERS, SNIPPET_MARKERS, SNIPPET_TOKENS
+)
+from .replica import analytics_replica, analytics_connection, run_analytics, shutdown_analytics
+from . import rollups
+
+logger = logging.getLogger(__name__)
+
+LogKey = Tuple[int, str]
+
+class StorageBackend(ABC):
+    """async persistence interface used by the routes and the agent; read methods log
+    and return empty results on failure, write methods raise"""
+    name = 'base'
+
+    async def startup(self, background_jobs: bool = True):
+        """open the backend; one-shot tools pass background_jobs=False to skip retention and replica threads"""
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @abstractmethod
+    async def save_message(self, session_id: str, message_id: str, role: str, content: str,
+                           metadata: Optional[Dict] = None):
+        ...
+
+    @abstractmethod
+    async def get_conversation_history(self, session_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get_recent_messages(self, session_id: str, limit: int = 6) -> List[Dict[str, str]]:
+        ...
+
+    @abstractmethod
+    async def clear_conversation(self, session_id: str):
+        ...
+
+    @abstractmethod
+    async def log_execution(self, session_id: str, tool_name: str, input_data: Any, output_data: Any,
+                            execution_time: float, success: bool = True):
+        ...
+
+    @abstractmethod
+    async def get_tool_analytics(self, session_id: Optional[str] = None,
+                                 tool_name: Optional[str] = None) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def save_chat_log(self, log_id: str, session_id: str, user_query: str, final_response: str,
+                            tools_used: List[Dict], modal_actions: List[Dict], suggestions: List[str],
+                            response_time: float, user_ip: Optional[str] = None, user_agent: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    async def get_chat_logs(self, session_id: Optional[str] = None, limit: int = 100, before: Optional[LogKey] = None,
+                            after: Optional[LogKey] = None,
+                            fields: Sequence[str] = CHAT_LOG_DETAIL_FIELDS) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get_chat_log(self, log_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def iter_chat_logs(self, session_id: Optional[str] = None, since_ms: Optional[int] = None,
+                       until_ms: Optional[int] = None, fields: Sequence[str] = CHAT_LOG_DETAIL_FIELDS,
+                       batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    async def search_chat_logs(self, query: str, limit: int = 20, since_ms: Optional[int] = None,
+                               until_ms: Optional[int] = None, session_id: Optional[str] = None,
+                               order: str = 'rank') -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get_chat_analytics(self, days: int = 30, top_queries: int = 10) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def clear_chat_logs(self, session_id: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    async def get_usage_metrics(self, since_ms: int) -> Dict[str, Any]:
+        """{"conversations": {unique_sessions, total_messages, avg_message_length}, "tools": [...]} since since_ms"""
+        ...
+
+    @abstractmethod
+    async def get_performance_metrics(self, since_ms: int) -> Dict[str, Any]:
+        """tool execution time avg/min/max and count since since_ms"""
+        ...
+
+    @abstractmethod
+    async def health_stats(self) -> Dict[str, Any]:
+        """total_conversations plus whatever the backend reports about its own machinery"""
+        ...
+
+class SQLiteStorage(StorageBackend):
+    """the local sqlite database; every call runs the blocking manager on the db executor"""
+    name = 'sqlite'
+
+    async def startup(self, background_jobs: bool = True):
+        init_database()
+        if not background_jobs:
+            return
+        if settings.retention_enabled:
+            from .retention import retention_job
+            retention_job.start()
+        if settings.analytics_replica_enabled:
+            analytics_replica.start()
+
+    async def shutdown(self):
+        from .retention import retention_job
+        retention_job.stop()
+        shutdown_analytics()
+        jobs_lock.release()
+        stop_write_queue()
+        shutdown_db_executor()
+        close_db_connections()
+
+    async def save_message(self, session_id, message_id, role, content, metadata=None):
+        await run_db(ConversationManager.save_message, session_id, message_id, role, content, metadata)
+
+    async def get_conversation_history(self, session_id, limit=50):
+        return await run_db(ConversationManager.get_conversation_history, session_id, limit)
+
+    async def get_recent_messages(self, session_id, limit=6):
+        return await run_db(ConversationManager.get_recent_messages, session_id, limit)
+
+    async def clear_conversation(self, session_id):
+        await run_db(ConversationManager.clear_conversation, session_id)
+
+    async def log_execution(self, session_id, tool_name, input_data, output_data, execution_time, success=True):
+        await run_db(ToolExecutionManager.log_execution, session_id, tool_name, input_data, output_data,
+                     execution_time, success)
+
+    async def get_tool_analytics(self, session_id=None, tool_name=None):
+        return await run_db(ToolExecutionManager.get_tool_analytics, session_id, tool_name)
+
+    async def save_chat_log(self, log_id, session_id, user_query, final_response, tools_used, modal_actions,
+                            suggestions, response_time, user_ip=None, user_agent=None):
+        await run_db(ChatLogManager.save_chat_log, log_id, session_id, user_query, final_response, tools_used,
+                     modal_actions, suggestions, response_time, user_ip, user_agent)
+
+    async def get_chat_logs(self, session_id=None, limit=100, before=None, after=None, fields=CHAT_LOG_DETAIL_FIELDS):
+        return await run_db(ChatLogManager.get_chat_logs, session_id, limit, before, after, fields)
+
+    async def get_chat_log(self, log_id):
+        return await run_db(ChatLogManager.get_chat_log, log_id)
+
+    async def iter_chat_logs(self, session_id=None, since_ms=None, until_ms=None, fields=CHAT_LOG_DETAIL_FIELDS,
+                             batch_size=500):
+        batches = ChatLogManager.iter_chat_logs(session_id, since_ms, until_ms, fields, batch_size)
+        while True:
+            batch = await run_db(next, batches, None)
+            if batch is None:
+                return
+            yield batch
+
+    async def search_chat_logs(self, query, limit=20, since_ms=None, until_ms=None, session_id=None, order='rank'):
+        return await run_db(ChatLogManager.search_chat_logs, query, limit, since_ms, until_ms, session_id, order)
+
+    async def get_chat_analytics(self, days=30, top_queries=10):
+        return await run_analytics(lambda: ChatLogManager.get_chat_analytics(days, analytics_connection(), top_queries))
+
+    async def clear_chat_logs(self, session_id=None):
+        await run_db(ChatLogManager.clear_chat_logs, session_id)
+
+    async def get_usage_metrics(self, since_ms):
+        conversation_stats, tool_stats = await run_analytics(_sqlite_usage_stats, since_ms)
+        return _usage_metrics(conversation_stats, tool_stats)
+
+    async def get_performance_metrics(self, since_ms):
+        return _performance_metrics(await run_analytics(_sqlite_performance_stats, since_ms))
+
+    async def health_stats(self):
+        return {
+            "backend": self.name,
+            "total_conversations": await run_analytics(_sqlite_conversation_count),
+            "write_queue": get_write_queue().stats(),
+            "analytics_replica": analytics_replica.stats()
+        }
+
+def _sqlite_usage_stats(since_ms: int):
+    cursor = analytics_connection().cursor()
+    cursor.execute("""
+        SELECT COUNT(DISTINCT session_id) as unique_sessions,
+               COUNT(*) as total_messages,
+               AVG(LENGTH(content)) as avg_message_length
+        FROM conversations 
+        WHERE timestamp > ?
+    """, (since_ms,))
+    conversation_stats = cursor.fetchone()
+
+    cursor.execute("""
+        SELECT tool_name, COUNT(*) as execution_count,
+               AVG(execution_time) as avg_execution_time,
+               SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as success_count
+        FROM tool_executions 
+        WHERE timestamp > ?
+        GROUP BY tool_name
+        ORDER BY execution_count DESC
+    """, (since_ms,))
+    return conversation_stats, cursor.fetchall()
+
+def _sqlite_performance_stats(since_ms: int):
+    return analytics_connection().execute("""
+        SELECT AVG(execution_time) as avg_time,
+               MIN(execution_time) as min_time,
+               MAX(execution_time) as max_time,
+               COUNT(*) as total_executions
+        FROM tool_executions
+        WHERE timestamp > ?
+    """, (since_ms,)).fetchone()
+
+def _sqlite_conversation_count() -> int:
+    return analytics_connection().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+def _usage_metrics(conversation_stats: Sequence[Any], tool_stats: Sequence[Sequence[Any]]) -> Dict[str, Any]:
+    """rows shaped (sessions, messages, avg length) and (tool, executions, avg time, successes) on both backends"""
+    return {
+        "conversations": {
+            "unique_sessions": conversation_stats[0] or 0,
+            "total_messages": conversation_stats[1] or 0,
+            "avg_message_length": round(conversation_stats[2] or 0, 2)
+        },
+        "tools": [
+            {
+                "name": row[0],
+                "executions": row[1],
+                "avg_time": round(row[2] or 0, 3),
+                "success_rate": round((row[3] / row[1]) * 100, 2)
+            } for row in tool_stats
+        ]
+    }
+
+def _performance_metrics(row: Sequence[Any]) -> Dict[str, Any]:
+    return {
+        "avg_execution_time": round(row[0] or 0, 3),
+        "min_execution_time": round(row[1] or 0, 3),
+        "max_execution_time": round(row[2] or 0, 3),
+        "total_executions": row[3] or 0
+    }
+
+NOW_MS_PG = "(extract(epoch from clock_timestamp()) * 1000)::bigint"
+
+# matches rollups.normalize_query closely enough for grouping popular queries
+NORMALIZE_QUERY_PG = (
+    f"left(btrim(rtrim(btrim(regexp_replace(lower(user_query), '\\s+', ' ', 'g')), '?!.')), {rollups.MAX_QUERY_LENGTH})"
+)
+
+# weighted like the sqlite bm25 columns: query matches rank above response matches
+SEARCH_VECTOR_PG = (
+    "(setweight(to_tsvector('english', user_query), 'A') || setweight(to_tsvector('english', final_response), 'B'))"
+)
+
+POSTGRES_SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS conversations (
+        id BIGSERIAL PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        message_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        timestamp BIGINT NOT NULL DEFAULT {NOW_MS_PG},
+        metadata JSONB
+    );
+    CREATE TABLE IF NOT EXISTS tool_executions (
+        id BIGSERIAL PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        tool_name TEXT NOT NULL,
+        input_data JSONB,
+        output_data JSONB,
+        execution_time DOUBLE PRECISION,
+        timestamp BIGINT NOT NULL DEFAULT {NOW_MS_PG},
+        success BOOLEAN DEFAULT TRUE
+    );
+    CREATE TABLE IF NOT EXISTS chat_logs (
+        id TEXT PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        user_query TEXT NOT NULL,
+        final_response TEXT NOT NULL,
+        tools_used JSONB,
+        modal_actions JSONB,
+        suggestions JSONB,
+        response_time DOUBLE PRECISION,
+        timestamp BIGINT NOT NULL DEFAULT {NOW_MS_PG},
+        user_ip TEXT,
+        user_agent TEXT,
+        tool_names TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_conversations_session_timestamp ON conversations(session_id, timestamp, id);
+    CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp);
+    CREATE INDEX IF NOT EXISTS idx_tool_executions_session_timestamp ON tool_executions(session_id, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_tool_executions_timestamp ON tool_executions(timestamp, tool_name);
+    CREATE INDEX IF NOT EXISTS idx_chat_logs_timestamp_id ON chat_logs(timestamp, id);
+    CREATE INDEX IF NOT EXISTS idx_chat_logs_session_timestamp_id ON chat_logs(session_id, timestamp, id);
+    CREATE INDEX IF NOT EXISTS idx_chat_logs_search ON chat_logs USING GIN ({SEARCH_VECTOR_PG});
+'''
+
+# arbitrary key serializing schema creation across workers starting at once
+SCHEMA_LOCK_KEY = 3501
+
+def _decode_pg_log(record: Any, fields: Sequence[str]) -> Dict[str, Any]:
+    log = {'cursor': encode_log_cursor(record['timestamp'], record['id'])}
+    for field in fields:
+        value = record[field]
+        if field in CHAT_LOG_JSON_FIELDS:
+            value = value or []
+        elif field == 'tool_names':
+            value = value.split(',') if value else []
+        elif field == 'timestamp':
+            value = ms_to_datetime(value)
+        log[field] = value
+    return log
+
+def _pg_histogram_sql() -> str:
+    columns = []
+    lower = None
+    for bound, column in zip(rollups.RESPONSE_TIME_BUCKETS, rollups.HISTOGRAM_COLUMNS):
+        condition = f'response_time < {bound}' if lower is None else f'response_time >= {lower} AND response_time < {bound}'
+        columns.append(f'COUNT(*) FILTER (WHERE {condition}) AS {column}')
+        lower = bound
+    columns.append(f'COUNT(*) FILTER (WHERE response_time >= {lower}) AS {rollups.HISTOGRAM_COLUMNS[-1]}')
+    return ', '.join(columns)
+
+def _selected_fields(fields: Sequence[str]) -> List[str]:
+    selected = list(dict.fromkeys(['id', 'timestamp', *fields]))
+    unknown = set(selected) - set(CHAT_LOG_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown chat log fields: {sorted(unknown)}")
+    return selected
+
+class PostgresStorage(StorageBackend):
+    """postgresql through an asyncpg pool, for running /chat on several hosts or workers;
+    json columns are jsonb and timestamps stay epoch milliseconds like the sqlite schema"""
+    name = 'postgres'
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+
+    @staticmethod
+    async def _init_connection(conn):
+        await conn.set_type_codec('jsonb', encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+    async def startup(self, background_jobs: bool = True):
+        # optional dependency, only needed when STORAGE_BACKEND=postgres
+        import asyncpg
+
+        self._pool = await asyncpg.create_pool(
+            self.dsn, min_size=self.min_size, max_size=self.max_size, init=self._init_connection
+        )
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute('SELECT pg_advisory_xact_lock($1)', SCHEMA_LOCK_KEY)
+                await conn.execute(POSTGRES_SCHEMA)
+        logger.info(f"[STORAGE] postgres pool ready (size: {self.min_size}-{self.max_size})")
+
+    async def shutdown(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def save_message(self, session_id, message_id, role, content, metadata=None):
+        try:
+            await self._pool.execute('''
+                INSERT INTO conversations (session_id, message_id, role, content, metadata, timestamp)
+                VALUES ($1, $2, $3, $4, $5, $6)
+            ''', session_id, message_id, role, content, metadata or None, now_ms())
+            # committed as soon as execute returns; sqlite reports its turns from the writer
+            message_committed(session_id)
+            logger.debug(f"saved message {message_id} for session {session_id}")
+        except Exception as e:
+            logger.error(f"failed to save message: {e}")
+            raise
+
+    async def get_conversation_history(self, session_id, limit=50):
+        try:
+            rows = await self._pool.fetch('''
+                SELECT message_id, role, content, timestamp, metadata
+                FROM conversations
+                WHERE session_id = $1
+                ORDER BY timestamp ASC, id ASC
+                LIMIT $2
+            ''', session_id, limit)
+            return [{
+                'id': row['message_id'],
+                'role': row['role'],
+                'content': row['content'],
+                'timestamp': ms_to_datetime(row['timestamp']),
+                'metadata': row['metadata'] or {}
+            } for row in rows]
+        except Exception as e:
+            logger.error(f"failed to get conversation history: {e}")
+            return []
+
+    async def get_recent_messages(self, session_id, limit=6):
+        try:
+            rows = await self._pool.fetch('''
+                SELECT role, content FROM conversations
+                WHERE session_id = $1
+                ORDER BY timestamp DESC, id DESC
+                LIMIT $2
+            ''', session_id, limit)
+            return [{'role': row['role'], 'content': row['content']} for row in reversed(rows)]
+        except Exception as e:
+            logger.error(f"failed to get recent messages: {e}")
+            return []
+
+    async def clear_conversation(self, session_id):
+        try:
+            async with self._pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute('DELETE FROM conversations WHERE session_id = $1', session_id)
+                    await conn.execute('DELETE FROM tool_executions WHERE session_id = $1', session_id)
+            logger.info(f"cleared conversation for session {session_id}")
+        except Exception as e:
+            logger.error(f"failed to clear conversation: {e}")
+            raise
+
+    async def log_execution(self, session_id, tool_name, input_data, output_data, execution_time, success=True):
+        try:
+            await self._pool.execute('''
+                INSERT INTO tool_executions
+                (session_id, tool_name, input_data, output_data, execution_time, success, timestamp)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ''', session_id, tool_name, input_data or None, output_data or None, execution_time, success, now_ms())
+            logger.debug(f"logged tool execution: {tool_name} for session {session_id}")
+        except Exception as e:
+            logger.error(f"failed to log tool execution: {e}")
+
+    async def get_tool_analytics(self, session_id=None, tool_name=None):
+        try:
+            conditions, params = [], []
+            if session_id:
+                params.append(session_id)
+                conditions.append(f'session_id = ${len(params)}')
+            if tool_name:
+                params.append(tool_name)
+                conditions.append(f'tool_name = ${len(params)}')
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            rows = await self._pool.fetch(f'SELECT * FROM tool_executions {where} ORDER BY timestamp DESC', *params)
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"failed to get tool analytics: {e}")
+            return []
+
+    async def save_chat_log(self, log_id, session_id, user_query, final_response, tools_used, modal_actions,
+                            suggestions, response_time, user_ip=None, user_agent=None):
+        try:
+            await self._pool.execute('''
+                INSERT INTO chat_logs
+                (id, session_id, user_query, final_response, tools_used, modal_actions, suggestions,
+                 response_time, user_ip, user_agent, timestamp, tool_names)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+            ''',
+                log_id, session_id, user_query, final_response, tools_used or None, modal_actions or None,
+                suggestions or None, response_time, user_ip, user_agent, now_ms(),
+                ','.join(tool['tool_name'] for tool in tools_used) if tools_used else None
+            )
+            logger.info(f"saved chat log {log_id} for session {session_id}")
+        except Exception as e:
+            logger.error(f"failed to save chat log: {e}")
+            raise
+
+    async def get_chat_logs(self, session_id=None, limit=100, before=None, after=None, fields=CHAT_LOG_DETAIL_FIELDS):
+        selected = _selected_fields(fields)
+        try:
+            conditions, params = [], []
+            if session_id:
+                params.append(session_id)
+                conditions.append(f'session_id = ${len(params)}')
+            if before:
+                params.extend(before)
+                conditions.append(f'(timestamp, id) < (${len(params) - 1}, ${len(params)})')
+            if after:
+                params.extend(after)
+                conditions.append(f'(timestamp, id) > (${len(params) - 1}, ${len(params)})')
+
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            order = 'ASC' if after and not before else 'DESC'
+            params.append(limit)
+
+            rows = await self._pool.fetch(f'''
+                SELECT {', '.join(selected)} FROM chat_logs
+                {where}
+                ORDER BY timestamp {order}, id {order}
+                LIMIT ${len(params)}
+            ''', *params)
+            if order == 'ASC':
+                rows.reverse()
+            return [_decode_pg_log(row, selected) for row in rows]
+        except Exception as e:
+            logger.error(f"failed to get chat logs: {e}")
+            return []
+
+    async def get_chat_log(self, log_id):
+        try:
+            row = await self._pool.fetchrow(
+                f"SELECT {', '.join(CHAT_LOG_DETAIL_FIELDS)} FROM chat_logs WHERE id = $1", log_id
+            )
+            return _decode_pg_log(row, CHAT_LOG_DETAIL_FIELDS) if row else None
+        except Exception as e:
+            logger.error(f"failed to get chat log {log_id}: {e}")
+            raise
+
+    async def iter_chat_logs(self, session_id=None, since_ms=None, until_ms=None, fields=CHAT_LOG_DETAIL_FIELDS,
+                             batch_size=500):
+        """a real server-side cursor inside one read-only transaction"""
+        selected = _selected_fields(fields)
+        conditions, params = [], []
+        if session_id:
+            params.append(session_id)
+            conditions.append(f'session_id = ${len(params)}')
+        if since_ms is not None:
+            params.append(since_ms)
+            conditions.append(f'timestamp >= ${len(params)}')
+        if until_ms is not None:
+            params.append(until_ms)
+            conditions.append(f'timestamp < ${len(params)}')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        async with self._pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                cursor = await conn.cursor(f'''
+                    SELECT {', '.join(selected)} FROM chat_logs
+                    {where}
+                    ORDER BY timestamp ASC, id ASC
+                ''', *params)
+                while True:
+                    rows = await cursor.fetch(batch_size)
+                    if not rows:
+                        return
+                    yield [_decode_pg_log(row, selected) for row in rows]
+
+    async def search_chat_logs(self, query, limit=20, since_ms=None, until_ms=None, session_id=None, order='rank'):
+        """tsvector search over the gin expression index, ts_rank_cd ranked, ts_headline snippets"""
+        if order not in SEARCH_ORDERS:
+            raise ValueError(f"unknown search order: {order}")
+        tsquery = ' & '.join(term + (':*' if prefix else '') for term, prefix in search_terms(query))
+
+        params: List[Any] = [tsquery]
+        conditions = [f"{SEARCH_VECTOR_PG} @@ to_tsquery('english', $1)"]
+        if session_id:
+            params.append(session_id)
+            conditions.append(f'session_id = ${len(params)}')
+        if since_ms is not None:
+            params.append(since_ms)
+            conditions.append(f'timestamp >= ${len(params)}')
+        if until_ms is not None:
+            params.append(until_ms)
+            conditions.append(f'timestamp < ${len(params)}')
+        params.append(limit)
+
+        start, end = SNIPPET_MARKERS
+        headline = f"'StartSel={start}, StopSel={end}, MaxWords={SNIPPET_TOKENS}, MinWords={SNIPPET_TOKENS // 3}'"
+        order_by = 'score DESC' if order == 'rank' else 'timestamp DESC, id DESC'
+        try:
+            rows = await self._pool.fetch(f'''
+                SELECT {', '.join(CHAT_LOG_SUMMARY_FIELDS)},
+                       ts_rank_cd({SEARCH_VECTOR_PG}, to_tsquery('english', $1)) AS score,
+                       ts_headline('english', user_query, to_tsquery('english', $1), {headline}) AS query_snippet,
+                       ts_headline('english', final_response, to_tsquery('english', $1), {headline}) AS response_snippet
+                FROM chat_logs
+                WHERE {' AND '.join(conditions)}
+                ORDER BY {order_by}
+                LIMIT ${len(params)}
+            ''', *params)
+            results = []
+            for row in rows:
+                log = _decode_pg_log(row, CHAT_LOG_SUMMARY_FIELDS)
+                log['score'] = row['score']
+                log['query_snippet'] = row['query_snippet']
+                log['response_snippet'] = row['response_snippet']
+                results.append(log)
+            return results
+        except Exception as e:
+            logger.error(f"failed to search chat logs: {e}")
+            return []
+
+    async def get_chat_analytics(self, days=30, top_queries=10):
+        """aggregated from raw rows over the timestamp index; the sqlite rollup tables are not mirrored"""
+        try:
+            since = now_ms() - days * 86400000
+            bounds = [0.0, *rollups.RESPONSE_TIME_BUCKETS]
+            async with self._pool.acquire() as conn:
+                totals = await conn.fetchrow(f'''
+                    SELECT COUNT(*) AS total_queries,
+                           AVG(response_time) AS avg_response_time,
+                           COUNT(DISTINCT session_id) AS unique_sessions,
+                           MIN(timestamp) AS first_ts,
+                           MAX(timestamp) AS last_ts,
+                           {_pg_histogram_sql()}
+                    FROM chat_logs
+                    WHERE timestamp > $1
+                ''', since)
+                popular = await conn.fetch(f'''
+                    SELECT {NORMALIZE_QUERY_PG} AS query, COUNT(*) AS count
+                    FROM chat_logs
+                    WHERE timestamp > $1
+                    GROUP BY 1
+                    ORDER BY count DESC, query ASC
+                    LIMIT $2
+                ''', since, top_queries)
+
+            return {
+                'total_queries': totals['total_queries'],
+                'avg_response_time': round(totals['avg_response_time'] or 0, 3),
+                'unique_sessions': totals['unique_sessions'],
+                'first_query': ms_to_string(totals['first_ts']),
+                'last_query': ms_to_string(totals['last_ts']),
+                'popular_queries': [{'query': row['query'], 'count': row['count']} for row in popular],
+                'response_time_histogram': [
+                    {'min_seconds': bounds[i],
+                     'max_seconds': rollups.RESPONSE_TIME_BUCKETS[i] if i < len(rollups.RESPONSE_TIME_BUCKETS) else None,
+                     'count': totals[column]}
+                    for i, column in enumerate(rollups.HISTOGRAM_COLUMNS)
+                ]
+            }
+        except Exception as e:
+            logger.error(f"failed to get chat analytics: {e}")
+            return {}
+
+    async def clear_chat_logs(self, session_id=None):
+        """deleted in retention_batch_size batches so no single statement holds row locks or bloats the wal
+        for the whole table; rows logged after the call started are kept, like the sqlite backend"""
+        try:
+            conditions = ['timestamp <= $1']
+            params: List[Any] = [now_ms()]
+            if session_id:
+                params.append(session_id)
+                conditions.append(f'session_id = ${len(params)}')
+            params.append(settings.retention_batch_size)
+            deleted = 0
+            while True:
+                status = await self._pool.execute(f'''
+                    DELETE FROM chat_logs WHERE id IN (
+                        SELECT id FROM chat_logs WHERE {' AND '.join(conditions)} LIMIT ${len(params)}
+                    )
+                ''', *params)
+                batch = int(status.split()[-1])
+                deleted += batch
+                if batch < settings.retention_batch_size:
+                    break
+            logger.info(f"cleared {deleted} chat logs" + (f" for session {session_id}" if session_id else ""))
+        except Exception as e:
+            logger.error(f"failed to clear chat logs: {e}")
+            raise
+
+    async def get_usage_metrics(self, since_ms):
+        async with self._pool.acquire() as conn:
+            conversation_stats = await conn.fetchrow('''
+                SELECT COUNT(DISTINCT session_id), COUNT(*), AVG(LENGTH(content))::float
+                FROM conversations
+                WHERE timestamp > $1
+            ''', since_ms)
+            tool_stats = await conn.fetch('''
+                SELECT tool_name, COUNT(*) AS execution_count, AVG(execution_time), COUNT(*) FILTER (WHERE success)
+                FROM tool_executions
+                WHERE timestamp > $1
+                GROUP BY tool_name
+                ORDER BY execution_count DESC
+            ''', since_ms)
+        return _usage_metrics(conversation_stats, tool_stats)
+
+    async def get_performance_metrics(self, since_ms):
+        return _performance_metrics(await self._pool.fetchrow('''
+            SELECT AVG(execution_time), MIN(execution_time), MAX(execution_time), COUNT(*)
+            FROM tool_executions
+            WHERE timestamp > $1
+        ''', since_ms))
+
+    async def health_stats(self):
+        return {
+            "backend": self.name,
+            "total_conversations": await self._pool.fetchval('SELECT COUNT(*) FROM conversations'),
+            "pool": {
+                "size": self._pool.get_size(),
+                "idle": self._pool.get_idle_size(),
+                "min_size": self.min_size,
+                "max_size": self.max_size
+            }
+        }
+
+STORAGE_BACKENDS = ('sqlite', 'postgres')
+
+_storage: Optional[StorageBackend] = None
+
+def create_storage(backend: Optional[str] = None) -> StorageBackend:
+    backend = backend or settings.storage_backend
+    if backend == 'sqlite':
+        return SQLiteStorage()
+    if backend == 'postgres':
+        return PostgresStorage(settings.postgres_dsn, settings.postgres_pool_min_size, settings.postgres_pool_max_size)
+    raise ValueError(f"unknown storage backend: {backend} (expected one of {', '.join(STORAGE_BACKENDS)})")
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+def set_storage(storage: Optional[StorageBackend]):
+    """swap the process-wide backend, e.g. for benchmarks running both implementations"""
+    global _storage
+    _storage = storage
@@ -0,0 +1,234 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+Statement = Tuple[str, Sequence[Any]]
+
+# failed group sequences remembered for waiters; older failures nobody waited on are forgotten
+FAILED_HISTORY = 1024
+
+class WriteQueueFullError(RuntimeError):
+    pass
+
+class WriteFailedError(RuntimeError):
+    pass
+
+class WriteBehindQueue:
+    """bounded queue drained by one writer thread that commits many statement groups per transaction"""
+    def __init__(self, connection_factory: Callable[[], sqlite3.Connection], max_size: int = 10000,
+                 batch_size: int = 256, flush_interval_ms: int = 50,
+                 on_commit: Optional[Callable[[List[Statement]], None]] = None):
+        self.connection_factory = connection_factory
+        # called on the writer thread with the statements of every committed transaction
+        self.on_commit = on_commit
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: "queue.Queue[Optional[Tuple[int, List[Statement]]]]" = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._sequence = 0
+        self._committed_sequence = 0
+        self._failed: "OrderedDict[int, str]" = OrderedDict()
+        self._stopping = False
+        self._stats = {
+            "enqueued_groups": 0,
+            "enqueued_statements": 0,
+            "rejected_groups": 0,
+            "transactions": 0,
+            "committed_statements": 0,
+            "failed_statements": 0,
+            "failed_groups": 0,
+            "max_batch_statements": 0
+        }
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+            self._thread.start()
+        logger.info(f"[WRITE_QUEUE] writer started (batch: {self.batch_size}, window: {self.flush_interval * 1000:.0f}ms)")
+
+    def enqueue(self, statements: List[Statement]) -> int:
+        """queue statements that must commit together; raises WriteQueueFullError instead of blocking"""
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+
+        with self._lock:
+            if self._stopping:
+                raise WriteQueueFullError("write queue is shutting down")
+            self._sequence += 1
+            sequence = self._sequence
+            try:
+                self._queue.put_nowait((sequence, statements))
+            except queue.Full:
+                self._sequence -= 1
+                self._stats["rejected_groups"] += 1
+                logger.error(f"[WRITE_QUEUE] queue full ({self._queue.maxsize} groups), rejecting write")
+                raise WriteQueueFullError(f"write queue full ({self._queue.maxsize} pending groups)")
+            self._stats["enqueued_groups"] += 1
+            self._stats["enqueued_statements"] += len(statements)
+        return sequence
+
+    def wait(self, sequence: int, timeout: Optional[float] = 10.0) -> bool:
+        """block until the group with this sequence was written; False on timeout, WriteFailedError if it was dropped"""
+        return self._wait(sequence - 1, sequence, timeout)
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """block until everything enqueued before this call has been written; False on timeout,
+        WriteFailedError if any group still pending at the call was dropped"""
+        with self._lock:
+            since, target = self._committed_sequence, self._sequence
+        return self._wait(since, target, timeout)
+
+    def _wait(self, since: int, target: int, timeout: Optional[float]) -> bool:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                done = self._committed_sequence >= target
+            else:
+                done = self._committed.wait_for(lambda: self._committed_sequence >= target, timeout)
+            failed = [(sequence, error) for sequence, error in self._failed.items() if since < sequence <= target]
+        if failed:
+            raise WriteFailedError(f"{len(failed)} queued write group(s) were not committed: {failed[-1][1]}")
+        return done
+
+    def stop(self, timeout: float = 30.0):
+        """drain the queue, commit what is left and stop the writer"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping = True
+        self._queue.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.error(f"[WRITE_QUEUE] writer did not stop within {timeout}s, {self._queue.qsize()} groups pending")
+        else:
+            logger.info(f"[WRITE_QUEUE] writer stopped, stats: {self.stats()}")
+        with self._lock:
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pending_groups"] = self._queue.qsize()
+        stats["statements_per_transaction"] = round(
+            stats["committed_statements"] / stats["transactions"], 2) if stats["transactions"] else 0
+        return stats
+
+    def _collect(self, first: Tuple[int, List[Statement]]) -> Tuple[List[Tuple[int, List[Statement]]], bool]:
+        batch = [first]
+        statements = len(first[1])
+        deadline = time.monotonic() + self.flush_interval
+        while statements < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            statements += len(item[1])
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch, stop = self._collect(item)
+            self._commit_safely(batch)
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._commit_safely([item])
+
+    def _commit_safely(self, batch: List[Tuple[int, List[Statement]]]):
+        """the writer thread must outlive any error, or every later waiter blocks until its timeout"""
+        try:
+            self._commit(batch)
+        except Exception as e:
+            logger.error(f"[WRITE_QUEUE] dropped batch of {len(batch)} groups: {e}")
+            self._finish(batch, [(sequence, str(e)) for sequence, _ in batch], 0, 0,
+                         sum(len(group) for _, group in batch), sum(len(group) for _, group in batch))
+
+    def _execute(self, conn: sqlite3.Connection, statements: List[Statement]):
+        """run statements in order, folding consecutive identical sql into executemany"""
+        i = 0
+        while i < len(statements):
+            sql = statements[i][0]
+            j = i
+            while j < len(statements) and statements[j][0] == sql:
+                j += 1
+            if j - i == 1:
+                conn.execute(sql, statements[i][1])
+            else:
+                conn.executemany(sql, [params for _, params in statements[i:j]])
+            i = j
+
+    def _commit(self, batch: List[Tuple[int, List[Statement]]]):
+        conn = self.connection_factory()
+        statements = [statement for _, group in batch for statement in group]
+        committed = len(statements)
+        failed = 0
+        failed_groups: List[Tuple[int, str]] = []
+        transactions = 1
+        try:
+            with conn:
+                self._execute(conn, statements)
+            self._committed_hook(statements)
+        except Exception as e:
+            logger.error(f"[WRITE_QUEUE] batch of {len(batch)} groups failed ({e}), retrying groups individually")
+            committed = 0
+            transactions = 0
+            for sequence, group in batch:
+                try:
+                    with conn:
+                        self._execute(conn, group)
+                    self._committed_hook(group)
+                    committed += len(group)
+                    transactions += 1
+                except Exception as group_error:
+                    failed += len(group)
+                    failed_groups.append((sequence, str(group_error)))
+                    logger.error(f"[WRITE_QUEUE] dropped {len(group)} statements: {group_error}")
+
+        self._finish(batch, failed_groups, transactions, committed, failed, len(statements))
+        logger.debug(f"[WRITE_QUEUE] committed {committed} statements from {len(batch)} groups")
+
+    def _committed_hook(self, statements: List[Statement]):
+        if self.on_commit is None:
+            return
+        try:
+            self.on_commit(statements)
+        except Exception as e:
+            logger.error(f"[WRITE_QUEUE] on_commit hook failed: {e}")
+
+    def _finish(self, batch: List[Tuple[int, List[Statement]]], failed_groups: List[Tuple[int, str]],
+                transactions: int, committed: int, failed: int, statements: int):
+        with self._lock:
+            self._stats["transactions"] += transactions
+            self._stats["committed_statements"] += committed
+            self._stats["failed_statements"] += failed
+            self._stats["failed_groups"] += len(failed_groups)
+            self._stats["max_batch_statements"] = max(self._stats["max_batch_statements"], statements)
+            for sequence, error in failed_groups:
+                self._failed[sequence] = error
+            while len(self._failed) > FAILED_HISTORY:
+                self._failed.popitem(last=False)
+            self._committed_sequence = max(self._committed_sequence, batch[-1][0])
+            self._committed.notify_all()
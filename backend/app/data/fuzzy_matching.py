@@ -0,0 +1,90 @@
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+DEFAULT_PREFIX_LENGTH = 7
+MIN_FUZZY_WORD_LENGTH = 4
+
+def allowed_distance(word: str, max_distance: int) -> int:
+    """short words get fewer edits so 'ai' does not fuzzy-match half the vocabulary"""
+    if len(word) < MIN_FUZZY_WORD_LENGTH:
+        return 0
+    if len(word) < 8:
+        return min(max_distance, 1)
+    return max_distance
+
+def deletes(word: str, max_distance: int, prefix_length: int = DEFAULT_PREFIX_LENGTH) -> Set[str]:
+    """symspell delete variants of the word prefix, including the prefix itself"""
+    prefix = word[:prefix_length]
+    results = {prefix}
+    frontier = {prefix}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for candidate in frontier:
+            if len(candidate) <= 1:
+                continue
+            for i in range(len(candidate)):
+                variant = candidate[:i] + candidate[i + 1:]
+                if variant not in results:
+                    results.add(variant)
+                    next_frontier.add(variant)
+        frontier = next_frontier
+    return results
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """optimal string alignment distance; returns max_distance + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+def lookup(word: str, max_distance: int, prefix_length: int,
+           candidates: Callable[[str], Iterable[str]]) -> List[Tuple[str, int]]:
+    """return the closest vocabulary words within max_distance, best distance only"""
+    max_distance = allowed_distance(word, max_distance)
+    if max_distance == 0:
+        return []
+
+    best = max_distance + 1
+    matches: Dict[str, int] = {}
+    for key in deletes(word, max_distance, prefix_length):
+        for candidate in candidates(key):
+            if candidate in matches or candidate == word:
+                continue
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                matches[candidate] = distance
+                best = min(best, distance)
+
+    return sorted((candidate, distance) for candidate, distance in matches.items() if distance == best)
+
+class DeletionDictionary:
+    """in-memory symspell dictionary mapping delete variants to vocabulary words"""
+    def __init__(self, words: Iterable[str], max_distance: int = 2, prefix_length: int = DEFAULT_PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.entries: Dict[str, List[str]] = {}
+        for word in sorted(set(words)):
+            if len(word) < MIN_FUZZY_WORD_LENGTH - max_distance:
+                continue
+            for key in deletes(word, max_distance, prefix_length):
+                self.entries.setdefault(key, []).append(word)
+
+    def candidates(self, key: str) -> Iterable[str]:
+        return self.entries.get(key, ())
+
+    def lookup(self, word: str, max_distance: int) -> List[Tuple[str, int]]:
+        return lookup(word, min(max_distance, self.max_distance), self.prefix_length, self.candidates)
@@ -0,0 +1,262 @@
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
+from collections import Counter, deque
+from dataclasses import dataclass, field
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from .knowledge_base import KnowledgeChunk, KNOWLEDGE_BASE, tokenize_query
+from .knowledge_index import KnowledgeIndex, build_knowledge_index
+
+logger = logging.getLogger(__name__)
+
+SOURCE_EXTENSIONS = ('.md', '.markdown', '.txt')
+DEFAULT_CATEGORY = 'documents'
+DEFAULT_MAX_CHARS = 800
+DEFAULT_OVERLAP_CHARS = 160
+KEYWORDS_PER_CHUNK = 12
+
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'from', 'are', 'was', 'were', 'has', 'have', 'had',
+    'his', 'her', 'its', 'our', 'your', 'their', 'they', 'them', 'you', 'also', 'into', 'over', 'than',
+    'then', 'there', 'which', 'while', 'will', 'would', 'can', 'could', 'should', 'been', 'being', 'such',
+    'each', 'more', 'most', 'other', 'some', 'any', 'all', 'not', 'but', 'out', 'about', 'use', 'used',
+    'using', 'via', 'per', 'who', 'what', 'when', 'where', 'how', 'why', 'one', 'two', 'may', 'like'
+}
+
+@dataclass
+class SourceDocument:
+    path: str
+    source_id: str
+    category: str
+    keywords: List[str] = field(default_factory=list)
+
+def _slugify(value: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-') or 'document'
+
+def discover_sources(paths: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """yield (path, path relative to the directory it was found under); a file argument is relative to its own directory"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SOURCE_EXTENSIONS):
+                        full = os.path.join(root, name)
+                        yield full, os.path.relpath(full, path)
+        elif os.path.isfile(path):
+            yield path, os.path.basename(path)
+        else:
+            logger.warning(f"[INGEST] source not found: {path}")
+
+def default_source_id(relative_path: str) -> str:
+    """project-a/README.md -> project-a-readme, so same-named files in different folders get different ids"""
+    return _slugify(os.path.splitext(relative_path)[0])
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _read_front_matter(lines: Iterator[str], path: str, source_id: str) -> Tuple[SourceDocument, Optional[str]]:
+    """parse a leading `---` block of `key: value` lines; returns the first body line if there was none"""
+    document = SourceDocument(path=path, source_id=source_id, category=DEFAULT_CATEGORY)
+
+    first = next(lines, None)
+    if first is None or first.strip() != '---':
+        return document, first
+
+    for line in lines:
+        if line.strip() == '---':
+            break
+        key, _, value = line.partition(':')
+        key, value = key.strip().lower(), value.strip().strip('"\'')
+        if key == 'category' and value:
+            document.category = value.lower()
+        elif key == 'id' and value:
+            document.source_id = _slugify(value)
+        elif key in ('keywords', 'tags') and value:
+            document.keywords = [k.strip().lower() for k in value.strip('[]').split(',') if k.strip()]
+
+    return document, None
+
+def _words(lines: Iterable[str]) -> Iterator[Tuple[str, bool]]:
+    """yield (word, starts_section) pairs; markdown headings start a new section"""
+    in_code_block = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('```'):
+            in_code_block = not in_code_block
+            continue
+        if in_code_block or not stripped:
+            continue
+
+        heading = stripped.startswith('#')
+        stripped = re.sub(r'^(#+|[-*+>]|\d+\.)\s+', '', stripped)
+        stripped = re.sub(r'!?\[([^\]]*)\]\(([^)]*)\)', r'\1 \2', stripped)
+        stripped = re.sub(r'[*_`]', '', stripped)
+        for i, word in enumerate(stripped.split()):
+            yield word, heading and i == 0
+
+def split_chunks(words: Iterable[Tuple[str, bool]], max_chars: int = DEFAULT_MAX_CHARS,
+                 overlap_chars: int = DEFAULT_OVERLAP_CHARS) -> Iterator[str]:
+    """sliding window over the word stream; memory is bounded by max_chars"""
+    window: deque = deque()
+    window_chars = 0
+    fresh_words = 0
+
+    def emit():
+        nonlocal window_chars, fresh_words
+        text = ' '.join(window)
+        while window and window_chars > overlap_chars:
+            window_chars -= len(window.popleft()) + 1
+        fresh_words = 0
+        return text
+
+    for word, starts_section in words:
+        if starts_section and fresh_words:
+            yield emit()
+            window.clear()
+            window_chars = 0
+        if window and window_chars + len(word) + 1 > max_chars:
+            yield emit()
+        window.append(word)
+        window_chars += len(word) + 1
+        fresh_words += 1
+
+    if fresh_words:
+        yield ' '.join(window)
+
+def extract_keywords(text: str, extra: Iterable[str] = (), limit: int = KEYWORDS_PER_CHUNK) -> List[str]:
+    counts = Counter(word for word in tokenize_query(text) if len(word) > 2 and word not in STOPWORDS and not word.isdigit())
+    keywords = list(dict.fromkeys(extra))
+    for word, _ in counts.most_common():
+        if len(keywords) >= limit:
+            break
+        if word not in keywords:
+            keywords.append(word)
+    return keywords
+
+def ingest_source(path: str, max_chars: int = DEFAULT_MAX_CHARS, overlap_chars: int = DEFAULT_OVERLAP_CHARS,
+                  source_id: Optional[str] = None, taken_ids: Optional[set] = None) -> Iterator[KnowledgeChunk]:
+    """chunk ids are `<source_id>-<n>`; a source id already in taken_ids (e.g. two files with the same
+    front matter id) gets a suffix from the path so chunk ids stay unique across sources"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        lines = iter(f)
+        document, first_line = _read_front_matter(lines, path, source_id or default_source_id(os.path.basename(path)))
+        body = lines if first_line is None else _prepend(first_line, lines)
+        if taken_ids is not None:
+            if document.source_id in taken_ids:
+                document.source_id = f"{document.source_id}-{hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]}"
+            taken_ids.add(document.source_id)
+
+        for n, text in enumerate(split_chunks(_words(body), max_chars, overlap_chars)):
+            yield KnowledgeChunk(
+                id=f"{document.source_id}-{n}",
+                category=document.category,
+                content=text,
+                keywords=extract_keywords(text, [document.source_id, *document.keywords])
+            )
+
+def _prepend(first: str, rest: Iterator[str]) -> Iterator[str]:
+    yield first
+    yield from rest
+
+def manifest_path(index_path: str) -> str:
+    return f"{index_path}.manifest.json"
+
+def _load_manifest(index_path: str) -> Dict[str, Dict]:
+    try:
+        with open(manifest_path(index_path), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def ingest(sources: Iterable[str], index_path: str, max_chars: int = DEFAULT_MAX_CHARS,
+           overlap_chars: int = DEFAULT_OVERLAP_CHARS, full: bool = False, fuzzy_max_distance: int = 2) -> Dict[str, int]:
+    """re-chunk only sources whose content changed and rebuild the index with built-in + ingested chunks"""
+    previous = {} if full or not os.path.exists(index_path) else _load_manifest(index_path)
+    manifest: Dict[str, Dict] = {}
+    stats = {"sources": 0, "changed": 0, "unchanged": 0, "removed": 0, "chunks": 0}
+
+    default_ids: Dict[str, str] = {}
+    for path, relative in discover_sources(sources):
+        key = os.path.abspath(path)
+        if key in manifest:
+            continue
+        digest = file_digest(path)
+        default_ids[key] = default_source_id(relative)
+        entry = previous.get(key)
+        stats["sources"] += 1
+        # manifests written before chunk ids were unique per source have no source_id: re-chunk those
+        if entry and entry.get("sha256") == digest and entry.get("source_id"):
+            manifest[key] = entry
+            stats["unchanged"] += 1
+        else:
+            manifest[key] = {"sha256": digest, "source_id": None, "chunk_ids": None}
+            stats["changed"] += 1
+    stats["removed"] = len(set(previous) - set(manifest))
+
+    # unchanged sources keep their chunks: the old index's chunk for (source, n) is the one with id chunk_ids[n]
+    reused = {chunk_id: key for key, entry in manifest.items() if entry["chunk_ids"] for chunk_id in entry["chunk_ids"]}
+    taken_ids = {entry["source_id"] for entry in manifest.values() if entry["source_id"]}
+    old_index = KnowledgeIndex(index_path) if reused else None
+
+    def chunks() -> Iterator[KnowledgeChunk]:
+        yield from KNOWLEDGE_BASE
+        if old_index is not None:
+            for chunk in old_index.iter_chunks():
+                if reused.pop(chunk.id, None) is not None:
+                    yield chunk
+        for key, entry in manifest.items():
+            if entry["chunk_ids"] is not None:
+                continue
+            chunk_ids = []
+            for chunk in ingest_source(key, max_chars, overlap_chars, default_ids[key], taken_ids):
+                chunk_ids.append(chunk.id)
+                yield chunk
+            entry["source_id"] = chunk_ids[0].rsplit('-', 1)[0] if chunk_ids else default_ids[key]
+            entry["chunk_ids"] = chunk_ids
+            logger.info(f"[INGEST] {key}: {len(chunk_ids)} chunks")
+
+    try:
+        stats["chunks"] = build_knowledge_index(chunks(), index_path, fuzzy_max_distance)
+    finally:
+        if old_index is not None:
+            old_index.close()
+
+    tmp_path = f"{manifest_path(index_path)}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path(index_path))
+
+    logger.info(f"[INGEST] complete: {stats}")
+    return stats
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="chunk markdown/text sources into the knowledge index")
+    parser.add_argument("sources", nargs="+", help="files or directories (.md, .markdown, .txt)")
+    parser.add_argument("--index", help="index file path (defaults to KNOWLEDGE_INDEX_PATH)")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS)
+    parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP_CHARS)
+    parser.add_argument("--full", action="store_true", help="re-chunk every source even if unchanged")
+    parser.add_argument("--fuzzy-max-distance", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    if args.overlap >= args.max_chars:
+        parser.error("--overlap must be smaller than --max-chars")
+
+    logging.basicConfig(level=logging.INFO)
+    index_path = args.index
+    if not index_path:
+        from ..core.config import settings
+        index_path = settings.knowledge_index_path
+
+    ingest(args.sources, index_path, args.max_chars, args.overlap, args.full, args.fuzzy_max_distance)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
-from typing import List, Dict, Any
-from dataclasses import dataclass
+from typing import List, Dict, Any, Callable, Iterable, Optional, Set, Tuple, Union
+from dataclasses import dataclass, replace
+import heapq
+import re
+from .fuzzy_matching import DeletionDictionary
 
 @dataclass
 class KnowledgeChunk:
@@ -132,41 +135,130 @@ KNOWLEDGE_BASE = [
     )
 ]
 
-def search_knowledge(query: str) -> List[KnowledgeChunk]:
-    import re
+CATEGORY_BOOSTS = {
+    'projects': ['project', 'projects'],
+    'skills': ['skill', 'skills', 'technical', 'tech'],
+    'contact': ['contact', 'reach', 'touch'],
+    'work': ['resume', 'work', 'job', 'experience'],
+    'personal': ['who', 'about', 'background', 'personal']
+}
+
+def tokenize_query(query: str) -> List[str]:
     query_words = re.sub(r'[^\w\s]', ' ', query.lower()).split()
-    query_words = [word for word in query_words if len(word) > 1]
+    return [word for word in query_words if len(word) > 1]
+
+def chunk_vocabulary(chunk: KnowledgeChunk) -> Set[str]:
+    words = {chunk.category}
+    words.update(tokenize_query(chunk.content))
+    words.update(tokenize_query(" ".join(chunk.keywords)))
+    return words
+
+def vocabulary_words(chunks: Iterable[KnowledgeChunk]) -> List[str]:
+    """normalized words that fuzzy matching may correct a query word to"""
+    words = set(word for boost_words in CATEGORY_BOOSTS.values() for word in boost_words)
+    for chunk in chunks:
+        words.update(chunk_vocabulary(chunk))
+    return sorted(words)
+
+def expand_query(query_words: List[str], has_exact_match: Callable[[str], bool],
+                 fuzzy_lookup: Callable[[str, int], List[Tuple[str, int]]],
+                 max_distance: int, penalty: float) -> List[Tuple[str, float]]:
+    """weight exact words 1.0 and replace words with no match by their fuzzy corrections"""
+    weighted: Dict[str, float] = {}
+    for word in query_words:
+        if max_distance <= 0 or has_exact_match(word):
+            weighted[word] = 1.0
+            continue
+        corrections = fuzzy_lookup(word, max_distance)
+        if not corrections:
+            weighted[word] = 1.0
+        for correction, _ in corrections:
+            weighted[correction] = max(weighted.get(correction, 0.0), penalty)
+    return list(weighted.items())
+
+def boosted_categories(weighted_words: List[Tuple[str, float]]) -> Dict[str, float]:
+    boosts = {}
+    for category, boost_words in CATEGORY_BOOSTS.items():
+        weights = [weight for word, weight in weighted_words if word in boost_words]
+        if weights:
+            boosts[category] = max(weights)
+    return boosts
+
+def partition_chunks(chunks: List[KnowledgeChunk]) -> Dict[str, List[Tuple[int, KnowledgeChunk]]]:
+    partitions: Dict[str, List[Tuple[int, KnowledgeChunk]]] = {}
+    for ordinal, chunk in enumerate(chunks):
+        partitions.setdefault(chunk.category, []).append((ordinal, chunk))
+    return partitions
+
+KNOWLEDGE_PARTITIONS = partition_chunks(KNOWLEDGE_BASE)
+
+_fuzzy_dictionary: Optional[DeletionDictionary] = None
+
+def _in_memory_fuzzy_lookup(word: str, max_distance: int) -> List[Tuple[str, int]]:
+    global _fuzzy_dictionary
+    if _fuzzy_dictionary is None or _fuzzy_dictionary.max_distance < max_distance:
+        _fuzzy_dictionary = DeletionDictionary(vocabulary_words(KNOWLEDGE_BASE), max_distance)
+    return _fuzzy_dictionary.lookup(word, max_distance)
+
+def _in_memory_exact_match(word: str) -> bool:
+    return any(
+        word in chunk.category or word in chunk.content.lower() or any(word in k.lower() for k in chunk.keywords)
+        for chunk in KNOWLEDGE_BASE
+    )
+
+def _normalize_categories(category: Optional[Union[str, List[str]]]) -> Optional[List[str]]:
+    if category is None:
+        return None
+    return [category] if isinstance(category, str) else list(category)
+
+def _search_in_memory(weighted_words: List[Tuple[str, float]], boosts: Dict[str, float], limit: int,
+                      categories: Optional[List[str]] = None,
+                      knowledge_partitions: Optional[Dict[str, List[Tuple[int, KnowledgeChunk]]]] = None) -> List[KnowledgeChunk]:
+    knowledge_partitions = KNOWLEDGE_PARTITIONS if knowledge_partitions is None else knowledge_partitions
+    if categories is None:
+        partitions = knowledge_partitions.values()
+    else:
+        partitions = [knowledge_partitions[c] for c in dict.fromkeys(categories) if c in knowledge_partitions]
     
     scored_chunks = []
     
-    for chunk in KNOWLEDGE_BASE:
-        score = 0
-        chunk_text = chunk.content.lower()
-        chunk_keywords = [k.lower() for k in chunk.keywords]
-        
-        for word in query_words:
-            if any(word in keyword for keyword in chunk_keywords):
-                score += 3
-            if word in chunk_text:
-                score += 2
-            if word in chunk.category:
-                score += 5
-        
-        category_boosts = {
-            'projects': ['project', 'projects'],
-            'skills': ['skill', 'skills', 'technical', 'tech'],
-            'contact': ['contact', 'reach', 'touch'],
-            'work': ['resume', 'work', 'job', 'experience'],
-            'personal': ['who', 'about', 'background', 'personal']
-        }
-        
-        for category, boost_words in category_boosts.items():
-            if any(word in query_words for word in boost_words):
-                if chunk.category == category:
-                    score += 10
-        
-        if score > 0:
-            chunk.relevance = score
-            scored_chunks.append(chunk)
+    for partition in partitions:
+        for ordinal, chunk in partition:
+            score = 0
+            chunk_text = chunk.content.lower()
+            chunk_keywords = [k.lower() for k in chunk.keywords]
+            
+            for word, weight in weighted_words:
+                if any(word in keyword for keyword in chunk_keywords):
+                    score += 3 * weight
+                if word in chunk_text:
+                    score += 2 * weight
+                if word in chunk.category:
+                    score += 5 * weight
+            
+            score += 10 * boosts.get(chunk.category, 0)
+            
+            if score > 0:
+                scored_chunks.append((-score, ordinal, chunk))
+    
+    return [replace(chunk, relevance=-neg_score) for neg_score, _, chunk in heapq.nsmallest(limit, scored_chunks)]
+
+def search_knowledge(query: str, limit: int = 5,
+                     category: Optional[Union[str, List[str]]] = None) -> List[KnowledgeChunk]:
+    """score chunks against the query; `category` restricts the scan to those partitions"""
+    from ..core.config import settings
+    from .knowledge_index import get_knowledge_index
+    
+    query_words = tokenize_query(query)
+    categories = _normalize_categories(category)
+    max_distance = settings.knowledge_fuzzy_max_distance if settings.knowledge_fuzzy_enabled else 0
+    
+    index = get_knowledge_index()
+    if index is not None:
+        weighted_words = expand_query(query_words, index.has_exact_match, index.fuzzy_lookup,
+                                      max_distance, settings.knowledge_fuzzy_penalty)
+        return index.search(weighted_words, boosted_categories(weighted_words), limit, categories)
     
-    return sorted(scored_chunks, key=lambda x: x.relevance, reverse=True)[:5] 
\ No newline at end of file
+    weighted_words = expand_query(query_words, _in_memory_exact_match, _in_memory_fuzzy_lookup,
+                                  max_distance, settings.knowledge_fuzzy_penalty)
+    return _search_in_memory(weighted_words, boosted_categories(weighted_words), limit, categories)
@@ -0,0 +1,556 @@
+from typing import Any, List, Dict, Optional, Iterable, Iterator, Tuple
+from array import array
+from collections import defaultdict
+from bisect import bisect_left, bisect_right
+from itertools import groupby
+from operator import itemgetter
+import argparse
+import heapq
+import logging
+import marshal
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from .knowledge_base import KnowledgeChunk, KNOWLEDGE_BASE, chunk_vocabulary, vocabulary_words
+from . import fuzzy_matching
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b'PKIX'
+INDEX_VERSION = 1
+KEYWORD_SEPARATOR = '\x1f'
+
+HEADER = struct.Struct('<4sHH')
+SECTION = struct.Struct('<4sQQ')
+CHUNK_RECORD = struct.Struct('<IIIIIIII')
+CATEGORY_RECORD = struct.Struct('<IIII')
+TERM_RECORD = struct.Struct('<IIIIII')
+SUFFIX_RECORD = struct.Struct('<II')
+FUZZY_META = struct.Struct('<HHI')
+FUZZY_BUCKET = struct.Struct('<II')
+FUZZY_ENTRY = struct.Struct('<IIII')
+STRING_REF = struct.Struct('<II')
+
+# items sorted in memory before a run is spilled to disk during a build
+SPILL_RUN_ITEMS = 65536
+# items per marshal record inside a run file
+SPILL_BATCH_ITEMS = 1024
+SPILL_BLOCK = struct.Struct('<I')
+# postings gathered (4 bytes each) before they are spilled as one run
+POSTING_RUN_ITEMS = 1 << 20
+
+class _StringWriter:
+    """append-only string section in a temp file; strings are not deduplicated, so nothing is kept per string"""
+    def __init__(self, f):
+        self._file = f
+        self.size = 0
+
+    def add(self, value: str) -> Tuple[int, int]:
+        encoded = value.encode('utf-8')
+        offset = self.size
+        self._file.write(encoded)
+        self.size += len(encoded)
+        return offset, len(encoded)
+
+class _ExternalSort:
+    """sorts more items than fit in memory: every run_size items are sorted and spilled to a file
+    in directory, and iterating merges the runs lazily. items must be marshal-able and unique"""
+    def __init__(self, directory: str, name: str, run_size: int = SPILL_RUN_ITEMS):
+        self.directory = directory
+        self.name = name
+        self.run_size = run_size
+        self._buffer: List[tuple] = []
+        self._runs: List[str] = []
+
+    def add(self, item: tuple):
+        self._buffer.append(item)
+        if len(self._buffer) >= self.run_size:
+            self._spill()
+
+    def add_run(self, items: List[tuple]):
+        """spill items the caller already bounded as one run of their own"""
+        buffered, self._buffer = self._buffer, items
+        self._spill()
+        self._buffer = buffered
+
+    def _spill(self):
+        self._buffer.sort()
+        path = os.path.join(self.directory, f"{self.name}.{len(self._runs)}.run")
+        with open(path, 'wb') as f:
+            for start in range(0, len(self._buffer), SPILL_BATCH_ITEMS):
+                block = marshal.dumps(self._buffer[start:start + SPILL_BATCH_ITEMS])
+                f.write(SPILL_BLOCK.pack(len(block)))
+                f.write(block)
+        self._runs.append(path)
+        self._buffer = []
+
+    def __iter__(self) -> Iterator[tuple]:
+        self._buffer.sort()
+        return heapq.merge(self._buffer, *(_read_run(path) for path in self._runs))
+
+def _read_run(path: str) -> Iterator[tuple]:
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(SPILL_BLOCK.size)
+            if not header:
+                return
+            yield from marshal.loads(f.read(SPILL_BLOCK.unpack(header)[0]))
+
+class _UIntWriter:
+    """little-endian uint32 section written through a bounded buffer"""
+    def __init__(self, f):
+        self._file = f
+        self._buffer = array('I')
+        self.count = 0
+
+    def extend(self, values: Iterable[int]):
+        before = len(self._buffer)
+        self._buffer.extend(values)
+        self.count += len(self._buffer) - before
+        if len(self._buffer) >= SPILL_RUN_ITEMS:
+            self.flush()
+
+    def flush(self):
+        self._buffer.tofile(self._file)
+        self._buffer = array('I')
+
+def _tokens(text: str) -> Iterable[str]:
+    return set(text.lower().split())
+
+def _fuzzy_hash(key: bytes, bucket_count: int) -> int:
+    return zlib.crc32(key) & (bucket_count - 1)
+
+def _build_fuzzy_sections(words: List[str], strings: _StringWriter, max_distance: int) -> List[Tuple[bytes, bytes]]:
+    """serialize the symspell deletion dictionary as a bucketed hash table"""
+    dictionary = fuzzy_matching.DeletionDictionary(words, max_distance)
+    word_ids = {word: i for i, word in enumerate(words)}
+
+    bucket_count = 1
+    while bucket_count < max(len(dictionary.entries), 1):
+        bucket_count <<= 1
+
+    buckets: List[List[Tuple[bytes, List[int]]]] = [[] for _ in range(bucket_count)]
+    for key, candidates in dictionary.entries.items():
+        encoded = key.encode('utf-8')
+        buckets[_fuzzy_hash(encoded, bucket_count)].append((encoded, [word_ids[c] for c in candidates]))
+
+    bucket_records = []
+    entry_records = []
+    values: List[int] = []
+    for bucket in buckets:
+        bucket_records.append((len(entry_records), len(bucket)))
+        for encoded, ids in bucket:
+            key_off, key_len = strings.add(encoded.decode('utf-8'))
+            entry_records.append((key_off, key_len, len(values), len(ids)))
+            values.extend(ids)
+
+    word_records = [strings.add(word) for word in words]
+
+    return [
+        (b'FZMT', FUZZY_META.pack(max_distance, dictionary.prefix_length, bucket_count)),
+        (b'FZBK', b''.join(FUZZY_BUCKET.pack(*r) for r in bucket_records)),
+        (b'FZEN', b''.join(FUZZY_ENTRY.pack(*r) for r in entry_records)),
+        (b'FZVL', struct.pack(f'<{len(values)}I', *values)),
+        (b'FZWD', b''.join(STRING_REF.pack(*r) for r in word_records)),
+    ]
+
+def build_knowledge_index(chunks: Iterable[KnowledgeChunk], path: str, fuzzy_max_distance: int = 2) -> int:
+    """write chunks to a compact, mmap-able index file and atomically replace `path`.
+
+    chunks are read once; chunk text, postings and term suffixes are sorted in spilled runs under a
+    temp directory next to `path`, so memory is bounded by the run size and the vocabulary (held for
+    the fuzzy dictionary), not by the size of the corpus"""
+    if sys.byteorder != 'little':
+        raise RuntimeError("knowledge index files are little-endian only")
+
+    directory_dir = os.path.dirname(path)
+    if directory_dir:
+        os.makedirs(directory_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix='.knowledge-build-', dir=directory_dir or None) as workdir:
+        # pass 1: a chunk's position is its category's first position plus its rank in the category,
+        # so records and postings are keyed by (category, rank) until the categories are all known.
+        # postings are gathered per (term, kind, category) and spilled as runs of rank lists; ranks
+        # only grow along the stream, so sorting runs by their first rank keeps positions in order
+        ordered = _ExternalSort(workdir, 'chunks')
+        postings = _ExternalSort(workdir, 'postings')
+        pending: Dict[Tuple[str, int, str], array] = defaultdict(lambda: array('I'))
+        pending_count = 0
+        counts: Dict[str, int] = {}
+        words = set(vocabulary_words(())) if fuzzy_max_distance > 0 else set()
+        for ordinal, chunk in enumerate(chunks):
+            rank = counts.get(chunk.category, 0)
+            counts[chunk.category] = rank + 1
+            ordered.add((chunk.category, rank, ordinal, chunk.id, chunk.content, list(chunk.keywords)))
+            keyword_tokens = set(t for keyword in chunk.keywords for t in _tokens(keyword))
+            content_tokens = _tokens(chunk.content)
+            for kind, tokens in ((0, keyword_tokens), (1, content_tokens)):
+                for token in tokens:
+                    pending[(token, kind, chunk.category)].append(rank)
+            pending_count += len(keyword_tokens) + len(content_tokens)
+            if pending_count >= POSTING_RUN_ITEMS:
+                postings.add_run([(*key, ranks[0], ranks.tobytes()) for key, ranks in pending.items()])
+                pending.clear()
+                pending_count = 0
+            if fuzzy_max_distance > 0:
+                words.update(chunk_vocabulary(chunk))
+        if pending:
+            postings.add_run([(*key, ranks[0], ranks.tobytes()) for key, ranks in pending.items()])
+            pending.clear()
+
+        names = sorted(counts)
+        category_ids = {name: i for i, name in enumerate(names)}
+        first_positions: Dict[str, int] = {}
+        category_ranges = []
+        position = 0
+        for name in names:
+            first_positions[name] = position
+            category_ranges.append((name, position, position + counts[name]))
+            position += counts[name]
+
+        section_files = {tag: open(os.path.join(workdir, tag.decode()), 'w+b') for tag in (b'CHNK', b'TERM', b'SUFX', b'POST', b'STRS')}
+        try:
+            strings = _StringWriter(section_files[b'STRS'])
+            chunk_count = 0
+            for category, _, ordinal, chunk_id, content, keywords in ordered:
+                record = (*strings.add(chunk_id), *strings.add(content), *strings.add(KEYWORD_SEPARATOR.join(keywords)),
+                          category_ids[category], ordinal)
+                section_files[b'CHNK'].write(CHUNK_RECORD.pack(*record))
+                chunk_count += 1
+
+            # pass 2: postings arrive grouped by term, keyword hits before content hits, in position order
+            post = _UIntWriter(section_files[b'POST'])
+            suffixes = _ExternalSort(workdir, 'suffixes')
+            term_count = 0
+            for term, hits in groupby(postings, key=itemgetter(0)):
+                start = post.count
+                counted = [0, 0]
+                for _, kind, category, _, data in hits:
+                    ranks = array('I', data)
+                    first = first_positions[category]
+                    post.extend(ranks if first == 0 else (first + rank for rank in ranks))
+                    counted[kind] += len(ranks)
+                section_files[b'TERM'].write(TERM_RECORD.pack(*strings.add(term), start, counted[0], start + counted[0], counted[1]))
+                encoded = term.encode('utf-8')
+                for offset in range(len(encoded)):
+                    if (encoded[offset] & 0xC0) != 0x80:
+                        suffixes.add((encoded[offset:], term_count, offset))
+                term_count += 1
+            post.flush()
+            for _, term_idx, offset in suffixes:
+                section_files[b'SUFX'].write(SUFFIX_RECORD.pack(term_idx, offset))
+
+            category_records = [(*strings.add(name), first, end) for name, first, end in category_ranges]
+            fuzzy_sections = []
+            if fuzzy_max_distance > 0:
+                fuzzy_sections = _build_fuzzy_sections(sorted(words), strings, fuzzy_max_distance)
+
+            sections = [
+                (b'CHNK', section_files[b'CHNK']),
+                (b'CATS', b''.join(CATEGORY_RECORD.pack(*r) for r in category_records)),
+                (b'TERM', section_files[b'TERM']),
+                (b'SUFX', section_files[b'SUFX']),
+                (b'POST', section_files[b'POST']),
+                *fuzzy_sections,
+                (b'STRS', section_files[b'STRS']),
+            ]
+            offset = _write_index(path, sections)
+        finally:
+            for f in section_files.values():
+                f.close()
+
+    logger.info(f"[KNOWLEDGE_INDEX] wrote {chunk_count} chunks, {term_count} terms to {path} ({offset} bytes)")
+    return chunk_count
+
+def _write_index(path: str, sections: List[Tuple[bytes, Any]]) -> int:
+    """header, section directory and payloads (bytes or temp files) to a temp file renamed over path"""
+    lengths = [len(payload) if isinstance(payload, bytes) else payload.seek(0, os.SEEK_END) for _, payload in sections]
+    offset = HEADER.size + SECTION.size * len(sections)
+    directory = [HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(sections))]
+    for (tag, _), length in zip(sections, lengths):
+        directory.append(SECTION.pack(tag, offset, length))
+        offset += length
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(directory))
+        for _, payload in sections:
+            if isinstance(payload, bytes):
+                f.write(payload)
+            else:
+                payload.seek(0)
+                shutil.copyfileobj(payload, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return offset
+
+class _SuffixPrefixes:
+    """sorted view of suffix entries truncated to `width` bytes, for bisect"""
+    def __init__(self, index: 'KnowledgeIndex', width: int):
+        self.index = index
+        self.width = width
+
+    def __len__(self) -> int:
+        return self.index.suffix_count
+
+    def __getitem__(self, i: int) -> bytes:
+        term_idx, start = SUFFIX_RECORD.unpack_from(self.index._sections[b'SUFX'], i * SUFFIX_RECORD.size)
+        str_off, str_len = TERM_RECORD.unpack_from(self.index._sections[b'TERM'], term_idx * TERM_RECORD.size)[:2]
+        begin = str_off + start
+        end = min(str_off + str_len, begin + self.width)
+        return self.index._strings[begin:end].tobytes()
+
+class KnowledgeIndex:
+    """read-only view over an index file; all lookups read straight from the shared mapping"""
+    def __init__(self, path: str):
+        if sys.byteorder != 'little':
+            raise RuntimeError("knowledge index files are little-endian only")
+
+        self.path = path
+        with open(path, 'rb') as f:
+            self._stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, version, section_count = HEADER.unpack_from(self._view, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise ValueError(f"unsupported knowledge index file: {path}")
+
+        self._sections: Dict[bytes, memoryview] = {}
+        for i in range(section_count):
+            tag, offset, length = SECTION.unpack_from(self._view, HEADER.size + i * SECTION.size)
+            self._sections[tag] = self._view[offset:offset + length]
+
+        self._strings = self._sections[b'STRS']
+        self._postings = self._sections[b'POST'].cast('I')
+        self.chunk_count = len(self._sections[b'CHNK']) // CHUNK_RECORD.size
+        self.term_count = len(self._sections[b'TERM']) // TERM_RECORD.size
+        self.suffix_count = len(self._sections[b'SUFX']) // SUFFIX_RECORD.size
+
+        self.fuzzy_max_distance = 0
+        self.fuzzy_prefix_length = fuzzy_matching.DEFAULT_PREFIX_LENGTH
+        self._fuzzy_bucket_count = 0
+        if b'FZMT' in self._sections:
+            self.fuzzy_max_distance, self.fuzzy_prefix_length, self._fuzzy_bucket_count = FUZZY_META.unpack_from(self._sections[b'FZMT'], 0)
+            self._fuzzy_values = self._sections[b'FZVL'].cast('I')
+
+        self.categories: Dict[str, Tuple[int, int]] = {}
+        for i in range(len(self._sections[b'CATS']) // CATEGORY_RECORD.size):
+            name_off, name_len, first, end = CATEGORY_RECORD.unpack_from(self._sections[b'CATS'], i * CATEGORY_RECORD.size)
+            self.categories[self._string(name_off, name_len)] = (first, end)
+
+    def close(self) -> bool:
+        """release this index's views and unmap the file. returns False while a view a caller still
+        holds (e.g. from postings()) pins the mapping: the index is closed for lookups either way,
+        and calling close again once that view is gone unmaps it"""
+        views = [getattr(self, '_postings', None), getattr(self, '_fuzzy_values', None),
+                 *getattr(self, '_sections', {}).values(), self._view]
+        self._sections = {}
+        self._strings = None
+        self._postings = None
+        self._fuzzy_values = None
+        for view in views:
+            if view is not None:
+                view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            return False
+        return True
+
+    def is_stale(self) -> bool:
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return (current.st_ino, current.st_mtime_ns) != (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    def _string(self, offset: int, length: int) -> str:
+        return str(self._strings[offset:offset + length], 'utf-8')
+
+    def _chunk_record(self, position: int) -> Tuple[int, ...]:
+        return CHUNK_RECORD.unpack_from(self._sections[b'CHNK'], position * CHUNK_RECORD.size)
+
+    def _category_name(self, category_idx: int) -> str:
+        name_off, name_len = CATEGORY_RECORD.unpack_from(self._sections[b'CATS'], category_idx * CATEGORY_RECORD.size)[:2]
+        return self._string(name_off, name_len)
+
+    def chunk_at(self, position: int, relevance: float = 0.0) -> KnowledgeChunk:
+        id_off, id_len, content_off, content_len, kw_off, kw_len, category_idx, _ = self._chunk_record(position)
+        keywords = self._string(kw_off, kw_len)
+        return KnowledgeChunk(
+            id=self._string(id_off, id_len),
+            category=self._category_name(category_idx),
+            content=self._string(content_off, content_len),
+            keywords=keywords.split(KEYWORD_SEPARATOR) if keywords else [],
+            relevance=relevance
+        )
+
+    def iter_chunks(self) -> Iterable[KnowledgeChunk]:
+        for position in sorted(range(self.chunk_count), key=lambda p: self._chunk_record(p)[7]):
+            yield self.chunk_at(position)
+
+    def terms_containing(self, word: str) -> List[int]:
+        encoded = word.encode('utf-8')
+        prefixes = _SuffixPrefixes(self, len(encoded))
+        lo = bisect_left(prefixes, encoded)
+        hi = bisect_right(prefixes, encoded, lo)
+        suffix_table = self._sections[b'SUFX']
+        return list({SUFFIX_RECORD.unpack_from(suffix_table, i * SUFFIX_RECORD.size)[0] for i in range(lo, hi)})
+
+    def postings(self, term_idx: int) -> Tuple[memoryview, memoryview]:
+        _, _, kw_off, kw_count, ct_off, ct_count = TERM_RECORD.unpack_from(self._sections[b'TERM'], term_idx * TERM_RECORD.size)
+        return self._postings[kw_off:kw_off + kw_count], self._postings[ct_off:ct_off + ct_count]
+
+    def has_exact_match(self, word: str) -> bool:
+        return bool(self.terms_containing(word)) or any(word in category for category in self.categories)
+
+    def _fuzzy_candidates(self, key: str) -> Iterable[str]:
+        encoded = key.encode('utf-8')
+        first, count = FUZZY_BUCKET.unpack_from(self._sections[b'FZBK'], _fuzzy_hash(encoded, self._fuzzy_bucket_count) * FUZZY_BUCKET.size)
+        for entry in range(first, first + count):
+            key_off, key_len, value_off, value_count = FUZZY_ENTRY.unpack_from(self._sections[b'FZEN'], entry * FUZZY_ENTRY.size)
+            if self._strings[key_off:key_off + key_len] != encoded:
+                continue
+            for word_id in self._fuzzy_values[value_off:value_off + value_count]:
+                yield self._string(*STRING_REF.unpack_from(self._sections[b'FZWD'], word_id * STRING_REF.size))
+            return
+
+    def fuzzy_lookup(self, word: str, max_distance: int) -> List[Tuple[str, int]]:
+        max_distance = min(max_distance, self.fuzzy_max_distance)
+        if max_distance <= 0:
+            return []
+        return fuzzy_matching.lookup(word, max_distance, self.fuzzy_prefix_length, self._fuzzy_candidates)
+
+    def partitions(self, categories: Optional[List[str]] = None) -> Dict[str, Tuple[int, int]]:
+        if categories is None:
+            return self.categories
+        return {c: self.categories[c] for c in categories if c in self.categories}
+
+    def search(self, weighted_words: List[Tuple[str, float]], boosts: Dict[str, float], limit: int = 5,
+               categories: Optional[List[str]] = None) -> List[KnowledgeChunk]:
+        scores: Dict[int, float] = defaultdict(float)
+        partitions = self.partitions(categories)
+        ranges = None if categories is None else sorted(partitions.values())
+
+        for word, weight in weighted_words:
+            keyword_hits = set()
+            content_hits = set()
+            for term_idx in self.terms_containing(word):
+                keyword_postings, content_postings = self.postings(term_idx)
+                keyword_hits.update(_restrict(keyword_postings, ranges))
+                content_hits.update(_restrict(content_postings, ranges))
+
+            for position in keyword_hits:
+                scores[position] += 3 * weight
+            for position in content_hits:
+                scores[position] += 2 * weight
+
+            for category, (first, end) in partitions.items():
+                if word in category:
+                    for position in range(first, end):
+                        scores[position] += 5 * weight
+
+        for category, weight in boosts.items():
+            first, end = partitions.get(category, (0, 0))
+            for position in range(first, end):
+                scores[position] += 10 * weight
+
+        top = heapq.nsmallest(
+            limit,
+            ((-score, self._chunk_record(position)[7], position) for position, score in scores.items() if score > 0)
+        )
+        return [self.chunk_at(position, -neg_score) for neg_score, _, position in top]
+
+def _restrict(postings: memoryview, ranges: Optional[List[Tuple[int, int]]]) -> Iterable[int]:
+    """yield only the postings inside the given partition ranges (postings are sorted)"""
+    if ranges is None:
+        yield from postings
+        return
+    for first, end in ranges:
+        lo = bisect_left(postings, first)
+        hi = bisect_left(postings, end, lo)
+        yield from postings[lo:hi]
+
+# the file is stat'ed at most this often to notice a rebuilt index
+STALE_CHECK_SECONDS = 1.0
+# a replaced index stays mapped this long so searches already reading it can finish
+RETIRE_GRACE_SECONDS = 60.0
+
+_index: Optional[KnowledgeIndex] = None
+_index_lock = threading.Lock()
+_missing_logged = False
+_checked_at = 0.0
+_retired: List[Tuple[float, KnowledgeIndex]] = []
+
+def _retire(index: Optional[KnowledgeIndex], now: float):
+    """queue the old index for closing and close the ones past their grace period; one that a
+    caller still holds a view into is queued again for another grace period"""
+    if index is not None:
+        _retired.append((now, index))
+    pinned = []
+    while _retired and now - _retired[0][0] >= RETIRE_GRACE_SECONDS:
+        _, old = _retired.pop(0)
+        if not old.close():
+            logger.warning(f"[KNOWLEDGE_INDEX] {old.path} is still mapped by a caller's view, retrying in {RETIRE_GRACE_SECONDS:.0f}s")
+            pinned.append((now, old))
+    _retired.extend(pinned)
+
+def get_knowledge_index() -> Optional[KnowledgeIndex]:
+    """return the process-wide index, reopening it when the file on disk was replaced"""
+    global _index, _missing_logged, _checked_at
+    from ..core.config import settings
+
+    path = settings.knowledge_index_path
+    if not path:
+        return None
+
+    index = _index
+    now = time.monotonic()
+    if now - _checked_at < STALE_CHECK_SECONDS and (index is None or index.path == path):
+        return index
+
+    with _index_lock:
+        _checked_at = now
+        _retire(None, now)
+        if _index is not None and _index.path == path and not _index.is_stale():
+            return _index
+        if not os.path.exists(path):
+            if not _missing_logged:
+                logger.info(f"[KNOWLEDGE_INDEX] no index at {path}, using in-memory knowledge base")
+                _missing_logged = True
+            _retire(_index, now)
+            _index = None
+            return None
+
+        _retire(_index, now)
+        _index = KnowledgeIndex(path)
+        _missing_logged = False
+        logger.info(f"[KNOWLEDGE_INDEX] opened {path}: {_index.chunk_count} chunks, {_index.term_count} terms")
+        return _index
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="build the mmap knowledge index from the built-in knowledge base")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--output", help="index file path (defaults to KNOWLEDGE_INDEX_PATH)")
+    parser.add_argument("--fuzzy-max-distance", type=int, default=2, help="largest edit distance stored in the fuzzy dictionary (0 disables it)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    output = args.output
+    if not output:
+        from ..core.config import settings
+        output = settings.knowledge_index_path
+
+    build_knowledge_index(KNOWLEDGE_BASE, output, args.fuzzy_max_distance)
+
+if __name__ == "__main__":
+    main()
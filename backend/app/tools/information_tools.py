@@ -114,8 +114,7 @@ class ProjectDetailsTool(BaseTool):
             relevant_projects = list(project_keywords.keys())
         
         project_query = " ".join(relevant_projects)
-        results = search_knowledge(project_query)
-        project_results = [chunk for chunk in results if chunk.category == "projects"]
+        project_results = search_knowledge(project_query, category="projects")
         
         return ToolResult(
             tool_name=self.name,
@@ -159,8 +158,7 @@ class SkillAssessmentTool(BaseTool):
             relevant_categories = list(skill_categories.keys())
         
         skills_query = "skills " + " ".join(relevant_categories)
-        results = search_knowledge(skills_query)
-        skill_results = [chunk for chunk in results if chunk.category == "skills"]
+        skill_results = search_knowledge(skills_query, category="skills")
         
         return ToolResult(
             tool_name=self.name,
@@ -201,8 +199,7 @@ class ExperienceLookupTool(BaseTool):
                 relevant_companies.append(company)
         
         work_query = "work experience resume job"
-        results = search_knowledge(work_query)
-        work_results = [chunk for chunk in results if chunk.category in ["work", "personal"]]
+        work_results = search_knowledge(work_query, category=["work", "personal"])
         
         return ToolResult(
             tool_name=self.name,
@@ -43,7 +43,7 @@ class ContactFacilitatorTool(BaseTool):
         if not suggested_methods:
             suggested_methods = ["email", "linkedin", "github"]
         
-        contact_info = search_knowledge("contact")
+        contact_info = search_knowledge("contact", category="contact")
         contact_details = next((chunk for chunk in contact_info if chunk.id == "contact-details"), None)
         
         return ToolResult(
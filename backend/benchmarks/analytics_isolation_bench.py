@@ -0,0 +1,156 @@
+"""chat persistence latency while dashboards run heavy aggregates, with and without the analytics replica
+
+run from the backend directory:
+
+    python -m benchmarks.analytics_isolation_bench --rows 300000 --seconds 5
+
+seeds conversations and tool_executions, then --clients simulated chat turns (read the
+recent context, save two messages and a tool execution, wait for the commit) run while
+--dashboards callers loop over the /metrics/usage aggregates. "shared" runs those
+aggregates the old way, on the db executor against the live file; "replica" runs them on
+the analytics executor against the backup-api copy. "idle" is the same chat load alone.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from app.core.config import settings
+from app.core import database, replica
+from app.core.database import ConversationManager, ToolExecutionManager, run_db, flush_writes
+
+DAY_MS = 86400000
+
+def seed(path: str, rows: int):
+    rng = random.Random(11)
+    now = database.now_ms()
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.executemany('''
+                INSERT INTO conversations (session_id, message_id, role, content, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', ((f"s{rng.randrange(rows // 10 + 1)}", f"m{i}", rng.choice(("user", "assistant")),
+                   "what has he built " * rng.randrange(1, 20), now - rng.randrange(DAY_MS)) for i in range(rows)))
+            conn.executemany('''
+                INSERT INTO tool_executions (session_id, tool_name, execution_time, success, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', ((f"s{rng.randrange(rows // 10 + 1)}", rng.choice(("knowledge_search", "open_modal", "navigate")),
+                   rng.random(), rng.random() > 0.05, now - rng.randrange(DAY_MS)) for _ in range(rows)))
+    finally:
+        conn.close()
+
+def usage_stats(conn_factory: Callable[[], sqlite3.Connection], since_ms: int):
+    # the same aggregates as /metrics/usage
+    conn = conn_factory()
+    conn.execute('''
+        SELECT COUNT(DISTINCT session_id), COUNT(*), AVG(LENGTH(content))
+        FROM conversations WHERE timestamp > ?
+    ''', (since_ms,)).fetchone()
+    return conn.execute('''
+        SELECT tool_name, COUNT(*), AVG(execution_time), SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END)
+        FROM tool_executions WHERE timestamp > ?
+        GROUP BY tool_name
+    ''', (since_ms,)).fetchall()
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "samples": len(ordered),
+        "p50_ms": round(pick(0.50), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3)
+    }
+
+async def chat_turns(client_id: int, stop: asyncio.Event, latencies: List[float]):
+    turn = 0
+    while not stop.is_set():
+        session_id = f"bench{client_id}"
+        start = time.perf_counter()
+        await run_db(ConversationManager.get_recent_messages, session_id, 6)
+        await run_db(ConversationManager.save_message, session_id, f"u{client_id}-{turn}", "user", "what projects?")
+        await run_db(ToolExecutionManager.log_execution, session_id, "knowledge_search", {"query": "projects"},
+                     {"results": []}, 0.01, True)
+        await run_db(ConversationManager.save_message, session_id, f"a{client_id}-{turn}", "assistant", "several")
+        await run_db(flush_writes, None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        turn += 1
+        await asyncio.sleep(0.005)
+
+async def dashboards(mode: str, stop: asyncio.Event, durations: List[float]):
+    since = database.now_ms() - DAY_MS
+    while not stop.is_set():
+        start = time.perf_counter()
+        if mode == "shared":
+            await run_db(usage_stats, database.get_db_connection, since)
+        else:
+            await replica.run_analytics(usage_stats, replica.analytics_connection, since)
+        durations.append((time.perf_counter() - start) * 1000)
+
+async def run_mode(mode: str, seconds: float, clients: int, dashboard_callers: int) -> Dict[str, Any]:
+    if mode == "replica":
+        await replica.run_analytics(replica.analytics_replica.refresh)
+        replica.analytics_replica.start()
+    stop = asyncio.Event()
+    latencies: List[float] = []
+    durations: List[float] = []
+    tasks = [asyncio.create_task(chat_turns(i, stop, latencies)) for i in range(clients)]
+    if mode != "idle":
+        tasks += [asyncio.create_task(dashboards(mode, stop, durations)) for _ in range(dashboard_callers)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    replica.analytics_replica.stop()
+    return {
+        "chat_turn": _percentiles(latencies),
+        "dashboard_query": _percentiles(durations) if durations else None,
+        "replica": replica.analytics_replica.stats() if mode == "replica" else None
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="chat turn latency under dashboard load, shared vs replica reads")
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--dashboards", type=int, default=4)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    settings.retention_enabled = False
+    settings.analytics_replica_refresh_seconds = 1
+    report: Dict[str, Any] = {"benchmark": "analytics_isolation", "parameters": {k: v for k, v in vars(args).items() if k != "output"}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        settings.database_path = os.path.join(workdir, "conversations.db")
+        database.init_database()
+        seed(settings.database_path, args.rows)
+        replica.analytics_replica.refresh_seconds = settings.analytics_replica_refresh_seconds
+
+        for mode in ("idle", "shared", "replica"):
+            report[mode] = asyncio.run(run_mode(mode, args.seconds, args.clients, args.dashboards))
+
+        replica.shutdown_analytics()
+        database.shutdown_db_executor()
+        database.stop_write_queue()
+        database.close_db_connections()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
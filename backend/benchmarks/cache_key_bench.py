@@ -0,0 +1,170 @@
+"""cache key cost and correctness, @cached overhead and bulk invalidation
+
+run from the backend directory:
+
+    python -m benchmarks.cache_key_bench --ops 100000 --entries 50000
+
+"keys" times the old key (md5 of the str()-joined arguments) against make_key (blake2b of a
+type-tagged encoding) for a short query, a (tool, query) pair and an ai_response context dict,
+and lists argument pairs that the old key mapped to the same entry. "decorator" times a hit
+through @cached against a hand-written get for sync and async functions. "invalidation" fills
+--entries entries over four namespaces, half of them tagged, and times invalidate_namespace and
+invalidate_tag. "cross_worker" gives two caches their own handle on one shared tier file, like two
+workers, caches an entry in both, invalidates it in one and checks the other stops serving it;
+the run fails if it does not.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from cache_service import CacheService, cached, make_key
+from shared_cache import SharedCacheTier
+
+QUERY = "what projects has he built with react?"
+CONTEXT = {
+    "message": QUERY,
+    "knowledge": "react portfolio dashboard; fastapi chat backend; " * 8,
+    "history": [("user", "hi"), ("assistant", "hello! ask me about the portfolio.")]
+}
+# argument lists the old key could not tell apart
+COLLISIONS = [
+    (("a:b",), ("a", "b")),
+    ((1,), ("1",)),
+    ((None,), ("None",)),
+    ((["x", "y"],), ("['x', 'y']",))
+]
+
+def old_key(prefix: str, *args) -> str:
+    key_data = f"{prefix}:{':'.join(str(arg) for arg in args)}"
+    return hashlib.md5(key_data.encode()).hexdigest()
+
+def _per_op_us(fn: Callable[[int], Any], count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return round((time.perf_counter() - start) / count * 1e6, 3)
+
+def run_keys(count: int) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+    for name, args in (("query", (QUERY,)), ("tool_query", ("knowledge_search", QUERY)), ("context", (CONTEXT,))):
+        report[name] = {
+            "md5_str_us": _per_op_us(lambda i: old_key("ns", *args), count),
+            "blake2b_canonical_us": _per_op_us(lambda i: make_key("ns", args), count)
+        }
+    report["collisions"] = [
+        {
+            "args": [repr(left), repr(right)],
+            "md5_str_collides": old_key("ns", *left) == old_key("ns", *right),
+            "canonical_collides": make_key("ns", left) == make_key("ns", right)
+        } for left, right in COLLISIONS
+    ]
+    return report
+
+def run_decorator(count: int) -> Dict[str, Any]:
+    service = CacheService(default_ttl=600)
+
+    @cached("bench", service=service)
+    def lookup(query: str, limit: int = 5) -> str:
+        return query[:limit]
+
+    @cached("bench_async", service=service)
+    async def lookup_async(query: str, limit: int = 5) -> str:
+        return query[:limit]
+
+    def manual(query: str, limit: int = 5) -> str:
+        key = old_key("manual", query, limit)
+        value = service.get(key)
+        if value is None:
+            value = query[:limit]
+            service.set(key, value)
+        return value
+
+    async def async_hits() -> float:
+        await lookup_async(QUERY)
+        start = time.perf_counter()
+        for _ in range(count):
+            await lookup_async(QUERY)
+        return round((time.perf_counter() - start) / count * 1e6, 3)
+
+    lookup(QUERY)
+    manual(QUERY)
+    return {
+        "manual_get_hit_us": _per_op_us(lambda i: manual(QUERY), count),
+        "cached_sync_hit_us": _per_op_us(lambda i: lookup(QUERY), count),
+        "cached_async_hit_us": asyncio.run(async_hits()),
+        "namespaces": service.stats()["namespaces"]
+    }
+
+def run_invalidation(entries: int) -> Dict[str, Any]:
+    service = CacheService(default_ttl=600, max_entries=entries * 2)
+    namespaces = ("knowledge_search", "ai_response", "tool_output", "other")
+    for i in range(entries):
+        service.set(make_key(namespaces[i % 4], i), i, tags=("knowledge",) if i % 2 else ())
+    report: Dict[str, Any] = {"entries": len(service.cache)}
+
+    start = time.perf_counter()
+    report["namespace_removed"] = service.invalidate_namespace("ai_response")
+    report["namespace_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    start = time.perf_counter()
+    report["tag_removed"] = service.invalidate_tag("knowledge")
+    report["tag_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    report["remaining"] = len(service.cache)
+    return report
+
+def run_cross_worker(count: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "cache.db")
+        first = CacheService(default_ttl=600, shared=SharedCacheTier(path), invalidation_check_seconds=0)
+        second = CacheService(default_ttl=600, shared=SharedCacheTier(path), invalidation_check_seconds=0)
+        report: Dict[str, Any] = {}
+        try:
+            for namespace, tag, invalidate in (("ai_response", (), lambda: first.invalidate_namespace("ai_response")),
+                                               ("knowledge_search", ("knowledge",), lambda: first.invalidate_tag("knowledge"))):
+                key = make_key(namespace, QUERY)
+                first.set(key, "old answer", tags=tag)
+                first.flush_shared_writes()
+                report[f"{namespace}_shared_read"] = second.get(key) is not None
+                invalidate()
+                first.flush_shared_writes()
+                report[f"{namespace}_served_after_invalidation"] = second.get(key) is not None
+            key = make_key("tool_output", QUERY)
+            second.set(key, "value")
+            report["local_hit_us"] = _per_op_us(lambda i: second.get(key), count)
+        finally:
+            first.stop()
+            second.stop()
+    report["ok"] = (all(value for name, value in report.items() if name.endswith("_shared_read")) and
+                    not any(value for name, value in report.items() if name.endswith("_after_invalidation")))
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="cache key speed and collisions, @cached overhead, bulk invalidation")
+    parser.add_argument("--ops", type=int, default=100000)
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {"benchmark": "cache_key", "parameters": {k: v for k, v in vars(args).items() if k != "output"}}
+    report["keys"] = run_keys(args.ops)
+    report["decorator"] = run_decorator(args.ops)
+    report["invalidation"] = run_invalidation(args.entries)
+    report["cross_worker"] = run_cross_worker(args.ops)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if not report["cross_worker"]["ok"]:
+        raise SystemExit("an invalidated entry was still served by another worker")
+
+if __name__ == "__main__":
+    main()
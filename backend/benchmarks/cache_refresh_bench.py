@@ -0,0 +1,102 @@
+"""visitor latency on hot cached answers as they expire: get/set vs stale-while-revalidate
+
+run from the backend directory:
+
+    python -m benchmarks.cache_refresh_bench --seconds 6 --ttl 1 --llm-ms 300
+
+--visitors concurrent callers keep asking --keys popular questions for --seconds. the
+"llm" is an asyncio.sleep of --llm-ms. "get_set" is the old pattern (get, on a miss
+generate and set, hard ttl); "swr" goes through CacheService.fetch with soft_ttl=ttl,
+a 3x hard ttl and refresh-ahead at 80%. reports per-request latency and how many llm calls
+each made.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from cache_service import CacheService, CachePolicy
+
+NAMESPACE = "ai_response"
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(pick(0.50), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "over_100ms": sum(1 for sample in ordered if sample > 100)
+    }
+
+async def run_mode(mode: str, args) -> Dict[str, Any]:
+    policy = CachePolicy(ttl=args.ttl * 3, soft_ttl=args.ttl, refresh_ahead=0.8, refresh_ahead_min_hits=3)
+    cache = CacheService(default_ttl=args.ttl, policies={NAMESPACE: policy})
+    llm_calls = 0
+
+    async def generate(question: int) -> str:
+        nonlocal llm_calls
+        llm_calls += 1
+        await asyncio.sleep(args.llm_ms / 1000)
+        return f"answer to {question}"
+
+    async def ask(question: int) -> str:
+        if mode == "swr":
+            return await cache.fetch(NAMESPACE, str(question), lambda: generate(question))
+        key = f"{NAMESPACE}:{question}"
+        answer = cache.get(key)
+        if answer is None:
+            answer = await generate(question)
+            cache.set(key, answer, args.ttl)
+        return answer
+
+    latencies: List[float] = []
+    deadline = time.monotonic() + args.seconds
+
+    async def visitor(seed: int):
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            await ask(rng.randrange(args.keys))
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(rng.expovariate(1 / args.think_ms) / 1000)
+
+    await asyncio.gather(*(visitor(i) for i in range(args.visitors)))
+    report = {**_percentiles(latencies), "llm_calls": llm_calls}
+    if mode == "swr":
+        report["refresh"] = cache.stats()["namespaces"].get(NAMESPACE)
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="hot-key expiry latency, get/set vs stale-while-revalidate")
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--visitors", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=5)
+    parser.add_argument("--ttl", type=float, default=1.0)
+    parser.add_argument("--llm-ms", type=float, default=300.0)
+    parser.add_argument("--think-ms", type=float, default=20.0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {"benchmark": "cache_refresh", "parameters": {k: v for k, v in vars(args).items() if k != "output"}}
+    for mode in ("get_set", "swr"):
+        report[mode] = asyncio.run(run_mode(mode, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
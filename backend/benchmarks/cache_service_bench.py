@@ -0,0 +1,168 @@
+"""CacheService get/set throughput and bookkeeping cost at --entries entries
+
+run from the backend directory:
+
+    python -m benchmarks.cache_service_bench --entries 100000 --threads 4
+
+fills the cache with search-result-shaped values, then measures single-threaded set,
+get (hits and misses) and an 80/20 get/set mix, the same mix from --threads threads,
+stats() and clear_expired() latency, and that the entry and byte caps hold while a
+stream of short-ttl writes expires. "unbounded" is the previous plain-dict cache
+(no caps, full scans in stats/clear_expired), timed on the same workload.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import random
+import threading
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from cache_service import CacheService, CacheEntry
+
+class UnboundedCache:
+    """the dict-based cache this benchmark replaced"""
+    def __init__(self, default_ttl: int = 300):
+        self.cache: Dict[str, CacheEntry] = {}
+        self.default_ttl = default_ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        if key not in self.cache:
+            return None
+        entry = self.cache[key]
+        if time.time() > entry.expiry:
+            del self.cache[key]
+            return None
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl or self.default_ttl
+        self.cache[key] = CacheEntry(value=value, expiry=time.time() + ttl, created_at=time.time())
+
+    def clear_expired(self) -> int:
+        now = time.time()
+        expired = [key for key, entry in self.cache.items() if now > entry.expiry]
+        for key in expired:
+            del self.cache[key]
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        valid = sum(1 for entry in self.cache.values() if now <= entry.expiry)
+        size = sum(len(str(entry.value)) for entry in self.cache.values()) / (1024 * 1024)
+        return {"total_entries": len(self.cache), "valid_entries": valid, "cache_size_mb": size}
+
+def make_value(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "query": f"projects {rng.randrange(1000)}",
+        "results": [{"id": f"doc{rng.randrange(500)}", "score": rng.random(), "content": "portfolio " * rng.randrange(5, 40)}
+                    for _ in range(3)],
+        "status": "success"
+    }
+
+def _rate(ops: int, seconds: float) -> float:
+    return round(ops / seconds, 1) if seconds else 0.0
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def run_single(cache: Any, keys: List[str], values: List[Any], ops: int, rng: random.Random) -> Dict[str, Any]:
+    entries = len(keys)
+    set_seconds = _timed(lambda: [cache.set(keys[i], values[i % len(values)], 600) for i in range(entries)])
+    hit_keys = [keys[rng.randrange(entries)] for _ in range(ops)]
+    hit_seconds = _timed(lambda: [cache.get(key) for key in hit_keys])
+    miss_seconds = _timed(lambda: [cache.get(f"missing{i}") for i in range(ops)])
+
+    mixed = [(rng.random() < 0.8, keys[rng.randrange(entries)]) for _ in range(ops)]
+    def run_mixed():
+        for is_get, key in mixed:
+            if is_get:
+                cache.get(key)
+            else:
+                cache.set(key, values[0], 600)
+    mixed_seconds = _timed(run_mixed)
+
+    return {
+        "set_per_second": _rate(entries, set_seconds),
+        "get_hit_per_second": _rate(ops, hit_seconds),
+        "get_miss_per_second": _rate(ops, miss_seconds),
+        "mixed_per_second": _rate(ops, mixed_seconds),
+        "stats_ms": round(_timed(cache.stats) * 1000, 3),
+        "clear_expired_ms": round(_timed(cache.clear_expired) * 1000, 3)
+    }
+
+def run_threaded(cache: CacheService, keys: List[str], values: List[Any], ops: int, threads: int) -> Dict[str, Any]:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        plan = [(rng.random() < 0.8, keys[rng.randrange(len(keys))]) for _ in range(ops // threads)]
+        barrier.wait()
+        for is_get, key in plan:
+            if is_get:
+                cache.get(key)
+            else:
+                cache.set(key, values[0], 600)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return {"threads": threads, "mixed_per_second": _rate(ops // threads * threads, time.perf_counter() - start)}
+
+def run_caps(entries: int, values: List[Any]) -> Dict[str, Any]:
+    cache = CacheService(default_ttl=1, max_entries=entries // 2, max_bytes=32 * 1024 * 1024)
+    peak_entries = peak_bytes = 0
+    for i in range(entries * 2):
+        cache.set(f"stream{i}", values[i % len(values)], 0.05 if i % 2 else 600)
+        if i % 1000 == 0:
+            stats = cache.stats()
+            peak_entries = max(peak_entries, stats["total_entries"])
+            peak_bytes = max(peak_bytes, stats["cache_bytes"])
+    stats = cache.stats()
+    return {
+        "max_entries": cache.max_entries,
+        "max_bytes": cache.max_bytes,
+        "peak_entries": peak_entries,
+        "peak_bytes": peak_bytes,
+        "evictions": stats["evictions"],
+        "expirations": stats["expirations"],
+        "within_caps": peak_entries <= cache.max_entries and peak_bytes <= cache.max_bytes
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="CacheService throughput at a large entry count")
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(5)
+    keys = [f"knowledge:{i:08d}" for i in range(args.entries)]
+    values = [make_value(rng) for _ in range(256)]
+    report: Dict[str, Any] = {"benchmark": "cache_service", "parameters": {k: v for k, v in vars(args).items() if k != "output"}}
+
+    bounded = CacheService(default_ttl=600, max_entries=args.entries, max_bytes=1 << 30)
+    report["lru"] = run_single(bounded, keys, values, args.ops, random.Random(1))
+    report["lru"]["bytes"] = bounded.stats()["cache_bytes"]
+    report["lru_threaded"] = run_threaded(bounded, keys, values, args.ops, args.threads)
+    report["unbounded"] = run_single(UnboundedCache(600), keys, values, args.ops, random.Random(1))
+    report["caps"] = run_caps(args.entries, values)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
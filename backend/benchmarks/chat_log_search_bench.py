@@ -0,0 +1,137 @@
+"""full-text chat log search latency: /chat/logs/search storage path over a large seeded history
+
+run from the backend directory:
+
+    python -m benchmarks.chat_log_search_bench --rows 300000 --months 6
+
+seeds --rows synthetic chat logs spread over --months monthly partitions (the fts
+triggers index them on insert), then times bm25-ranked and newest-first searches
+for common, rare and prefix terms, with and without a 7 day window. the "scan"
+baseline is the LIKE filter an admin would otherwise run over the chat_logs view.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from app.core.config import settings
+from app.core import database
+from app.core.database import ChatLogManager
+
+DAY_MS = 86400000
+TOPICS = ["dexchat", "portfolio", "react", "fastapi", "kubernetes", "resume", "internship", "typescript",
+          "websockets", "postgres", "machine learning", "hackathon", "contact", "education", "blog"]
+FILLER = ("tell me about what has he built with which projects and how long did it take the team "
+          "used several tools to ship it quickly across the stack").split()
+
+SEARCHES = [
+    ("common", "react"),
+    ("rare", "hackathon websockets"),
+    ("prefix", "kube*"),
+    ("phrase words", "machine learning")
+]
+
+def _sentence(rng: random.Random, topic: str, words: int) -> str:
+    body = [rng.choice(FILLER) for _ in range(words)]
+    body.insert(rng.randrange(len(body) + 1), topic)
+    return " ".join(body)
+
+def seed(path: str, rows: int, months: int, seed_value: int):
+    rng = random.Random(seed_value)
+    now = database.now_ms()
+    span = months * 30 * DAY_MS
+    by_partition: Dict[str, List[tuple]] = {}
+    for i in range(rows):
+        timestamp = now - rng.randrange(span)
+        # a long tail: the first topics show up far more often than the last
+        topic = TOPICS[min(int(rng.expovariate(0.35)), len(TOPICS) - 1)]
+        row = (f"seed{i}", f"session_{rng.randrange(rows // 4 + 1)}", _sentence(rng, topic, 8),
+               _sentence(rng, rng.choice(TOPICS), 40), rng.random() * 3, timestamp)
+        by_partition.setdefault(database.ensure_chat_log_partition(timestamp), []).append(row)
+
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for table, table_rows in by_partition.items():
+                conn.executemany(f'''
+                    INSERT INTO {table} (id, session_id, user_query, final_response, response_time, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', table_rows)
+    finally:
+        conn.close()
+
+def _timings(fn, repeats: int) -> Dict[str, Any]:
+    samples = []
+    results = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "results": len(results),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "max_ms": round(samples[-1], 3),
+        "mean_ms": round(statistics.fmean(samples), 3)
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="time fts5 chat log search against a LIKE scan")
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    settings.retention_enabled = False
+    report: Dict[str, Any] = {"benchmark": "chat_log_search", "parameters": {k: v for k, v in vars(args).items() if k != "output"}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        settings.database_path = os.path.join(workdir, "conversations.db")
+        database.init_database()
+        start = time.perf_counter()
+        seed(settings.database_path, args.rows, args.months, args.seed)
+        report["seed_seconds"] = round(time.perf_counter() - start, 2)
+        report["partitions"] = len(database.chat_log_partitions())
+
+        week_ago = database.now_ms() - 7 * DAY_MS
+        searches: Dict[str, Any] = {}
+        for label, query in SEARCHES:
+            searches[label] = {
+                "query": query,
+                "rank": _timings(lambda: ChatLogManager.search_chat_logs(query, args.limit), args.repeats),
+                "newest": _timings(lambda: ChatLogManager.search_chat_logs(query, args.limit, order="newest"), args.repeats),
+                "rank_last_7_days": _timings(
+                    lambda: ChatLogManager.search_chat_logs(query, args.limit, since_ms=week_ago), args.repeats
+                )
+            }
+        report["searches"] = searches
+
+        conn = database.get_db_connection()
+        report["scan_baseline"] = _timings(lambda: conn.execute('''
+            SELECT id FROM chat_logs
+            WHERE user_query LIKE ? OR final_response LIKE ?
+            ORDER BY timestamp DESC LIMIT ?
+        ''', ("%hackathon%", "%hackathon%", args.limit)).fetchall(), max(1, args.repeats // 5))
+
+        database.stop_write_queue()
+        database.close_db_connections()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""sqlite persistence benchmark: per-call connections vs the pooled WAL connections
+
+run from the backend directory:
+
+    python -m benchmarks.database_bench --inserts 2000 --reads 5000 --seconds 5
+
+"legacy" reproduces the old get_db_connection (makedirs + sqlite3.connect per
+call, default rollback journal); "pooled" goes through app.core.database with
+one transaction per write; "write_behind" adds the batching write queue.
+"""
+from typing import Callable, Dict, Any, List, Optional
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from app.core.config import settings
+from app.core import database
+
+SESSIONS = [f"session_{i}" for i in range(200)]
+
+def _legacy_connection(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def legacy_save_message(path: str, session_id: str, content: str):
+    conn = _legacy_connection(path)
+    try:
+        conn.execute('''
+            INSERT INTO conversations (session_id, message_id, role, content, metadata)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (session_id, f"user_{uuid.uuid4()}", "user", content, None))
+        conn.commit()
+    finally:
+        conn.close()
+
+def legacy_history(path: str, session_id: str) -> List[sqlite3.Row]:
+    conn = _legacy_connection(path)
+    try:
+        return conn.execute('''
+            SELECT message_id, role, content, timestamp, metadata
+            FROM conversations
+            WHERE session_id = ?
+            ORDER BY timestamp ASC
+            LIMIT 50
+        ''', (session_id,)).fetchall()
+    finally:
+        conn.close()
+
+def pooled_save_message(session_id: str, content: str):
+    database.ConversationManager.save_message(session_id, f"user_{uuid.uuid4()}", "user", content)
+
+def pooled_history(session_id: str) -> List[Dict[str, Any]]:
+    return database.ConversationManager.get_conversation_history(session_id)
+
+def _rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 1) if seconds else 0.0
+
+def run_serial(save: Callable[[str, str], None], history: Callable[[str], Any], inserts: int, reads: int) -> Dict[str, float]:
+    rng = random.Random(7)
+    start = time.perf_counter()
+    for i in range(inserts):
+        save(rng.choice(SESSIONS), f"benchmark message {i} " * 4)
+    database.flush_writes(None)
+    insert_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(reads):
+        history(rng.choice(SESSIONS))
+    read_seconds = time.perf_counter() - start
+
+    return {"inserts_per_sec": _rate(inserts, insert_seconds), "reads_per_sec": _rate(reads, read_seconds)}
+
+def run_concurrent(save: Callable[[str, str], None], history: Callable[[str], Any], readers: int, seconds: float) -> Dict[str, float]:
+    """one writer and several readers hammering the database at the same time"""
+    stop = threading.Event()
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def writer():
+        rng = random.Random(11)
+        while not stop.is_set():
+            try:
+                save(rng.choice(SESSIONS), "concurrent write")
+                with lock:
+                    counts["writes"] += 1
+            except sqlite3.Error:
+                with lock:
+                    counts["errors"] += 1
+
+    def reader(seed: int):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            try:
+                history(rng.choice(SESSIONS))
+                with lock:
+                    counts["reads"] += 1
+            except sqlite3.Error:
+                with lock:
+                    counts["errors"] += 1
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "concurrent_writes_per_sec": _rate(counts["writes"], seconds),
+        "concurrent_reads_per_sec": _rate(counts["reads"], seconds),
+        "concurrent_errors": counts["errors"]
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="sqlite connection handling benchmark")
+    parser.add_argument("--inserts", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of the concurrent phase")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    report = {"benchmark": "database", "parameters": {k: v for k, v in vars(args).items() if k != "output"}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy_path = os.path.join(workdir, "legacy", "conversations.db")
+        settings.database_path = legacy_path
+        database.init_database()
+        database.close_db_connections()
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+        report["legacy"] = run_serial(
+            lambda s, c: legacy_save_message(legacy_path, s, c), lambda s: legacy_history(legacy_path, s),
+            args.inserts, args.reads
+        )
+        report["legacy"].update(run_concurrent(
+            lambda s, c: legacy_save_message(legacy_path, s, c), lambda s: legacy_history(legacy_path, s),
+            args.readers, args.seconds
+        ))
+
+        for name, write_behind in (("pooled", False), ("write_behind", True)):
+            settings.database_path = os.path.join(workdir, name, "conversations.db")
+            settings.write_behind_enabled = write_behind
+            database.init_database()
+            report[name] = run_serial(pooled_save_message, pooled_history, args.inserts, args.reads)
+            report[name].update(run_concurrent(pooled_save_message, pooled_history, args.readers, args.seconds))
+            if write_behind:
+                database.flush_writes(None)
+                report[name]["write_queue"] = database.get_write_queue().stats()
+                database.stop_write_queue()
+            database.close_db_connections()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
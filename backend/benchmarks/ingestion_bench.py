@@ -0,0 +1,89 @@
+"""full vs incremental ingestion time, plus a correctness check of incremental re-ingest
+
+run from the backend directory:
+
+    python -m benchmarks.ingestion_bench --projects 200 --paragraphs 40
+
+builds --projects folders that each hold a README.md (same file name everywhere, like
+per-project readmes) and a notes.md, ingests them all, edits one README and re-ingests.
+"check" fails when the rebuilt index holds a chunk id twice, keeps any text of the edited
+README's old version, or loses a chunk of an unchanged file.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from app.data.ingestion import ingest
+from app.data.knowledge_index import KnowledgeIndex
+
+def write_project(root: str, project: int, paragraphs: int, marker: str = "alpha") -> None:
+    folder = os.path.join(root, f"project-{project}")
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "README.md"), "w") as f:
+        f.write(f"# project {project}\n\n")
+        for i in range(paragraphs):
+            f.write(f"{marker} paragraph {i} of project {project} built with react and fastapi.\n\n")
+    with open(os.path.join(folder, "notes.md"), "w") as f:
+        f.write(f"# notes {project}\n\n")
+        for i in range(paragraphs):
+            f.write(f"note {i} for project {project}: deployed on docker with postgres.\n\n")
+
+def index_contents(index_path: str) -> List[Any]:
+    index = KnowledgeIndex(index_path)
+    try:
+        return [(chunk.id, chunk.content) for chunk in index.iter_chunks()]
+    finally:
+        index.close()
+
+def check(contents: List[Any], before: List[Any], edited_id_prefix: str) -> Dict[str, Any]:
+    ids = [chunk_id for chunk_id, _ in contents]
+    untouched_before = {item for item in before if not item[0].startswith(edited_id_prefix)}
+    return {
+        "duplicate_ids": len(ids) - len(set(ids)),
+        "stale_chunks": sum(1 for chunk_id, content in contents if "alpha paragraph" in content and "project 0 " in content),
+        "lost_unchanged_chunks": len(untouched_before - set(contents))
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="full vs incremental knowledge ingestion")
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {"benchmark": "ingestion", "parameters": {k: v for k, v in vars(args).items() if k != "output"}}
+    with tempfile.TemporaryDirectory() as workdir:
+        sources = os.path.join(workdir, "docs")
+        index_path = os.path.join(workdir, "knowledge.idx")
+        for project in range(args.projects):
+            write_project(sources, project, args.paragraphs)
+
+        start = time.perf_counter()
+        report["full"] = ingest([sources], index_path)
+        report["full_seconds"] = round(time.perf_counter() - start, 3)
+        before = index_contents(index_path)
+
+        write_project(sources, 0, args.paragraphs, marker="beta")
+        start = time.perf_counter()
+        report["incremental"] = ingest([sources], index_path)
+        report["incremental_seconds"] = round(time.perf_counter() - start, 3)
+
+        report["check"] = check(index_contents(index_path), before, "project-0-readme-")
+        report["check"]["ok"] = not any(report["check"].values())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if not report["check"]["ok"]:
+        raise SystemExit("incremental ingest check failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""knowledge search scaling benchmark
+
+run from the backend directory:
+
+    python -m benchmarks.knowledge_search_bench --sizes 20 1000 10000 100000 --output bench.json
+
+generates synthetic knowledge bases, builds an mmap index for each size and
+reports latency percentiles, allocations and recall@k per search engine as json.
+"""
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from app.core.config import settings
+from app.data.knowledge_base import (
+    KnowledgeChunk, KNOWLEDGE_BASE, tokenize_query, vocabulary_words, expand_query,
+    boosted_categories, partition_chunks, _search_in_memory
+)
+from app.data.fuzzy_matching import DeletionDictionary
+from app.data.knowledge_index import KnowledgeIndex, build_knowledge_index
+from app.tools.information_tools import KnowledgeSearchTool
+
+DEFAULT_SIZES = [20, 1000, 10000, 100000]
+UNAVAILABLE_ENGINES = {"bm25": "no bm25 scorer in this tree", "dense": "no embedding search in this tree"}
+CATEGORIES = sorted({chunk.category for chunk in KNOWLEDGE_BASE})
+
+def synthetic_corpus(size: int, rng: random.Random) -> List[KnowledgeChunk]:
+    """the real chunks first, then generated ones over a zipf-like vocabulary"""
+    base_words = vocabulary_words(KNOWLEDGE_BASE)
+    vocabulary = base_words + [f"{rng.choice(base_words)[:5]}{i}" for i in range(max(size // 4, 100))]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    chunks = list(KNOWLEDGE_BASE[:size])
+    for i in range(len(chunks), size):
+        words = rng.choices(vocabulary, weights=weights, k=60)
+        anchor = f"doc{i}x"
+        keywords = [anchor] + rng.sample(vocabulary, 7)
+        chunks.append(KnowledgeChunk(
+            id=f"synthetic-{i}",
+            category=rng.choice(CATEGORIES),
+            content=" ".join(words[:30] + [anchor] + words[30:]),
+            keywords=keywords
+        ))
+    return chunks
+
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 6:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:]
+
+def targeted_queries(chunks: List[KnowledgeChunk], count: int, rng: random.Random) -> List[Tuple[str, str]]:
+    """(query, target chunk id) pairs; a third of them contain a typo"""
+    queries = []
+    for n in range(count):
+        chunk = rng.choice(chunks)
+        words = [w for w in tokenize_query(" ".join(chunk.keywords)) if len(w) > 2]
+        picked = rng.sample(words, min(len(words), 2)) if words else [chunk.category]
+        if n % 3 == 0:
+            picked = [_typo(w, rng) for w in picked]
+        queries.append((" ".join(picked), chunk.id))
+    return queries
+
+def logged_queries(database_path: Optional[str], count: int) -> List[str]:
+    """recent visitor queries from the chat_logs table, when a database is given"""
+    if not database_path or not os.path.exists(database_path):
+        return []
+    conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT user_query FROM chat_logs ORDER BY timestamp DESC LIMIT ?", (count,)).fetchall()
+        return [row[0] for row in rows]
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+
+def _percentiles(samples_ns: List[int]) -> Dict[str, float]:
+    ordered = sorted(samples_ns)
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] / 1e6
+    return {
+        "p50": round(pick(0.50), 4),
+        "p95": round(pick(0.95), 4),
+        "p99": round(pick(0.99), 4),
+        "mean": round(statistics.fmean(ordered) / 1e6, 4),
+        "max": round(ordered[-1] / 1e6, 4)
+    }
+
+def measure(search: Callable[[str], List[KnowledgeChunk]], queries: List[Tuple[str, Optional[str]]], k: int,
+            alloc_samples: int) -> Dict[str, Any]:
+    for query, _ in queries[:5]:
+        search(query)
+
+    latencies = []
+    hits = 0
+    judged = 0
+    for query, target in queries:
+        start = time.perf_counter_ns()
+        results = search(query)
+        latencies.append(time.perf_counter_ns() - start)
+        if target is not None:
+            judged += 1
+            hits += any(chunk.id == target for chunk in results[:k])
+
+    tracemalloc.start()
+    peaks = []
+    for query, _ in queries[:alloc_samples]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        search(query)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {
+        "queries": len(queries),
+        "latency_ms": _percentiles(latencies),
+        "alloc_peak_kb": {"mean": round(statistics.fmean(peaks) / 1024, 2), "max": round(max(peaks) / 1024, 2)} if peaks else None,
+        f"recall_at_{k}": round(hits / judged, 4) if judged else None
+    }
+
+def run_size(size: int, queries_per_size: int, k: int, max_scan_size: int, database_path: Optional[str],
+             alloc_samples: int, workdir: str, rng: random.Random) -> List[Dict[str, Any]]:
+    chunks = synthetic_corpus(size, rng)
+    queries: List[Tuple[str, Optional[str]]] = list(targeted_queries(chunks, queries_per_size, rng))
+    queries += [(query, None) for query in logged_queries(database_path, queries_per_size)]
+    results = []
+
+    max_distance = settings.knowledge_fuzzy_max_distance if settings.knowledge_fuzzy_enabled else 0
+    penalty = settings.knowledge_fuzzy_penalty
+
+    index_path = os.path.join(workdir, f"knowledge-{size}.idx")
+    build_start = time.perf_counter()
+    build_knowledge_index(chunks, index_path, max_distance)
+    build_seconds = time.perf_counter() - build_start
+
+    open_start = time.perf_counter()
+    index = KnowledgeIndex(index_path)
+    open_ms = (time.perf_counter() - open_start) * 1000
+
+    def indexed(query: str) -> List[KnowledgeChunk]:
+        weighted = expand_query(tokenize_query(query), index.has_exact_match, index.fuzzy_lookup, max_distance, penalty)
+        return index.search(weighted, boosted_categories(weighted), k)
+
+    row = {"size": size, "engine": "indexed", **measure(indexed, queries, k, alloc_samples)}
+    row.update({"build_seconds": round(build_seconds, 3), "open_ms": round(open_ms, 3),
+                "index_bytes": os.path.getsize(index_path)})
+    results.append(row)
+
+    if size <= max_scan_size:
+        partitions = partition_chunks(chunks)
+        dictionary = DeletionDictionary(vocabulary_words(chunks), max(max_distance, 1))
+        lowered = [(chunk, chunk.content.lower(), [kw.lower() for kw in chunk.keywords]) for chunk in chunks]
+
+        def exact_match(word: str) -> bool:
+            return any(word in chunk.category or word in text or any(word in kw for kw in keywords)
+                       for chunk, text, keywords in lowered)
+
+        def scan(query: str) -> List[KnowledgeChunk]:
+            weighted = expand_query(tokenize_query(query), exact_match, dictionary.lookup, max_distance, penalty)
+            return _search_in_memory(weighted, boosted_categories(weighted), k, None, partitions)
+
+        results.append({"size": size, "engine": "scan", **measure(scan, queries, k, alloc_samples)})
+    else:
+        results.append({"size": size, "engine": "scan", "skipped": f"size above --max-scan-size {max_scan_size}"})
+
+    previous_path = settings.knowledge_index_path
+    settings.knowledge_index_path = index_path
+    try:
+        tool = KnowledgeSearchTool()
+        loop = asyncio.new_event_loop()
+
+        def through_tool(query: str) -> List[KnowledgeChunk]:
+            result = loop.run_until_complete(tool.execute({"query": query}))
+            items = (result.result or {}).get("results", [])
+            return [KnowledgeChunk(id=item["id"], category=item["category"], content="", keywords=[]) for item in items]
+
+        results.append({"size": size, "engine": "indexed+knowledge_search_tool",
+                        **measure(through_tool, queries, k, alloc_samples)})
+        loop.close()
+    finally:
+        settings.knowledge_index_path = previous_path
+
+    for engine, reason in UNAVAILABLE_ENGINES.items():
+        results.append({"size": size, "engine": engine, "skipped": reason})
+
+    index.close()
+    return results
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="knowledge search scaling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=200, help="targeted queries per corpus size")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--max-scan-size", type=int, default=20000, help="skip the linear scorer above this size")
+    parser.add_argument("--alloc-samples", type=int, default=20, help="queries re-run under tracemalloc")
+    parser.add_argument("--database", default=None, help="chat log database to draw real queries from")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default=None, help="write the json report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    report = {
+        "benchmark": "knowledge_search",
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "parameters": {k: v for k, v in vars(args).items() if k != "output"},
+        "fuzzy": {"enabled": settings.knowledge_fuzzy_enabled, "max_distance": settings.knowledge_fuzzy_max_distance,
+                  "penalty": settings.knowledge_fuzzy_penalty},
+        "results": []
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"[BENCH] knowledge search size={size}", file=sys.stderr)
+            report["results"].extend(
+                run_size(size, args.queries, args.k, args.max_scan_size, args.database, args.alloc_samples, workdir, rng)
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""tool payload storage benchmark: inline json vs deduplicated blob references
+
+run from the backend directory:
+
+    python -m benchmarks.payload_storage_bench --chats 10000
+
+replays the writes of one chat turn (assistant message metadata, knowledge_search
+tool execution, chat log) with realistic knowledge_search results drawn from the
+shipped knowledge base, once with PAYLOAD_DEDUPE_ENABLED off and once on. reports
+database bytes per --chats chats after a checkpoint and VACUUM, and checks that
+every stored payload rehydrates to the original.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from app.core.config import settings
+from app.core import database
+from app.data.knowledge_base import KNOWLEDGE_BASE
+
+QUERIES = [f"tell me about {chunk.category} {keyword}" for chunk in KNOWLEDGE_BASE for keyword in chunk.keywords[:3]]
+
+def knowledge_result(rng: random.Random, query: str) -> Dict[str, Any]:
+    chunks = rng.sample(KNOWLEDGE_BASE, 3)
+    results = [
+        {
+            "id": chunk.id,
+            "category": chunk.category,
+            "content": chunk.content,
+            "relevance": round(rng.uniform(2, 12), 2),
+            "keywords": chunk.keywords
+        } for chunk in chunks
+    ]
+    return {"query": query, "results": results, "total_results": len(results), "status": "success"}
+
+def chat_turn(rng: random.Random, i: int) -> Dict[str, Any]:
+    query = rng.choice(QUERIES)
+    tool_results = [{
+        "tool_name": "knowledge_search",
+        "result": knowledge_result(rng, query),
+        "execution_time": rng.random() / 10
+    }]
+    modal_actions = [{"action": "open", "modal_id": rng.choice(["about", "projects", "experience", "contact"])}]
+    return {
+        "session_id": f"session_{i // 4}",
+        "query": query,
+        "tool_results": tool_results,
+        "modal_actions": modal_actions,
+        "suggestions": ["what projects has blake built?", "what is his work experience?"]
+    }
+
+def write_chats(chats: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    log_ids = []
+    for i in range(chats):
+        turn = chat_turn(rng, i)
+        database.ConversationManager.save_message(
+            turn["session_id"], f"assistant_{i}", "assistant", "seeded response",
+            {"tool_results": turn["tool_results"], "modal_actions": turn["modal_actions"], "intent_analysis": {}}
+        )
+        database.ToolExecutionManager.log_execution(
+            turn["session_id"], "knowledge_search", {"query": turn["query"]},
+            turn["tool_results"][0]["result"], turn["tool_results"][0]["execution_time"], True
+        )
+        log_id = f"log_{i}"
+        database.ChatLogManager.save_chat_log(
+            log_id, turn["session_id"], turn["query"], "seeded response", turn["tool_results"],
+            turn["modal_actions"], turn["suggestions"], rng.random() * 3, "127.0.0.1", "bench"
+        )
+        log_ids.append(log_id)
+        if i % 1000 == 999:
+            database.flush_writes(timeout=None)
+    database.flush_writes(timeout=None)
+    return log_ids
+
+def verify_round_trip(chats: int, seed: int, log_ids: List[str]) -> int:
+    rng = random.Random(seed)
+    mismatches = 0
+    for i, log_id in enumerate(log_ids):
+        turn = chat_turn(rng, i)
+        rng.random()
+        log = database.ChatLogManager.get_chat_log(log_id)
+        if (log["tools_used"], log["modal_actions"], log["suggestions"]) != (
+                turn["tool_results"], turn["modal_actions"], turn["suggestions"]):
+            mismatches += 1
+    return mismatches
+
+def database_bytes(path: str) -> Dict[str, int]:
+    conn = database.get_db_connection()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    tables = None
+    if _has_dbstat(conn):
+        def table_bytes(names: List[str]) -> int:
+            placeholders = ', '.join('?' for _ in names)
+            return conn.execute(f'SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN ({placeholders})', names).fetchone()[0]
+        tables = {name: table_bytes([name]) for name in ('conversations', 'tool_executions', 'payload_blobs')}
+        # chat_logs is a view over monthly partitions
+        tables['chat_logs'] = table_bytes(database.chat_log_partitions() or ['chat_logs'])
+    return {"file_bytes": os.path.getsize(path), "page_size": page_size, "table_bytes": tables}
+
+def _has_dbstat(conn) -> bool:
+    try:
+        conn.execute('SELECT 1 FROM dbstat LIMIT 1')
+        return True
+    except Exception:
+        return False
+
+def run_mode(workdir: str, dedupe: bool, chats: int, seed: int) -> Dict[str, Any]:
+    settings.database_path = os.path.join(workdir, f"{'dedupe' if dedupe else 'inline'}.db")
+    settings.payload_dedupe_enabled = dedupe
+    database.init_database()
+
+    start = time.perf_counter()
+    log_ids = write_chats(chats, seed)
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mismatches = verify_round_trip(chats, seed, log_ids)
+    read_seconds = time.perf_counter() - start
+
+    size = database_bytes(settings.database_path)
+    database.stop_write_queue()
+    database.close_db_connections()
+    return {
+        "write_seconds": round(write_seconds, 3),
+        "read_seconds": round(read_seconds, 3),
+        "round_trip_mismatches": mismatches,
+        **size
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="database size per chats with and without payload dedupe")
+    parser.add_argument("--chats", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {"benchmark": "payload_storage", "parameters": {"chats": args.chats, "seed": args.seed}}
+    with tempfile.TemporaryDirectory() as workdir:
+        report["inline"] = run_mode(workdir, False, args.chats, args.seed)
+        report["dedupe"] = run_mode(workdir, True, args.chats, args.seed)
+
+    report["size_ratio"] = round(report["dedupe"]["file_bytes"] / report["inline"]["file_bytes"], 3)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
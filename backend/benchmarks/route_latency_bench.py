@@ -0,0 +1,158 @@
+"""event loop responsiveness benchmark: /health latency while /chat/analytics runs
+
+run from the backend directory:
+
+    python -m benchmarks.route_latency_bench --rows 200000 --seconds 5
+
+seeds a throwaway chat_logs table (and its rollups), probes /health on its own and then while
+several clients hammer /chat/analytics. "executor" is the shipped route code;
+"inline" swaps run_db/run_analytics for a direct call to show the old event-loop blocking.
+exits non-zero when the executor p99 exceeds --max-p99-ms.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import httpx
+
+from app.core.config import settings
+from app.core import database, storage
+
+QUERIES = [f"tell me about project {i}" for i in range(500)]
+
+def seed_chat_logs(path: str, rows: int):
+    rng = random.Random(3)
+    now = database.now_ms()
+    by_partition: Dict[str, List[tuple]] = {}
+    for i in range(rows):
+        timestamp = now - rng.randrange(20 * 86400000)
+        row = (f"seed{i}", f"session_{rng.randrange(rows // 5 + 1)}", rng.choice(QUERIES), "seeded response",
+               rng.random() * 3, timestamp)
+        by_partition.setdefault(database.ensure_chat_log_partition(timestamp), []).append(row)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for table, table_rows in by_partition.items():
+                conn.executemany(f'''
+                    INSERT INTO {table} (id, session_id, user_query, final_response, response_time, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', table_rows)
+    finally:
+        conn.close()
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "samples": len(ordered),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3)
+    }
+
+async def probe_health(client: httpx.AsyncClient, seconds: float, interval: float) -> List[float]:
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/health")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+async def hammer_analytics(client: httpx.AsyncClient, stop: asyncio.Event, durations: List[float]):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/chat/analytics", params={"days": 30})
+        response.raise_for_status()
+        durations.append((time.perf_counter() - start) * 1000)
+
+async def run_mode(app: Any, seconds: float, interval: float, clients: int) -> Dict[str, Any]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/chat/analytics")
+        idle = await probe_health(client, seconds, interval)
+
+        stop = asyncio.Event()
+        analytics: List[float] = []
+        workers = [asyncio.create_task(hammer_analytics(client, stop, analytics)) for _ in range(clients)]
+        await asyncio.sleep(0.05)
+        loaded = await probe_health(client, seconds, interval)
+        stop.set()
+        await asyncio.gather(*workers)
+
+    return {
+        "health_idle": _percentiles(idle),
+        "health_during_analytics": _percentiles(loaded),
+        "analytics": _percentiles(analytics) if analytics else None
+    }
+
+async def _inline_run_db(func: Callable, *args, **kwargs):
+    return func(*args, **kwargs)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="/health latency under concurrent analytics load")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each probe phase")
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="pause between /health probes")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent /chat/analytics callers")
+    parser.add_argument("--max-p99-ms", type=float, default=50.0, help="fail if the executor p99 under load exceeds this")
+    parser.add_argument("--skip-inline", action="store_true", help="do not measure the blocking baseline")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    import main as app_main
+
+    report: Dict[str, Any] = {"benchmark": "route_latency", "parameters": {k: v for k, v in vars(args).items() if k != "output"}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        settings.database_path = os.path.join(workdir, "conversations.db")
+        database.init_database()
+        seed_chat_logs(settings.database_path, args.rows)
+        database.submit_writes(database.rollup_rebuild_statements(), wait=True)
+
+        interval = args.interval_ms / 1000
+        report["executor"] = asyncio.run(run_mode(app_main.app, args.seconds, interval, args.clients))
+
+        if not args.skip_inline:
+            originals = storage.run_db, storage.run_analytics
+            storage.run_db = storage.run_analytics = _inline_run_db
+            try:
+                report["inline"] = asyncio.run(run_mode(app_main.app, args.seconds, interval, args.clients))
+            finally:
+                storage.run_db, storage.run_analytics = originals
+
+        database.shutdown_db_executor()
+        database.stop_write_queue()
+        database.close_db_connections()
+
+    p99 = report["executor"]["health_during_analytics"]["p99_ms"]
+    report["passed"] = p99 <= args.max_p99_ms
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if not report["passed"]:
+        print(f"[BENCH] /health p99 {p99}ms under analytics load exceeds {args.max_p99_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
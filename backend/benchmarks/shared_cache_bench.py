@@ -0,0 +1,123 @@
+"""hit rate across several worker processes, with and without the shared cache tier
+
+run from the backend directory:
+
+    python -m benchmarks.shared_cache_bench --workers 4 --requests 20000 --queries 5000
+
+each of --workers processes gets its own stream of --requests lookups drawn from a zipf-ish
+distribution over --queries distinct questions (the load balancer spreads one audience over
+all workers); a miss "computes" the answer and caches it. "local" gives every worker only
+its own in-process lru, "shared" adds the sqlite tier underneath. misses are the calls that
+would reach the llm or the knowledge search. also times get/set on each path in one process.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from cache_service import CacheService
+from shared_cache import SharedCacheTier
+
+def make_answer(query: int) -> Dict[str, Any]:
+    return {
+        "response": f"answer {query} " + "he built several projects with react and fastapi. " * 12,
+        "tools_used": ["knowledge_search"],
+        "suggestions": ["what projects?", "contact info?"]
+    }
+
+def _zipf_stream(rng: random.Random, queries: int, count: int) -> List[int]:
+    weights = [1 / (rank + 1) for rank in range(queries)]
+    return rng.choices(range(queries), weights=weights, k=count)
+
+def worker(worker_id: int, shared_path: Optional[str], requests: int, queries: int, max_entries: int, results):
+    shared = SharedCacheTier(shared_path) if shared_path else None
+    cache = CacheService(default_ttl=600, max_entries=max_entries, shared=shared)
+    stream = _zipf_stream(random.Random(worker_id), queries, requests)
+    misses = 0
+    start = time.perf_counter()
+    for query in stream:
+        key = f"ai_response:{query}"
+        if cache.get(key) is None:
+            misses += 1
+            cache.set(key, make_answer(query))
+    elapsed = time.perf_counter() - start
+    stats = cache.stats()
+    if shared is not None:
+        shared.close()
+    results.put({"misses": misses, "shared_hits": stats["shared_hits"], "seconds": elapsed})
+
+def run_fleet(shared_path: Optional[str], args) -> Dict[str, Any]:
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(i, shared_path, args.requests, args.queries,
+                                                              args.max_entries, results))
+                 for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    total = args.workers * args.requests
+    misses = sum(item["misses"] for item in collected)
+    return {
+        "requests": total,
+        "misses": misses,
+        "hit_rate": round(1 - misses / total, 4),
+        "shared_hits": sum(item["shared_hits"] for item in collected),
+        "slowest_worker_seconds": round(max(item["seconds"] for item in collected), 3)
+    }
+
+def _per_op_us(fn, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return round((time.perf_counter() - start) / count * 1e6, 2)
+
+def run_latency(shared_path: str, count: int) -> Dict[str, Any]:
+    answer = make_answer(0)
+    local = CacheService(default_ttl=600, max_entries=count * 2)
+    tiered = CacheService(default_ttl=600, max_entries=count * 2, shared=SharedCacheTier(shared_path))
+    reader = CacheService(default_ttl=600, max_entries=count * 2, shared=SharedCacheTier(shared_path))
+    report = {
+        "local_set_us": _per_op_us(lambda i: local.set(f"k{i}", answer), count),
+        "local_get_us": _per_op_us(lambda i: local.get(f"k{i}"), count),
+        "shared_set_us": _per_op_us(lambda i: tiered.set(f"k{i}", answer), count),
+        # a fresh process-local lru over the same file: every get reads through once, then hits locally
+        "shared_read_through_get_us": _per_op_us(lambda i: reader.get(f"k{i}"), count),
+        "after_read_through_get_us": _per_op_us(lambda i: reader.get(f"k{i}"), count),
+        "shared_miss_get_us": _per_op_us(lambda i: reader.get(f"missing{i}"), count)
+    }
+    tiered.stop()
+    reader.stop()
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="multi-process cache hit rate with and without the shared tier")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--max-entries", type=int, default=1000)
+    parser.add_argument("--latency-ops", type=int, default=5000)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {"benchmark": "shared_cache", "parameters": {k: v for k, v in vars(args).items() if k != "output"}}
+    with tempfile.TemporaryDirectory() as workdir:
+        report["local"] = run_fleet(None, args)
+        report["shared"] = run_fleet(os.path.join(workdir, "cache.db"), args)
+        report["latency"] = run_latency(os.path.join(workdir, "latency.db"), args.latency_ops)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
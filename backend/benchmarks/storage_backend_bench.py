@@ -0,0 +1,214 @@
+"""storage backend conformance and throughput: the same scenario against sqlite and postgres
+
+run from the backend directory (postgres needs asyncpg and a scratch database):
+
+    python -m benchmarks.storage_backend_bench --backends sqlite postgres \
+        --postgres-dsn postgresql://localhost:5432/chatbot_bench --turns 2000 --clients 16
+
+every backend first runs a conformance pass (history, tool executions, chat log
+paging, point lookups, export batches, search, analytics, clears) and must produce the
+same answers; then --clients concurrent callers write --turns chat turns
+(two messages, one tool execution, one chat log each) and page the logs back.
+the postgres database is wiped, so never point --postgres-dsn at real data.
+exits non-zero when a conformance check fails.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from app.core.config import settings
+from app.core import storage as storage_module
+from app.core.database import CHAT_LOG_SUMMARY_FIELDS
+
+TOOL_RESULT = {"query": "projects", "results": [{"id": "projects-1", "content": "portfolio site " * 30}], "status": "success"}
+
+async def conformance(storage: storage_module.StorageBackend) -> List[str]:
+    failures: List[str] = []
+
+    def check(name: str, condition: bool):
+        if not condition:
+            failures.append(name)
+
+    await storage.save_message("c1", "m1", "user", "hello")
+    await storage.save_message("c1", "m2", "assistant", "hi there", {"tool_results": [TOOL_RESULT]})
+    await storage.log_execution("c1", "knowledge_search", {"query": "projects"}, TOOL_RESULT, 0.01, True)
+    for i in range(5):
+        await storage.save_chat_log(
+            f"log{i}", "c1" if i % 2 == 0 else "c2", "What projects?" if i < 3 else "who is blake",
+            f"answer {i}", [{"tool_name": "knowledge_search", "result": TOOL_RESULT, "execution_time": 0.01}],
+            [], ["next"], 0.1 * (i + 1), "127.0.0.1", "bench"
+        )
+        await asyncio.sleep(0.002)
+    await _settle(storage)
+
+    history = await storage.get_conversation_history("c1")
+    check("history order", [m["id"] for m in history] == ["m1", "m2"])
+    check("history metadata", history[1]["metadata"] == {"tool_results": [TOOL_RESULT]})
+    recent = await storage.get_recent_messages("c1", 1)
+    check("recent messages", recent == [{"role": "assistant", "content": "hi there"}])
+
+    executions = await storage.get_tool_analytics("c1")
+    check("tool execution payload", len(executions) == 1 and executions[0]["output_data"] == TOOL_RESULT)
+
+    page = await storage.get_chat_logs(limit=2)
+    check("first page newest first", [log["id"] for log in page] == ["log4", "log3"])
+    older = await storage.get_chat_logs(limit=10, before=(int(page[-1]["cursor"].split("_")[0]), page[-1]["id"]))
+    check("keyset before", [log["id"] for log in older] == ["log2", "log1", "log0"])
+    newer = await storage.get_chat_logs(limit=10, after=(int(older[-1]["cursor"].split("_")[0]), older[-1]["id"]))
+    check("keyset after", [log["id"] for log in newer] == ["log4", "log3", "log2", "log1"])
+    summaries = await storage.get_chat_logs(session_id="c1", fields=CHAT_LOG_SUMMARY_FIELDS)
+    check("session projection", [log["id"] for log in summaries] == ["log4", "log2", "log0"]
+          and summaries[0]["tool_names"] == ["knowledge_search"] and "final_response" not in summaries[0])
+
+    log = await storage.get_chat_log("log1")
+    check("point lookup", log is not None and log["tools_used"][0]["result"] == TOOL_RESULT and log["suggestions"] == ["next"])
+    check("missing log", await storage.get_chat_log("nope") is None)
+
+    batches = [batch async for batch in storage.iter_chat_logs(batch_size=2)]
+    check("export batches", [len(batch) for batch in batches] == [2, 2, 1]
+          and [log["id"] for batch in batches for log in batch] == [f"log{i}" for i in range(5)])
+
+    found = await storage.search_chat_logs("project*")
+    check("search matches", sorted(log["id"] for log in found) == ["log0", "log1", "log2"]
+          and "<mark>" in found[0]["query_snippet"])
+    newest = await storage.search_chat_logs("blake", order="newest")
+    check("search newest first", [log["id"] for log in newest] == ["log4", "log3"])
+    in_session = await storage.search_chat_logs("answer", session_id="c2", order="newest")
+    check("search session filter", [log["id"] for log in in_session] == ["log3", "log1"])
+
+    analytics = await storage.get_chat_analytics(1)
+    check("analytics totals", analytics.get("total_queries") == 5 and analytics.get("unique_sessions") == 2)
+    check("analytics popular", analytics.get("popular_queries", [{}])[0] == {"query": "what projects", "count": 3})
+    check("analytics histogram", sum(bucket["count"] for bucket in analytics.get("response_time_histogram", [])) == 5)
+
+    await storage.clear_chat_logs("c2")
+    check("clear session logs", [log["id"] for log in await storage.get_chat_logs()] == ["log4", "log2", "log0"])
+    await storage.clear_conversation("c1")
+    check("clear conversation", await storage.get_conversation_history("c1") == [] and await storage.get_tool_analytics("c1") == [])
+    await storage.clear_chat_logs()
+    check("clear all logs", await storage.get_chat_logs() == [])
+    return failures
+
+async def _settle(storage: storage_module.StorageBackend):
+    if storage.name == "sqlite":
+        from app.core.database import flush_writes
+        await storage_module.run_db(flush_writes, None)
+        await storage_module.run_db(storage_module.analytics_replica.refresh)
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "p50_ms": round(pick(0.50), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "mean_ms": round(statistics.fmean(ordered), 3)
+    }
+
+async def throughput(storage: storage_module.StorageBackend, turns: int, clients: int) -> Dict[str, Any]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(turns):
+        queue.put_nowait(i)
+    latencies: List[float] = []
+
+    async def client():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            session_id = f"load{i % 200}"
+            start = time.perf_counter()
+            await storage.save_message(session_id, f"u{i}", "user", "what projects has blake built?")
+            await storage.log_execution(session_id, "knowledge_search", {"query": "projects"}, TOOL_RESULT, 0.01, True)
+            await storage.save_message(session_id, f"a{i}", "assistant", "several", {"tool_results": [TOOL_RESULT]})
+            await storage.save_chat_log(
+                f"load{i}", session_id, "what projects has blake built?", "several",
+                [{"tool_name": "knowledge_search", "result": TOOL_RESULT, "execution_time": 0.01}],
+                [], [], 0.2, "127.0.0.1", "bench"
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    await _settle(storage)
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pages = 0
+    page = await storage.get_chat_logs(limit=100, fields=CHAT_LOG_SUMMARY_FIELDS)
+    while page:
+        pages += 1
+        last = page[-1]
+        page = await storage.get_chat_logs(limit=100, before=(int(last["cursor"].split("_")[0]), last["id"]),
+                                           fields=CHAT_LOG_SUMMARY_FIELDS)
+    read_seconds = time.perf_counter() - start
+
+    return {
+        "turns_per_second": round(turns / write_seconds, 1),
+        "turn_latency": _percentiles(latencies),
+        "pages_read": pages,
+        "paging_seconds": round(read_seconds, 3)
+    }
+
+async def _reset_postgres(storage: storage_module.PostgresStorage):
+    async with storage._pool.acquire() as conn:
+        await conn.execute("TRUNCATE conversations, tool_executions, chat_logs")
+
+async def run_backend(backend: str, turns: int, clients: int) -> Dict[str, Any]:
+    storage = storage_module.create_storage(backend)
+    storage_module.set_storage(storage)
+    await storage.startup()
+    try:
+        if isinstance(storage, storage_module.PostgresStorage):
+            await _reset_postgres(storage)
+        failures = await conformance(storage)
+        result = {"conformance_failures": failures}
+        result.update(await throughput(storage, turns, clients))
+        return result
+    finally:
+        await storage.shutdown()
+        storage_module.set_storage(None)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="run one conformance scenario and load test against each storage backend")
+    parser.add_argument("--backends", nargs="+", choices=storage_module.STORAGE_BACKENDS, default=["sqlite"])
+    parser.add_argument("--postgres-dsn", default=None, help="scratch database, wiped before the run")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    if args.postgres_dsn:
+        settings.postgres_dsn = args.postgres_dsn
+    settings.retention_enabled = False
+
+    report: Dict[str, Any] = {"benchmark": "storage_backends", "parameters": {"turns": args.turns, "clients": args.clients}}
+    with tempfile.TemporaryDirectory() as workdir:
+        settings.database_path = os.path.join(workdir, "conversations.db")
+        for backend in args.backends:
+            report[backend] = asyncio.run(run_backend(backend, args.turns, args.clients))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    failed = {backend: report[backend]["conformance_failures"] for backend in args.backends
+              if report[backend]["conformance_failures"]}
+    if failed:
+        print(f"[BENCH] conformance failures: {failed}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
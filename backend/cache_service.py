@@ -1,93 +1,811 @@
+import asyncio
+import dataclasses
+import functools
+import inspect
+import os
+import struct
 import time
-import json
 import hashlib
-from typing import Any, Optional, Dict
+import heapq
+import logging
+import marshal
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, Dict, List, Sequence, Set, Tuple
 from dataclasses import dataclass
+from app.core.config import settings
+from app.core.rollups import normalize_query
+from shared_cache import SharedCacheTier, check_trusted, serialize, deserialize
+
+logger = logging.getLogger(__name__)
+
+# ordereddict node, entry object and heap tuple on top of the key and value
+ENTRY_OVERHEAD_BYTES = 240
+# expired entries dropped per set, so sweeping cost is spread over writes
+SWEEP_BATCH = 32
+
+SNAPSHOT_MAGIC = b"PCSNAP\x02"
+# key length, compressed flag, value length, expiry, soft expiry, created at, tags length
+SNAPSHOT_RECORD = struct.Struct("<HBIdddH")
+
+NAMESPACE_COUNTERS = ("hits", "misses", "loads", "load_ms_total", "load_ms_max", "coalesced", "stale_served",
+                      "stale_refreshes", "ahead_refreshes", "refresh_failures", "uncached", "invalidated")
+
+KNOWLEDGE_SEARCH = "knowledge_search"
+AI_RESPONSE = "ai_response"
+TOOL_OUTPUT = "tool_output"
+# entries built from the portfolio knowledge base, across namespaces; invalidate_tag(KNOWLEDGE_TAG) after it changes
+KNOWLEDGE_TAG = "knowledge"
 
 @dataclass
 class CacheEntry:
     value: Any
     expiry: float
     created_at: float
+    size: int = 0
+    soft_expiry: float = 0
+    hits: int = 0
+    tags: Tuple[str, ...] = ()
+
+@dataclass
+class CachePolicy:
+    """ttl drops the entry; past soft_ttl (if shorter) it is served stale while one background
+    refresh runs. a key read refresh_ahead_min_hits times is refreshed early once refresh_ahead
+    of its soft ttl has passed; 0 turns either behaviour off"""
+    ttl: float
+    soft_ttl: float = 0
+    refresh_ahead: float = 0
+    refresh_ahead_min_hits: int = 3
+
+class Uncacheable(Exception):
+    """raised by a fetch loader to hand back a value without caching it (fallbacks, failed tool runs)"""
+    def __init__(self, value: Any):
+        super().__init__("uncacheable result")
+        self.value = value
+
+_SCALARS = frozenset((str, bytes, int, float, bool, type(None)))
+
+def _marshal(value: Any) -> bytes:
+    # version 2: type-tagged and length-prefixed, without the interning and back-references of later
+    # versions, so equal values always give the same bytes
+    return marshal.dumps(value, 2)
+
+def _canonical(value: Any) -> Any:
+    """value rebuilt so equal values marshal identically: dicts in key order, sets sorted, dataclasses as
+    their fields. ("a:b",) and ("a", "b") stay different, as do 1, "1" and True"""
+    kind = type(value)
+    if kind in _SCALARS:
+        return value
+    if kind is tuple or kind is list:
+        for item in value:
+            if type(item) not in _SCALARS:
+                return kind(map(_canonical, value))
+        return value
+    if kind is dict:
+        try:
+            items = sorted(value.items())
+        except TypeError:
+            items = sorted(value.items(), key=lambda item: _marshal(_canonical(item[0])))
+        return {_canonical(key): item if type(item) in _SCALARS else _canonical(item) for key, item in items}
+    # tagged with Ellipsis, which is not a valid argument value anywhere else, so they never look like a tuple
+    if kind is set or kind is frozenset:
+        return (..., "set", tuple(sorted(map(_canonical, value), key=_marshal)))
+    if dataclasses.is_dataclass(value):
+        return (..., kind.__qualname__, _canonical({item.name: getattr(value, item.name) for item in dataclasses.fields(value)}))
+    raise TypeError(f"cannot build a cache key from {kind.__name__}; pass key= to @cached")
+
+def canonical_digest(value: Any) -> str:
+    return hashlib.blake2b(_marshal(_canonical(value)), digest_size=16).hexdigest()
+
+def make_key(namespace: str, identity: Any) -> str:
+    """namespace-prefixed so a whole namespace can be dropped from the shared tier by key range"""
+    return f"{namespace}:{canonical_digest(identity)}"
+
+_LEAF_TYPES = (str, bytes, int, float, bool, type(None))
+
+def estimate_size(value: Any) -> int:
+    """bytes held by a value and everything it references; containers shared within the value count once"""
+    size = 0
+    seen = set()
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if type(item) in _LEAF_TYPES:
+            size += sys.getsizeof(item)
+            continue
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, '__dict__'):
+            stack.append(vars(item))
+    return size
+
+def _entry_size(key: str, value: Any, size: Optional[int] = None) -> int:
+    return (estimate_size(value) if size is None else size) + sys.getsizeof(key) + ENTRY_OVERHEAD_BYTES
+
+def _discard(index: Dict[str, Set[str]], name: str, key: str) -> None:
+    keys = index.get(name)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[name]
 
 class CacheService:
-    def __init__(self, default_ttl: int = 300):
-        self.cache: Dict[str, CacheEntry] = {}
+    """lru cache bounded by entry count and bytes; expiry times sit in a min-heap so expired
+    entries are dropped a few at a time on every write instead of by full scans.
+    every operation holds one lock and never awaits, so it is safe from threads and the event loop.
+
+    with a shared tier, local misses read through to it and sets write through to it, so every
+    worker process on the host sees entries any of them cached. fetch reads the tier on a small
+    thread pool so sqlite and unpickling never run on the event loop (get and get_or_set read it
+    inline); writes and deletes are queued, in order, to one writer thread. invalidations made by
+    other workers are read from the shared tier at most every invalidation_check_seconds, so a
+    local hit can outlive one by that long"""
+    def __init__(self, default_ttl: int = 300, max_entries: int = 10000, max_bytes: int = 67108864,
+                 shared: Optional[SharedCacheTier] = None, policies: Optional[Dict[str, CachePolicy]] = None,
+                 invalidation_check_seconds: float = 1.0):
+        self.cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
         self.default_ttl = default_ttl
-    
-    def _generate_key(self, prefix: str, *args) -> str:
-        key_data = f"{prefix}:{':'.join(str(arg) for arg in args)}"
-        return hashlib.md5(key_data.encode()).hexdigest()
-    
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.policies = policies or {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._namespace_stats: Dict[str, Dict[str, float]] = {}
+        self._namespace_keys: Dict[str, Set[str]] = {}
+        self._tag_keys: Dict[str, Set[str]] = {}
+        # bumped by every invalidation; a load that started before one is returned but not cached
+        self._epoch = 0
+        self.invalidation_check_seconds = invalidation_check_seconds
+        self._invalidation_seq: Optional[int] = None
+        self._invalidations_checked_at = float("-inf")
+        self._remote_invalidations = 0
+        self._bytes = 0
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._hits = 0
+        self._misses = 0
+        self._sets = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._rejected = 0
+        self._shared_hits = 0
+        self._shared_pools: Dict[str, ThreadPoolExecutor] = {}
+        self._invalidation_listeners: Dict[str, List[Callable[[str], None]]] = {}
+        self._shared_pools_pid = os.getpid()
+
     def get(self, key: str) -> Optional[Any]:
-        if key not in self.cache:
-            return None
-        
-        entry = self.cache[key]
-        if time.time() > entry.expiry:
-            del self.cache[key]
-            return None
-        
-        return entry.value
-    
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        entry = self._lookup(key, time.time())
+        return entry.value if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: Optional[int] = None,
+            soft_ttl: float = 0, tags: Sequence[str] = ()) -> None:
+        """size skips the estimate when the caller already knows it (e.g. a serialized length)"""
         ttl = ttl or self.default_ttl
-        expiry = time.time() + ttl
-        
-        self.cache[key] = CacheEntry(
-            value=value,
-            expiry=expiry,
-            created_at=time.time()
-        )
-    
+        now = time.time()
+        expiry = now + ttl
+        soft_expiry = now + soft_ttl if 0 < soft_ttl < ttl else expiry
+        tags = tuple(tags)
+        size = _entry_size(key, value, size)
+        with self._lock:
+            self._store(key, value, expiry, soft_expiry, size, now, tags)
+        if self.shared is not None:
+            # pickled once on the writer thread; other workers unpickle it once on their first read
+            self._shared_write(self.shared.set, key, value, expiry, soft_expiry, tags)
+
+    async def fetch(self, namespace: str, identity: Any, loader: Callable[[], Awaitable[Any]],
+                    ttl: Optional[float] = None, tags: Sequence[str] = ()) -> Any:
+        """the cached value for identity under the namespace's policy, awaiting loader() on a miss.
+        concurrent misses share one load; a stale or hot entry is returned at once and refreshed
+        in the background. loader may raise Uncacheable to return a value without caching it"""
+        policy = self._policy(namespace, ttl)
+        key = make_key(namespace, identity)
+        now = time.time()
+        entry = await self._lookup_async(key, now)
+        if entry is None:
+            self._count(namespace, "misses")
+            return await self._load(namespace, key, loader, policy, tuple(tags))
+
+        self._count(namespace, "hits")
+        if now >= entry.soft_expiry:
+            self._count(namespace, "stale_served")
+            self._refresh(namespace, key, loader, policy, tuple(tags), "stale_refreshes")
+        elif (policy.refresh_ahead and entry.hits >= policy.refresh_ahead_min_hits and
+              now >= entry.created_at + (entry.soft_expiry - entry.created_at) * policy.refresh_ahead):
+            self._refresh(namespace, key, loader, policy, tuple(tags), "ahead_refreshes")
+        return entry.value
+
+    def get_or_set(self, namespace: str, identity: Any, loader: Callable[[], Any],
+                   ttl: Optional[float] = None, tags: Sequence[str] = ()) -> Any:
+        """sync counterpart of fetch: plain read-through. there is no background refresh to run,
+        so entries live for the namespace's soft ttl (or its ttl when it has none)"""
+        policy = self._policy(namespace, ttl)
+        key = make_key(namespace, identity)
+        entry = self._lookup(key, time.time())
+        if entry is not None:
+            self._count(namespace, "hits")
+            return entry.value
+
+        self._count(namespace, "misses")
+        epoch = self._epoch
+        started = time.perf_counter()
+        try:
+            value = loader()
+        except Uncacheable as e:
+            self._count(namespace, "uncached")
+            return e.value
+        self._record_load(namespace, started)
+        if epoch == self._epoch:
+            self.set(key, value, ttl or policy.soft_ttl or policy.ttl, tags=tags)
+        return value
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        """drop every entry under namespace, here and in the shared tier; returns how many were local"""
+        with self._lock:
+            keys = self._drop_local("namespace", namespace)
+        if self.shared is not None:
+            self._shared_write(self.shared.delete_namespace, namespace)
+        self._count(namespace, "invalidated", len(keys))
+        logger.info(f"[CACHE] invalidated {len(keys)} entries in namespace {namespace}")
+        return len(keys)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """drop every entry stored with tag, whatever its namespace"""
+        with self._lock:
+            keys = self._drop_local("tag", tag)
+        if self.shared is not None:
+            self._shared_write(self.shared.delete_tag, tag)
+        for key in keys:
+            self._count(key.partition(":")[0], "invalidated")
+        logger.info(f"[CACHE] invalidated {len(keys)} entries tagged {tag}")
+        return len(keys)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            removed = bool(self._drop_local("key", key))
+        if self.shared is not None:
+            self._shared_write(self.shared.delete, key)
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self.cache.clear()
+            self._expiry_heap = []
+            self._namespace_keys = {}
+            self._tag_keys = {}
+            self._bytes = 0
+        if self.shared is not None:
+            self._shared_write(self.shared.clear)
+
+    def log_invalidation(self, kind: str, name: str) -> None:
+        """tell the other workers to drop in-process state outside this cache (e.g. a session's
+        context); they call the listeners added for kind. a no-op without a shared tier"""
+        if self.shared is not None:
+            self._shared_write(self.shared.log_invalidation, kind, name)
+
+    def add_invalidation_listener(self, kind: str, listener: Callable[[str], None]) -> None:
+        """listener(name) runs on a cache thread for each invalidation of kind another worker logs"""
+        self._invalidation_listeners.setdefault(kind, []).append(listener)
+
+    async def sync_invalidations(self) -> None:
+        """replay other workers' invalidations now if invalidation_check_seconds have passed, for
+        callers that need the listeners to run without a cache lookup"""
+        if self.shared is not None and self._invalidations_due(time.time()):
+            await asyncio.get_running_loop().run_in_executor(self._shared_pool("read"), self._sync_invalidations)
+
     def cache_knowledge_search(self, query: str, results: Any, ttl: int = 600) -> None:
-        key = self._generate_key("knowledge", query.lower().strip())
-        self.set(key, results, ttl)
-    
+        self.set(make_key(KNOWLEDGE_SEARCH, normalize_query(query, None)), results, ttl)
+
     def get_cached_knowledge_search(self, query: str) -> Optional[Any]:
-        key = self._generate_key("knowledge", query.lower().strip())
-        return self.get(key)
-    
+        return self.get(make_key(KNOWLEDGE_SEARCH, normalize_query(query, None)))
+
     def cache_ai_response(self, context_hash: str, response: str, ttl: int = 1800) -> None:
-        key = self._generate_key("ai_response", context_hash)
-        self.set(key, response, ttl)
-    
+        self.set(make_key(AI_RESPONSE, context_hash), response, ttl)
+
     def get_cached_ai_response(self, context_hash: str) -> Optional[str]:
-        key = self._generate_key("ai_response", context_hash)
-        return self.get(key)
-    
-    def create_context_hash(self, user_message: str, knowledge_context: list) -> str:
+        return self.get(make_key(AI_RESPONSE, context_hash))
+
+    def create_context_hash(self, user_message: str, knowledge_context: list,
+                            conversation_context: Optional[list] = None) -> str:
         context_data = {
-            "message": user_message,
-            "knowledge": [item.get("content", "")[:100] for item in knowledge_context[:3]]
+            "message": normalize_query(user_message, None),
+            "knowledge": [item.get("content", "")[:100] for item in knowledge_context[:3]],
+            "history": [(item.get("role"), item.get("content", "")) for item in (conversation_context or [])[-2:]]
         }
-        return hashlib.md5(json.dumps(context_data, sort_keys=True).encode()).hexdigest()
-    
-    def clear_expired(self) -> int:
+        return canonical_digest(context_data)
+
+    def save_snapshot(self, path: str) -> int:
+        """write live entries, least recently used first, to a binary snapshot; returns how many were written.
+        values are pickled like the shared tier's, and ones that cannot be pickled are skipped"""
         now = time.time()
-        expired_keys = [
-            key for key, entry in self.cache.items()
-            if now > entry.expiry
-        ]
-        
-        for key in expired_keys:
-            del self.cache[key]
-        
-        return len(expired_keys)
-    
-    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = [(key, entry) for key, entry in self.cache.items() if entry.expiry > now]
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        written = 0
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(SNAPSHOT_MAGIC)
+                for key, entry in entries:
+                    try:
+                        data, compressed = serialize(entry.value)
+                    except Exception as e:
+                        logger.debug(f"[CACHE] {key} left out of the snapshot: {e}")
+                        continue
+                    encoded_key = key.encode()
+                    encoded_tags = " ".join(entry.tags).encode()
+                    f.write(SNAPSHOT_RECORD.pack(len(encoded_key), int(compressed), len(data),
+                                                 entry.expiry, entry.soft_expiry, entry.created_at, len(encoded_tags)))
+                    f.write(encoded_key)
+                    f.write(encoded_tags)
+                    f.write(data)
+                    written += 1
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return written
+
+    def load_snapshot(self, path: str) -> int:
+        """add the unexpired entries of a snapshot, keeping their expiry times; returns how many were loaded.
+        values are unpickled, so the file must pass check_trusted"""
+        if not os.path.exists(path):
+            return 0
+        check_trusted(path)
         now = time.time()
-        valid_entries = sum(1 for entry in self.cache.values() if now <= entry.expiry)
-        
-        return {
-            "total_entries": len(self.cache),
-            "valid_entries": valid_entries,
-            "expired_entries": len(self.cache) - valid_entries,
-            "cache_size_mb": self._estimate_size_mb()
-        }
-    
-    def _estimate_size_mb(self) -> float:
-        total_size = sum(len(str(entry.value)) for entry in self.cache.values())
-        return total_size / (1024 * 1024)
+        loaded = 0
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                logger.warning(f"[CACHE] ignoring {path}: not a cache snapshot in the current format")
+                return 0
+            while True:
+                header = f.read(SNAPSHOT_RECORD.size)
+                if len(header) < SNAPSHOT_RECORD.size:
+                    break
+                key_length, compressed, value_length, expiry, soft_expiry, created_at, tags_length = SNAPSHOT_RECORD.unpack(header)
+                key = f.read(key_length).decode()
+                tags = tuple(f.read(tags_length).decode().split())
+                if expiry <= now:
+                    f.seek(value_length, os.SEEK_CUR)
+                    continue
+                data = f.read(value_length)
+                if len(data) < value_length:
+                    logger.warning(f"[CACHE] snapshot {path} is truncated")
+                    break
+                try:
+                    value = deserialize(data, compressed)
+                except Exception as e:
+                    logger.debug(f"[CACHE] skipping unreadable snapshot entry {key}: {e}")
+                    continue
+                size = _entry_size(key, value)
+                with self._lock:
+                    self._store(key, value, expiry, soft_expiry, size, now, tags).created_at = created_at
+                loaded += 1
+        return loaded
+
+    def clear_expired(self) -> int:
+        with self._lock:
+            return self._sweep(time.time())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._shared_hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "sets": self._sets,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "rejected": self._rejected,
+                "shared_hits": self._shared_hits,
+                "shared_tier": self.shared is not None,
+                "remote_invalidations": self._remote_invalidations,
+                "total_entries": len(self.cache),
+                "cache_bytes": self._bytes,
+                "cache_size_mb": round(self._bytes / (1024 * 1024), 3),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round((self._hits + self._shared_hits) / lookups, 4) if lookups else 0,
+                "namespaces": {namespace: self._namespace_summary(counters)
+                               for namespace, counters in self._namespace_stats.items()}
+            }
+
+    def start(self, interval_seconds: float = 60) -> None:
+        """sweep expired entries in the background too, so an idle cache still gives memory back"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval_seconds,), name="cache-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+        # queued shared writes land before the tier closes
+        pools, self._shared_pools = self._shared_pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+        if self.shared is not None:
+            self.shared.close()
+
+    def _run(self, interval_seconds: float):
+        while not self._stop.wait(interval_seconds):
+            expired = self.clear_expired()
+            if expired:
+                logger.debug(f"[CACHE] swept {expired} expired entries")
+            if self.shared is not None:
+                pruned = self.shared.prune()
+                if pruned:
+                    logger.debug(f"[CACHE] pruned {pruned} shared tier entries")
+
+    def _drop_local(self, kind: str, name: str) -> List[str]:
+        """remove the local entries an invalidation covers; the caller holds the lock"""
+        self._epoch += 1
+        if kind == "namespace":
+            keys = list(self._namespace_keys.get(name, ()))
+        elif kind == "tag":
+            keys = list(self._tag_keys.get(name, ()))
+        elif kind == "key":
+            keys = [name] if name in self.cache else []
+        elif kind == "all":
+            keys = list(self.cache)
+        else:
+            # kinds other subsystems log in the shared tier (e.g. session) cover no cache entries
+            return []
+        for key in keys:
+            self._remove(key)
+        return keys
+
+    def _invalidations_due(self, now: float) -> bool:
+        if now - self._invalidations_checked_at < self.invalidation_check_seconds:
+            return False
+        self._invalidations_checked_at = now
+        return True
+
+    def _sync_invalidations(self) -> None:
+        """replay invalidations other workers logged in the shared tier against this process's entries"""
+        seq, invalidations = self.shared.invalidations_since(self._invalidation_seq)
+        dropped = 0
+        with self._lock:
+            if seq is not None and (self._invalidation_seq is None or seq > self._invalidation_seq):
+                self._invalidation_seq = seq
+            for kind, name in invalidations:
+                if kind in self._invalidation_listeners:
+                    self._notify_listeners(kind, name)
+                    continue
+                keys = self._drop_local(kind, name)
+                for key in keys:
+                    self._count(key.partition(":")[0], "invalidated")
+                dropped += len(keys)
+            self._remote_invalidations += len(invalidations)
+        if invalidations:
+            logger.info(f"[CACHE] applied {len(invalidations)} invalidations from other workers, dropped {dropped} entries")
+
+    def _notify_listeners(self, kind: str, name: str) -> None:
+        for listener in self._invalidation_listeners[kind]:
+            try:
+                listener(name)
+            except Exception as e:
+                logger.error(f"[CACHE] {kind} invalidation listener failed for {name}: {e}")
+
+    def _lookup(self, key: str, now: float) -> Optional[CacheEntry]:
+        if self.shared is not None and self._invalidations_due(now):
+            self._sync_invalidations()
+        entry = self._lookup_local(key, now)
+        if entry is not None or self.shared is None:
+            return entry
+        # the shared tier is read outside the lock so a slow disk never stalls other lookups
+        epoch = self._epoch
+        return self._store_shared(key, self.shared.get(key, now), now, epoch)
+
+    async def _lookup_async(self, key: str, now: float) -> Optional[CacheEntry]:
+        """_lookup for fetch: the shared tier's sqlite reads and unpickling run on the read pool"""
+        if self.shared is None:
+            return self._lookup_local(key, now)
+        loop = asyncio.get_running_loop()
+        if self._invalidations_due(now):
+            await loop.run_in_executor(self._shared_pool("read"), self._sync_invalidations)
+        entry = self._lookup_local(key, now)
+        if entry is not None:
+            return entry
+        epoch = self._epoch
+        found = await loop.run_in_executor(self._shared_pool("read"), self.shared.get, key, now)
+        return self._store_shared(key, found, now, epoch)
+
+    def _lookup_local(self, key: str, now: float) -> Optional[CacheEntry]:
+        """a live local entry; misses are counted here only without a shared tier"""
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None and now > entry.expiry:
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+
+            if entry is not None:
+                self.cache.move_to_end(key)
+                entry.hits += 1
+                self._hits += 1
+                return entry
+            if self.shared is None:
+                self._misses += 1
+            return None
+
+    def _store_shared(self, key: str, found: Optional[Tuple[Any, float, float, Tuple[str, ...]]],
+                      now: float, epoch: int) -> Optional[CacheEntry]:
+        """keep a shared tier hit locally; one read before an invalidation that landed meanwhile is a miss"""
+        if found is None or epoch != self._epoch:
+            with self._lock:
+                self._misses += 1
+            return None
+        value, expiry, soft_expiry, tags = found
+        size = _entry_size(key, value)
+        with self._lock:
+            self._shared_hits += 1
+            return self._store(key, value, expiry, soft_expiry, size, now, tags)
+
+    def _shared_pool(self, name: str) -> ThreadPoolExecutor:
+        """reads get two threads; writes get one so a set never lands after a later delete.
+        created on first use and again after a fork, whose children do not inherit the threads"""
+        if self._shared_pools_pid != os.getpid():
+            self._shared_pools = {}
+            self._shared_pools_pid = os.getpid()
+        pool = self._shared_pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._shared_pools.get(name)
+                if pool is None:
+                    pool = ThreadPoolExecutor(max_workers=2 if name == "read" else 1,
+                                              thread_name_prefix=f"cache-shared-{name}")
+                    self._shared_pools[name] = pool
+        return pool
+
+    def flush_shared_writes(self, timeout: Optional[float] = None) -> None:
+        """block until the shared writes queued so far have landed"""
+        if self.shared is not None:
+            self._shared_pool("write").submit(lambda: None).result(timeout)
+
+    def _shared_write(self, func: Callable[..., Any], *args: Any) -> None:
+        """fire and forget: the tier logs its own errors, and stop() waits for the queue"""
+        self._shared_pool("write").submit(func, *args)
+
+    def _policy(self, namespace: str, ttl: Optional[float]) -> CachePolicy:
+        policy = self.policies.get(namespace) or CachePolicy(self.default_ttl)
+        return dataclasses.replace(policy, ttl=ttl) if ttl else policy
+
+    async def _load(self, namespace: str, key: str, loader: Callable[[], Awaitable[Any]], policy: CachePolicy,
+                    tags: Tuple[str, ...]) -> Any:
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is loop:
+            self._count(namespace, "coalesced")
+        else:
+            task = self._start_load(loop, namespace, key, loader, policy, tags)
+        # shielded so one caller going away does not cancel the load the others are waiting on
+        return await asyncio.shield(task)
+
+    def _refresh(self, namespace: str, key: str, loader: Callable[[], Awaitable[Any]], policy: CachePolicy,
+                 tags: Tuple[str, ...], counter: str) -> None:
+        """one background reload per key; failures keep serving the current value until it expires"""
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is loop:
+            return
+        self._count(namespace, counter)
+        task = self._start_load(loop, namespace, key, loader, policy, tags)
+        task.add_done_callback(lambda done: self._refresh_done(namespace, key, done))
+
+    def _start_load(self, loop: asyncio.AbstractEventLoop, namespace: str, key: str,
+                    loader: Callable[[], Awaitable[Any]], policy: CachePolicy, tags: Tuple[str, ...]) -> asyncio.Task:
+        async def load():
+            epoch = self._epoch
+            started = time.perf_counter()
+            try:
+                value = await loader()
+            except Uncacheable as e:
+                self._count(namespace, "uncached")
+                return e.value
+            self._record_load(namespace, started)
+            if epoch == self._epoch:
+                self.set(key, value, policy.ttl, soft_ttl=policy.soft_ttl, tags=tags)
+            return value
+
+        task = loop.create_task(load())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._inflight.pop(key, None) if self._inflight.get(key) is done else None)
+        return task
+
+    def _refresh_done(self, namespace: str, key: str, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self._count(namespace, "refresh_failures")
+            logger.warning(f"[CACHE] background refresh of {namespace} entry {key} failed: {error}")
+
+    def _count(self, namespace: str, counter: str, amount: float = 1) -> Dict[str, float]:
+        counters = self._namespace_stats.get(namespace)
+        if counters is None:
+            counters = self._namespace_stats[namespace] = dict.fromkeys(NAMESPACE_COUNTERS, 0)
+        counters[counter] += amount
+        return counters
+
+    def _record_load(self, namespace: str, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        counters = self._count(namespace, "loads")
+        counters["load_ms_total"] += elapsed_ms
+        counters["load_ms_max"] = max(counters["load_ms_max"], elapsed_ms)
+
+    @staticmethod
+    def _namespace_summary(counters: Dict[str, float]) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {name: counters[name] for name in NAMESPACE_COUNTERS if name not in ("load_ms_total", "load_ms_max")}
+        lookups = counters["hits"] + counters["misses"]
+        summary["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0
+        summary["avg_load_ms"] = round(counters["load_ms_total"] / counters["loads"], 3) if counters["loads"] else 0
+        summary["max_load_ms"] = round(counters["load_ms_max"], 3)
+        return summary
+
+    def _store(self, key: str, value: Any, expiry: float, soft_expiry: float, size: int, now: float,
+               tags: Tuple[str, ...] = ()) -> CacheEntry:
+        if key in self.cache:
+            self._remove(key)
+        if size > self.max_bytes:
+            self._rejected += 1
+            logger.debug(f"[CACHE] value for {key} is {size} bytes, over the {self.max_bytes} byte cap")
+            return CacheEntry(value=value, expiry=expiry, created_at=now, soft_expiry=soft_expiry, tags=tags)
+
+        entry = self.cache[key] = CacheEntry(value=value, expiry=expiry, created_at=now, size=size,
+                                             soft_expiry=soft_expiry, tags=tags)
+        self._index(key, entry)
+        self._bytes += size
+        heapq.heappush(self._expiry_heap, (expiry, key))
+        self._sets += 1
+
+        self._sweep(now, SWEEP_BATCH)
+        while len(self.cache) > self.max_entries or self._bytes > self.max_bytes:
+            evicted, _ = self._pop_lru()
+            self._evictions += 1
+            logger.debug(f"[CACHE] evicted {evicted}")
+        return entry
+
+    def _remove(self, key: str) -> Optional[CacheEntry]:
+        # its heap item stays behind and is skipped when it surfaces
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self._unindex(key, entry)
+        return entry
+
+    def _pop_lru(self) -> Tuple[str, CacheEntry]:
+        key, entry = self.cache.popitem(last=False)
+        self._bytes -= entry.size
+        self._unindex(key, entry)
+        return key, entry
+
+    def _index(self, key: str, entry: CacheEntry) -> None:
+        namespace, separator, _ = key.partition(":")
+        if separator:
+            self._namespace_keys.setdefault(namespace, set()).add(key)
+        for tag in entry.tags:
+            self._tag_keys.setdefault(tag, set()).add(key)
+
+    def _unindex(self, key: str, entry: CacheEntry) -> None:
+        namespace, separator, _ = key.partition(":")
+        if separator:
+            _discard(self._namespace_keys, namespace, key)
+        for tag in entry.tags:
+            _discard(self._tag_keys, tag, key)
+
+    def _sweep(self, now: float, limit: Optional[int] = None) -> int:
+        expired = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now and (limit is None or expired < limit):
+            expiry, key = heapq.heappop(heap)
+            entry = self.cache.get(key)
+            if entry is not None and entry.expiry == expiry:
+                self._remove(key)
+                expired += 1
+        self._expirations += expired
+
+        # overwritten and evicted keys leave dead heap items; rebuild before they outnumber live ones
+        if len(heap) > 2 * len(self.cache) + 1024:
+            self._expiry_heap = [(entry.expiry, key) for key, entry in self.cache.items()]
+            heapq.heapify(self._expiry_heap)
+        return expired
+
+CACHE_POLICIES = {
+    KNOWLEDGE_SEARCH: CachePolicy(
+        settings.cache_knowledge_ttl_seconds,
+        settings.cache_knowledge_soft_ttl_seconds,
+        settings.cache_knowledge_refresh_ahead,
+        settings.cache_refresh_ahead_min_hits
+    ),
+    AI_RESPONSE: CachePolicy(
+        settings.cache_ai_response_ttl_seconds,
+        settings.cache_ai_response_soft_ttl_seconds,
+        settings.cache_ai_response_refresh_ahead,
+        settings.cache_refresh_ahead_min_hits
+    ),
+    TOOL_OUTPUT: CachePolicy(
+        settings.cache_tool_output_ttl_seconds,
+        settings.cache_tool_output_soft_ttl_seconds,
+        settings.cache_tool_output_refresh_ahead,
+        settings.cache_refresh_ahead_min_hits
+    )
+}
+
+cache = CacheService(
+    settings.cache_default_ttl_seconds,
+    settings.cache_max_entries,
+    settings.cache_max_bytes,
+    SharedCacheTier(settings.cache_shared_path, settings.cache_shared_max_bytes) if settings.cache_shared_enabled else None,
+    CACHE_POLICIES,
+    settings.cache_invalidation_check_seconds
+)
+
+def cached(namespace: str, ttl: Optional[float] = None, key: Optional[Callable[..., Any]] = None,
+           tags: Sequence[str] = (), service: Optional[CacheService] = None):
+    """cache a sync or async function's results under namespace, e.g.
+
+        @cached(TOOL_OUTPUT, key=lambda query, limit=5: normalize_query(query, None))
+        async def lookup(query: str, limit: int = 5): ...
+
+    the identity is key(*args, **kwargs) when given, otherwise the bound arguments (without self/cls)
+    with defaults applied, so f(1) and f(x=1) share an entry. async functions go through fetch and get
+    single-flight loads and stale-while-revalidate; sync ones use get_or_set. raise Uncacheable from the
+    function to return a value without caching it, and drop entries with invalidate_namespace/invalidate_tag"""
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        signature = inspect.signature(func)
+        name = f"{func.__module__}.{func.__qualname__}"
+        names = tuple(signature.parameters)
+        skip = names[0] if names and names[0] in ("self", "cls") else None
+        defaults = {param.name: param.default for param in signature.parameters.values()
+                    if param.default is not param.empty}
+        # plain named parameters are mapped by hand; signature.bind costs more than the whole cache hit
+        simple = all(param.kind in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY)
+                     for param in signature.parameters.values())
+
+        def identity(args: tuple, kwargs: dict) -> Any:
+            if key is not None:
+                return name, key(*args, **kwargs)
+            if simple and len(args) <= len(names):
+                arguments = dict(defaults)
+                arguments.update(zip(names, args))
+                arguments.update(kwargs)
+            else:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = bound.arguments
+            if skip is not None:
+                arguments.pop(skip, None)
+            return name, arguments
 
-cache = CacheService() 
\ No newline at end of file
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await (service or cache).fetch(namespace, identity(args, kwargs),
+                                                      lambda: func(*args, **kwargs), ttl, tags)
+            wrapper = async_wrapper
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return (service or cache).get_or_set(namespace, identity(args, kwargs),
+                                                     lambda: func(*args, **kwargs), ttl, tags)
+        wrapper.cache_namespace = namespace
+        return wrapper
+    return decorator
@@ -0,0 +1,86 @@
+import logging
+import time
+from typing import Any, Dict
+from app.core.config import settings
+from app.core.database import jobs_lock
+from app.core.rollups import MAX_QUERY_LENGTH
+from app.core.storage import get_storage
+from cache_service import cache, AI_RESPONSE
+
+logger = logging.getLogger(__name__)
+
+warmup_stats: Dict[str, Any] = {
+    "snapshot_entries": 0,
+    "snapshot_seconds": None,
+    "replayed_queries": 0,
+    "replay_skipped": False,
+    "new_answers": 0,
+    "time_to_warm_seconds": None
+}
+
+def restore_snapshot() -> int:
+    """reload the entries saved at the last shutdown; runs before the first request is served"""
+    started = time.monotonic()
+    try:
+        loaded = cache.load_snapshot(settings.cache_snapshot_path)
+    except Exception as e:
+        logger.error(f"[CACHE] failed to load snapshot {settings.cache_snapshot_path}: {e}")
+        return 0
+    elapsed = time.monotonic() - started
+    warmup_stats["snapshot_entries"] = loaded
+    warmup_stats["snapshot_seconds"] = round(elapsed, 3)
+    logger.info(f"[CACHE] restored {loaded} entries from snapshot in {elapsed:.3f}s")
+    return loaded
+
+def save_snapshot() -> int:
+    started = time.monotonic()
+    try:
+        written = cache.save_snapshot(settings.cache_snapshot_path)
+    except Exception as e:
+        logger.error(f"[CACHE] failed to write snapshot {settings.cache_snapshot_path}: {e}")
+        return 0
+    logger.info(f"[CACHE] saved {written} entries to snapshot in {time.monotonic() - started:.3f}s")
+    return written
+
+def _ai_loads() -> int:
+    return cache.stats()["namespaces"].get(AI_RESPONSE, {}).get("loads", 0)
+
+async def warm_cache(agent: Any, startup_started: float) -> Dict[str, Any]:
+    """background startup job; time_to_warm_seconds runs from the start of the lifespan. the replay
+    runs in the one worker per host that holds the jobs lock, the others only restore the snapshot"""
+    if settings.cache_warmup_enabled and not jobs_lock.acquire():
+        warmup_stats["replay_skipped"] = True
+        logger.info("[CACHE] warm-up replay left to the worker holding the jobs lock")
+    elif settings.cache_warmup_enabled:
+        try:
+            return await replay_popular_queries(agent, startup_started)
+        except Exception as e:
+            logger.error(f"[CACHE] warm-up replay failed: {e}")
+    warmup_stats["time_to_warm_seconds"] = round(time.monotonic() - startup_started, 3)
+    logger.info(f"[STARTUP] cache warm {warmup_stats['time_to_warm_seconds']}s after startup: "
+                f"{warmup_stats['snapshot_entries']} snapshot entries")
+    return warmup_stats
+
+async def replay_popular_queries(agent: Any, startup_started: float) -> Dict[str, Any]:
+    """answer the most asked recent questions as a first-time visitor would, so their search results and
+    llm answers are cached; ones restored from the snapshot or already in the shared tier are hits
+    and cost nothing"""
+    analytics = await get_storage().get_chat_analytics(settings.cache_warmup_days, settings.cache_warmup_queries)
+    # popular queries are normalized and cut at MAX_QUERY_LENGTH; a cut one is not a real question
+    queries = [item["query"] for item in analytics.get("popular_queries", [])
+               if item["query"] and len(item["query"]) < MAX_QUERY_LENGTH]
+
+    loads_before = _ai_loads()
+    for query in queries:
+        # no session: nothing is logged and the conversation context is empty, like a first turn
+        await agent.process_message(query, "", context=[])
+        warmup_stats["replayed_queries"] += 1
+
+    warmup_stats["new_answers"] = _ai_loads() - loads_before
+    warmup_stats["time_to_warm_seconds"] = round(time.monotonic() - startup_started, 3)
+    logger.info(
+        f"[STARTUP] cache warm {warmup_stats['time_to_warm_seconds']}s after startup: "
+        f"{warmup_stats['snapshot_entries']} snapshot entries, {len(queries)} popular queries replayed, "
+        f"{warmup_stats['new_answers']} new llm answers"
+    )
+    return warmup_stats
@@ -2,14 +2,17 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import os
 import logging
 import time
 from dotenv import load_dotenv
 
 from app.core.config import Settings
-from app.core.database import init_database
-from app.api.routes import chat_router, tools_router
+from app.core.storage import get_storage
+from app.api.routes import chat_router, tools_router, agent_controller
+from cache_service import cache
+from cache_warmup import restore_snapshot, save_snapshot, warm_cache
 
 load_dotenv()
 settings = Settings()
@@ -22,21 +25,33 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    startup_started = time.monotonic()
     logger.info("[STARTUP] starting portfolio chatbot backend service...")
     logger.info(f"[STARTUP] log level: {settings.log_level}")
     logger.info(f"[STARTUP] host: {settings.host}, port: {settings.port}")
     logger.info(f"[STARTUP] cors origins: {settings.cors_origins}")
     
+    storage = get_storage()
     try:
-        init_database()
-        logger.info("[STARTUP] database initialized successfully")
+        await storage.startup()
+        logger.info(f"[STARTUP] {storage.name} storage initialized successfully")
     except Exception as e:
-        logger.error(f"[STARTUP] database initialization failed: {e}")
+        logger.error(f"[STARTUP] {storage.name} storage initialization failed: {e}")
         raise
     
+    cache.start(settings.cache_sweep_interval_seconds)
+    if settings.cache_snapshot_enabled:
+        restore_snapshot()
+    warmup_task = asyncio.create_task(warm_cache(agent_controller, startup_started))
+    
     logger.info("[STARTUP] backend service started successfully")
     yield
     logger.info("[SHUTDOWN] shutting down backend service...")
+    warmup_task.cancel()
+    if settings.cache_snapshot_enabled:
+        save_snapshot()
+    cache.stop()
+    await storage.shutdown()
 
 app = FastAPI(
     title="portfolio chatbot backend",
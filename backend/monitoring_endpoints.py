@@ -2,8 +2,11 @@ from fastapi import APIRouter, HTTPException
 from typing import Dict, Any
 import time
 import psutil
-import sqlite3
-from datetime import datetime, timedelta
+from app.core.database import now_ms
+from app.core.storage import get_storage
+from app.core.session_context import session_context
+from cache_service import cache
+from cache_warmup import warmup_stats
 
 monitoring_router = APIRouter()
 
@@ -42,50 +45,14 @@ async def detailed_health_check():
 
 @monitoring_router.get("/metrics/usage")
 async def usage_metrics():
-    now = time.time()
-    last_24h = now - (24 * 60 * 60)
+    last_24h = now_ms() - (24 * 60 * 60 * 1000)
     
     try:
-        with sqlite3.connect("./data/conversations.db") as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT COUNT(DISTINCT session_id) as unique_sessions,
-                       COUNT(*) as total_messages,
-                       AVG(LENGTH(content)) as avg_message_length
-                FROM conversations 
-                WHERE timestamp > datetime(?, 'unixepoch')
-            """, (last_24h,))
-            
-            conversation_stats = cursor.fetchone()
-            
-            cursor.execute("""
-                SELECT tool_name, COUNT(*) as execution_count,
-                       AVG(execution_time) as avg_execution_time,
-                       SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as success_count
-                FROM tool_executions 
-                WHERE timestamp > datetime(?, 'unixepoch')
-                GROUP BY tool_name
-                ORDER BY execution_count DESC
-            """, (last_24h,))
-            
-            tool_stats = cursor.fetchall()
+        usage = await get_storage().get_usage_metrics(last_24h)
             
         return {
             "period": "last_24_hours",
-            "conversations": {
-                "unique_sessions": conversation_stats[0] or 0,
-                "total_messages": conversation_stats[1] or 0,
-                "avg_message_length": round(conversation_stats[2] or 0, 2)
-            },
-            "tools": [
-                {
-                    "name": row[0],
-                    "executions": row[1],
-                    "avg_time": round(row[2], 3),
-                    "success_rate": round((row[3] / row[1]) * 100, 2)
-                } for row in tool_stats
-            ]
+            **usage
         }
         
     except Exception as e:
@@ -94,27 +61,10 @@ async def usage_metrics():
 @monitoring_router.get("/metrics/performance")
 async def performance_metrics():
     try:
-        with sqlite3.connect("./data/conversations.db") as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT AVG(execution_time) as avg_time,
-                       MIN(execution_time) as min_time,
-                       MAX(execution_time) as max_time,
-                       COUNT(*) as total_executions
-                FROM tool_executions
-                WHERE timestamp > datetime('now', '-1 hour')
-            """)
-            
-            perf_data = cursor.fetchone()
+        perf_data = await get_storage().get_performance_metrics(now_ms() - (60 * 60 * 1000))
             
         return {
-            "last_hour_performance": {
-                "avg_execution_time": round(perf_data[0] or 0, 3),
-                "min_execution_time": round(perf_data[1] or 0, 3),
-                "max_execution_time": round(perf_data[2] or 0, 3),
-                "total_executions": perf_data[3] or 0
-            }
+            "last_hour_performance": perf_data
         }
         
     except Exception as e:
@@ -122,15 +72,13 @@ async def performance_metrics():
 
 async def _check_database_health() -> Dict[str, Any]:
     try:
-        with sqlite3.connect("./data/conversations.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM conversations")
-            count = cursor.fetchone()[0]
+        stats = await get_storage().health_stats()
             
         return {
             "status": "healthy",
-            "total_conversations": count,
-            "connection": "success"
+            "connection": "success",
+            **stats,
+            "session_context": session_context.stats()
         }
     except Exception as e:
         return {
@@ -153,10 +101,17 @@ async def _check_ai_service_health() -> Dict[str, Any]:
 
 async def _check_cache_health() -> Dict[str, Any]:
     try:
+        stats = cache.stats()
         return {
             "status": "healthy",
-            "entries": 0,
-            "hit_rate": "N/A"
+            "entries": stats["total_entries"],
+            "hit_rate": stats["hit_rate"],
+            "size_mb": stats["cache_size_mb"],
+            "evictions": stats["evictions"],
+            "shared_hits": stats["shared_hits"],
+            "namespaces": stats["namespaces"],
+            "warmup": warmup_stats,
+            "shared": cache.shared.stats() if cache.shared is not None else None
         }
     except Exception as e:
         return {
@@ -0,0 +1,279 @@
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# bumped when the table layout changes; an older file is just emptied, it only holds cache entries
+SHARED_CACHE_VERSION = 4
+# blobs at least this big are zlib-compressed before they are written
+COMPRESS_MIN_BYTES = 4096
+# share of max_bytes kept free after a prune, so a prune is not needed on the very next write
+PRUNE_HEADROOM = 0.1
+# invalidation records are kept this long; no local entry outlives it by default
+INVALIDATION_HISTORY_SECONDS = 86400
+
+SHARED_CACHE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        compressed INTEGER NOT NULL DEFAULT 0,
+        size INTEGER NOT NULL,
+        expiry REAL NOT NULL,
+        soft_expiry REAL NOT NULL,
+        tags TEXT NOT NULL DEFAULT ''
+    ) WITHOUT ROWID
+'''
+
+SHARED_CACHE_INDEX = 'CREATE INDEX IF NOT EXISTS idx_cache_entries_expiry ON cache_entries(expiry)'
+
+# one row per invalidation, so every worker can drop the same entries from its own lru;
+# kind is 'namespace', 'tag', 'key', 'all' or one logged through log_invalidation (e.g. 'session'), origin the tier instance that wrote it
+SHARED_INVALIDATIONS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS cache_invalidations (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        origin TEXT NOT NULL,
+        at REAL NOT NULL
+    )
+'''
+
+def serialize(value: Any) -> Tuple[bytes, bool]:
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(data, 1)
+        if len(compressed) < len(data):
+            return compressed, True
+    return data, False
+
+def deserialize(data: bytes, compressed: bool) -> Any:
+    return pickle.loads(zlib.decompress(data) if compressed else data)
+
+def check_trusted(path: str) -> None:
+    """unpickling runs code from the file, so only read files owned by this user that no one else can write"""
+    st = os.stat(path)
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by uid {st.st_uid}, not by this process's user")
+    if st.st_mode & 0o022:
+        raise PermissionError(f"{path} is writable by other users")
+
+class SharedCacheTier:
+    """cache entries shared by every worker process on the host, kept in a small wal-mode sqlite file.
+
+    values are pickled once on write and unpickled once per process on a read-through; expiry is
+    wall-clock so all workers agree on it. the file is bounded by max_bytes, dropping expired
+    entries first and then the ones closest to expiring. errors are logged and treated as misses,
+    the cache never fails a request. deletes are also recorded in an invalidation log that the
+    other workers replay against their local lrus. anyone who can write the file can run code in
+    the workers, so an existing file is refused unless check_trusted passes"""
+    def __init__(self, path: str, max_bytes: int = 268435456):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._pid = os.getpid()
+        self._origin = os.urandom(8).hex()
+        self._ready = False
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "errors": 0,
+            "pruned": 0
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not self._ready and os.path.exists(self.path):
+            check_trusted(self.path)
+        conn = sqlite3.connect(self.path, timeout=settings.database_busy_timeout_ms / 1000, check_same_thread=False,
+                               isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # losing the last few writes on power loss only costs cache misses
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute(f'PRAGMA busy_timeout={int(settings.database_busy_timeout_ms)}')
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    if conn.execute('PRAGMA user_version').fetchone()[0] != SHARED_CACHE_VERSION:
+                        conn.execute('DROP TABLE IF EXISTS cache_entries')
+                        conn.execute('DROP TABLE IF EXISTS cache_invalidations')
+                        conn.execute(f'PRAGMA user_version={SHARED_CACHE_VERSION}')
+                    conn.execute(SHARED_CACHE_SCHEMA)
+                    conn.execute(SHARED_CACHE_INDEX)
+                    conn.execute(SHARED_INVALIDATIONS_SCHEMA)
+                    self._ready = True
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # uvicorn workers fork; never reuse the parent's handles
+            with self._lock:
+                self._connections = []
+                self._local = threading.local()
+                self._pid = os.getpid()
+                self._origin = os.urandom(8).hex()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Tuple[Any, float, float, Tuple[str, ...]]]:
+        """(value, expiry, soft expiry, tags) for a live entry, None on a miss"""
+        now = time.time() if now is None else now
+        try:
+            row = self._connection().execute(
+                'SELECT value, compressed, expiry, soft_expiry, tags FROM cache_entries WHERE key = ? AND expiry > ?', (key, now)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            value = deserialize(row[0], row[1])
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"[CACHE] shared tier read failed for {key}: {e}")
+            return None
+        self._stats["hits"] += 1
+        return value, row[2], row[3], tuple(row[4].split())
+
+    def set(self, key: str, value: Any, expiry: float, soft_expiry: Optional[float] = None,
+            tags: Sequence[str] = ()) -> Optional[int]:
+        """stored bytes, or None when the value could not be written"""
+        try:
+            data, compressed = serialize(value)
+        except Exception as e:
+            logger.debug(f"[CACHE] {key} is not picklable, kept in-process only: {e}")
+            return None
+        if len(data) > self.max_bytes:
+            return None
+        try:
+            self._connection().execute('''
+                INSERT OR REPLACE INTO cache_entries (key, value, compressed, size, expiry, soft_expiry, tags)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (key, data, int(compressed), len(data), expiry, expiry if soft_expiry is None else soft_expiry,
+                  # space-padded so a whole tag is found with instr(tags, ' tag ')
+                  f" {' '.join(tags)} " if tags else ''))
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning(f"[CACHE] shared tier write failed for {key}: {e}")
+            return None
+        self._stats["writes"] += 1
+        return len(data)
+
+    def delete(self, key: str) -> None:
+        self._delete_where('key', key, 'key = ?', (key,))
+
+    def delete_namespace(self, namespace: str) -> int:
+        """keys are "namespace:digest", so a namespace is one primary-key range (';' sorts right after ':')"""
+        return self._delete_where('namespace', namespace, 'key >= ? AND key < ?', (f"{namespace}:", f"{namespace};"))
+
+    def delete_tag(self, tag: str) -> int:
+        return self._delete_where('tag', tag, 'instr(tags, ?) > 0', (f" {tag} ",))
+
+    def clear(self) -> None:
+        self._delete_where('all', '', '1', ())
+
+    def _delete_where(self, kind: str, name: str, condition: str, params: Tuple) -> int:
+        """delete matching entries and log the invalidation in one transaction"""
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                removed = conn.execute(f'DELETE FROM cache_entries WHERE {condition}', params).rowcount
+                conn.execute('INSERT INTO cache_invalidations (kind, name, origin, at) VALUES (?, ?, ?, ?)',
+                             (kind, name, self._origin, time.time()))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            return removed
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning(f"[CACHE] shared tier delete failed for {kind} {name}: {e}")
+            return 0
+
+    def log_invalidation(self, kind: str, name: str) -> None:
+        """log an invalidation that covers no entries here, for other workers' in-process state"""
+        try:
+            self._connection().execute('INSERT INTO cache_invalidations (kind, name, origin, at) VALUES (?, ?, ?, ?)',
+                                       (kind, name, self._origin, time.time()))
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning(f"[CACHE] shared tier invalidation log failed for {kind} {name}: {e}")
+
+    def invalidations_since(self, seq: Optional[int]) -> Tuple[Optional[int], List[Tuple[str, str]]]:
+        """(latest seq, [(kind, name)]) of invalidations other workers logged after seq; a seq of
+        None only reads the latest, so a new process does not replay history"""
+        try:
+            conn = self._connection()
+            if seq is None:
+                return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations').fetchone()[0], []
+            rows = conn.execute(
+                'SELECT seq, kind, name, origin FROM cache_invalidations WHERE seq > ? ORDER BY seq', (seq,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning(f"[CACHE] shared tier invalidation read failed: {e}")
+            return seq, []
+        if not rows:
+            return seq, []
+        return rows[-1][0], [(kind, name) for _, kind, name, origin in rows if origin != self._origin]
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """drop expired entries, then the soonest-expiring ones until the file is back under max_bytes"""
+        now = time.time() if now is None else now
+        try:
+            conn = self._connection()
+            removed = conn.execute('DELETE FROM cache_entries WHERE expiry <= ?', (now,)).rowcount
+            conn.execute('DELETE FROM cache_invalidations WHERE at < ?', (now - INVALIDATION_HISTORY_SECONDS,))
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+            if total > self.max_bytes:
+                target = total - int(self.max_bytes * (1 - PRUNE_HEADROOM))
+                removed += conn.execute('''
+                    DELETE FROM cache_entries WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY expiry, key) - size AS freed_before FROM cache_entries
+                        ) WHERE freed_before < ?
+                    )
+                ''', (target,)).rowcount
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            logger.warning(f"[CACHE] shared tier prune failed: {e}")
+            return 0
+        self._stats["pruned"] += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        try:
+            entries, size = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE expiry > ?', (time.time(),)
+            ).fetchone()
+            stats.update({"entries": entries, "bytes": size})
+        except sqlite3.Error as e:
+            stats["error"] = str(e)
+        stats.update({"path": self.path, "max_bytes": self.max_bytes})
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"[CACHE] failed to close shared tier connection: {e}")
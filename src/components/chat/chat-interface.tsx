@@ -159,7 +159,7 @@ export function ChatInterface({ className }: ChatInterfaceProps) {
     setError(null)
 
     try {
-      const response = await apiClient.chat(textToSend, messages)
+      const response = await apiClient.chat(textToSend)
       
       if (!response.success) {
         throw new Error(response.error || 'failed to get response')
@@ -5,7 +5,7 @@ import { Badge } from '@/components/ui/badge'
 import { X, Clock, MessageSquare, Wrench, Zap, RefreshCw, Trash2 } from 'lucide-react'
 import { cn } from '@/lib/utils'
 import { apiClient } from '@/lib/api-client'
-import type { DetailedChatLog } from '@/lib/api-client'
+import type { DetailedChatLog, ChatLogSummary } from '@/lib/api-client'
 import { ChatLogDetailModal } from './chat-log-detail-modal'
 
 interface ChatLogsPanelProps {
@@ -15,8 +15,10 @@ interface ChatLogsPanelProps {
 }
 
 export function ChatLogsPanel({ isOpen, onClose, className }: ChatLogsPanelProps) {
-  const [logs, setLogs] = useState<DetailedChatLog[]>([])
+  const [logs, setLogs] = useState<ChatLogSummary[]>([])
+  const [nextCursor, setNextCursor] = useState<string | undefined>(undefined)
   const [isLoading, setIsLoading] = useState(false)
+  const [isLoadingMore, setIsLoadingMore] = useState(false)
   const [error, setError] = useState<string | null>(null)
   const [selectedLog, setSelectedLog] = useState<DetailedChatLog | null>(null)
   const [isDetailModalOpen, setIsDetailModalOpen] = useState(false)
@@ -26,10 +28,11 @@ export function ChatLogsPanel({ isOpen, onClose, className }: ChatLogsPanelProps
     setError(null)
     
     try {
-      const response = await apiClient.getChatLogs()
+      const response = await apiClient.getChatLogSummaries()
       
       if (response.success && response.data) {
         setLogs(response.data.logs)
+        setNextCursor(response.data.nextCursor)
       } else {
         setError(response.error || 'unable to fetch chat logs')
       }
@@ -45,6 +48,24 @@ export function ChatLogsPanel({ isOpen, onClose, className }: ChatLogsPanelProps
     }
   }
 
+  const loadMoreLogs = async () => {
+    if (!nextCursor) return
+    setIsLoadingMore(true)
+    
+    try {
+      const response = await apiClient.getChatLogSummaries(nextCursor)
+      
+      if (response.success && response.data) {
+        setLogs((current) => [...current, ...response.data.logs])
+        setNextCursor(response.data.nextCursor)
+      } else {
+        setError(response.error || 'unable to fetch more chat logs')
+      }
+    } finally {
+      setIsLoadingMore(false)
+    }
+  }
+
   const handleClearLogs = async () => {
     setIsLoading(true)
     setError(null)
@@ -54,6 +75,7 @@ export function ChatLogsPanel({ isOpen, onClose, className }: ChatLogsPanelProps
       
       if (response.success) {
         setLogs([])
+        setNextCursor(undefined)
       } else {
         setError(response.error || 'failed to clear logs')
       }
@@ -80,8 +102,14 @@ export function ChatLogsPanel({ isOpen, onClose, className }: ChatLogsPanelProps
     return `${ms.toFixed(2)}s`
   }
 
-  const handleLogClick = (log: DetailedChatLog) => {
-    setSelectedLog(log)
+  const handleLogClick = async (log: ChatLogSummary) => {
+    const response = await apiClient.getChatLog(log.id)
+    
+    if (!response.success || !response.data) {
+      setError(response.error || 'unable to load chat log details')
+      return
+    }
+    setSelectedLog(response.data)
     setIsDetailModalOpen(true)
   }
 
@@ -232,16 +260,16 @@ export function ChatLogsPanel({ isOpen, onClose, className }: ChatLogsPanelProps
                             <div className="text-sm line-clamp-2">
                               {log.userQuery}
                             </div>
-                            {(log.toolsUsed?.length ?? 0) > 0 && (
+                            {log.toolNames.length > 0 && (
                               <div className="flex flex-wrap gap-1">
-                                {(log.toolsUsed || []).map((tool, index) => (
+                                {log.toolNames.map((toolName, index) => (
                                   <Badge
                                     key={index}
                                     variant="outline"
                                     className="text-xs h-5 px-1"
                                   >
-                                    {getToolIcon(tool.tool_name)}
-                                    <span className="ml-1">{tool.tool_name}</span>
+                                    {getToolIcon(toolName)}
+                                    <span className="ml-1">{toolName}</span>
                                   </Badge>
                                 ))}
                               </div>
@@ -251,6 +279,18 @@ export function ChatLogsPanel({ isOpen, onClose, className }: ChatLogsPanelProps
                       </Card>
                     ))
                   )}
+                  {!isLoading && nextCursor && (
+                    <Button
+                      variant="ghost"
+                      size="sm"
+                      onClick={loadMoreLogs}
+                      disabled={isLoadingMore}
+                      className="w-full text-muted-foreground hover:text-foreground"
+                    >
+                      <RefreshCw className={cn("w-3 h-3 mr-1", isLoadingMore && "animate-spin")} />
+                      load older logs
+                    </Button>
+                  )}
                 </div>
               </div>
             </div>
@@ -19,6 +19,21 @@ interface DetailedChatLog {
   userAgent?: string
 }
 
+interface ChatLogSummary {
+  id: string
+  sessionId: string
+  userQuery: string
+  toolNames: string[]
+  timestamp: Date
+  responseTime?: number
+}
+
+interface ChatLogPage {
+  logs: ChatLogSummary[]
+  nextCursor?: string
+  prevCursor?: string
+}
+
 interface ChatAnalytics {
   totalQueries: number
   avgResponseTime: number
@@ -31,7 +46,6 @@ interface ChatAnalytics {
 interface ChatRequest {
   message: string
   session_id: string
-  context?: ChatMessage[]
   preferences?: Record<string, any>
 }
 
@@ -74,12 +88,12 @@ class ApiClient {
     return `session_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`
   }
 
-  async chat(message: string, context?: ChatMessage[]): Promise<ApiClientResponse> {
+  async chat(message: string): Promise<ApiClientResponse> {
     try {
+      // conversation context is kept server-side per session
       const request: ChatRequest = {
         message,
-        session_id: this.sessionId,
-        context: context?.slice(-6)
+        session_id: this.sessionId
       }
 
       const response = await fetch(`${this.baseUrl}/chat`, {
@@ -126,19 +140,7 @@ class ApiClient {
 
       const data = await response.json()
       
-      const logs: DetailedChatLog[] = data.logs.map((log: any) => ({
-        id: log.id,
-        sessionId: log.session_id,
-        userQuery: log.user_query,
-        finalResponse: log.final_response,
-        toolsUsed: log.tools_used || [],
-        modalActions: log.modal_actions || undefined,
-        suggestions: log.suggestions || undefined,
-        responseTime: log.response_time,
-        timestamp: new Date(log.timestamp),
-        userIp: log.user_ip || undefined,
-        userAgent: log.user_agent || undefined
-      }))
+      const logs: DetailedChatLog[] = data.logs.map((log: any) => this.toDetailedChatLog(log))
       
       return {
         success: true,
@@ -156,6 +158,83 @@ class ApiClient {
     }
   }
 
+  private toDetailedChatLog(log: any): DetailedChatLog {
+    return {
+      id: log.id,
+      sessionId: log.session_id,
+      userQuery: log.user_query,
+      finalResponse: log.final_response,
+      toolsUsed: log.tools_used || [],
+      modalActions: log.modal_actions || undefined,
+      suggestions: log.suggestions || undefined,
+      responseTime: log.response_time,
+      timestamp: new Date(log.timestamp),
+      userIp: log.user_ip || undefined,
+      userAgent: log.user_agent || undefined
+    }
+  }
+
+  async getChatLog(logId: string): Promise<ApiClientResponse> {
+    try {
+      // the endpoint sends an ETag with no-cache, so the browser revalidates repeat opens as 304s
+      const response = await fetch(`${this.baseUrl}/chat/logs/${encodeURIComponent(logId)}`)
+      
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`)
+      }
+
+      const data = await response.json()
+      
+      return {
+        success: true,
+        data: this.toDetailedChatLog(data)
+      }
+    } catch (error: any) {
+      return {
+        success: false,
+        error: error.message || 'failed to fetch chat log'
+      }
+    }
+  }
+
+  async getChatLogSummaries(before?: string, limit: number = 50): Promise<ApiClientResponse> {
+    try {
+      const params = new URLSearchParams({ fields: 'summary', limit: limit.toString() })
+      if (before) params.append('before', before)
+      
+      const response = await fetch(`${this.baseUrl}/chat/logs?${params.toString()}`)
+      
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`)
+      }
+
+      const data = await response.json()
+      
+      const page: ChatLogPage = {
+        logs: data.logs.map((log: any) => ({
+          id: log.id,
+          sessionId: log.session_id,
+          userQuery: log.user_query,
+          toolNames: log.tool_names || [],
+          timestamp: new Date(log.timestamp),
+          responseTime: log.response_time ?? undefined
+        })),
+        nextCursor: data.next_cursor || undefined,
+        prevCursor: data.prev_cursor || undefined
+      }
+      
+      return {
+        success: true,
+        data: page
+      }
+    } catch (error: any) {
+      return {
+        success: false,
+        error: error.message || 'failed to fetch chat logs'
+      }
+    }
+  }
+
   async getChatAnalytics(days: number = 30): Promise<ApiClientResponse> {
     try {
       const response = await fetch(`${this.baseUrl}/chat/analytics?days=${days}`)
@@ -289,4 +368,4 @@ class ApiClient {
 }
 
 export const apiClient = new ApiClient()
-export type { ChatMessage, ChatResponse, ApiClientResponse, ToolResult, ModalAction, DetailedChatLog, ChatAnalytics } 
\ No newline at end of file
+export type { ChatMessage, ChatResponse, ApiClientResponse, ToolResult, ModalAction, DetailedChatLog, ChatLogSummary, ChatLogPage, ChatAnalytics } 
\ No newline at end of file